@@ -0,0 +1,86 @@
+import asyncio
+import contextvars
+import logging
+
+from app import crud, schemas
+from app.config import settings
+from app.database import AsyncSessionLocal
+
+
+class BookingGroupCommitter:
+    """Очередь бронирований на каждую корзину внутри воркера (режим BOOKING_GROUP_COMMIT).
+
+    Первый запрос к корзине запускает задачу, которая ждёт window секунд, собирает всё, что
+    пришло за это время (не больше max_size), и фиксирует пачку одной транзакцией через
+    crud.book_food_bag_group. Пока идёт фиксация, следующие запросы копятся в новую пачку.
+    Каждый запрос получает свой результат: Booking или HTTPException, как в одиночном режиме.
+    """
+
+    def __init__(self, window: float, max_size: int):
+        self.window = window
+        self.max_size = max_size
+        self._queues = {}  # food_bag_id -> [(booking, user_id, future)]
+        self._drains = set()  # loop хранит задачи по слабым ссылкам: без этого пачку может собрать GC
+        self.groups = 0
+        self.bookings = 0
+        self.largest_group = 0
+
+    async def book(self, booking: schemas.BookingCreate, user_id: int):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._queues.get(booking.food_bag_id)
+        if queue is None:
+            queue = self._queues[booking.food_bag_id] = []
+            # Пустой контекст: общая транзакция не принадлежит запросу, который открыл пачку
+            # (например, не учитывается в его бюджете SQL-запросов)
+            task = loop.create_task(self._drain(booking.food_bag_id), context=contextvars.Context())
+            self._drains.add(task)
+            task.add_done_callback(self._drains.discard)
+        queue.append((booking, user_id, future))
+        return await future
+
+    async def _drain(self, food_bag_id: int):
+        # Пачки одной корзины фиксируются строго по очереди - в БД нет конкуренции за её строку
+        await asyncio.sleep(self.window)
+        while True:
+            queue = self._queues[food_bag_id]
+            if not queue:
+                del self._queues[food_bag_id]
+                return
+            group, self._queues[food_bag_id] = queue[:self.max_size], queue[self.max_size:]
+            await self._commit(food_bag_id, group)
+
+    async def _commit(self, food_bag_id: int, group):
+        try:
+            async with AsyncSessionLocal() as db:
+                results = await crud.book_food_bag_group_async(
+                    db, food_bag_id, [(booking, user_id) for booking, user_id, _ in group]
+                )
+        except Exception as e:
+            logging.error("Group booking failed for food_bag_id=%s (%s requests): %s", food_bag_id, len(group), e)
+            results = [e] * len(group)
+        self.groups += 1
+        self.bookings += len(group)
+        self.largest_group = max(self.largest_group, len(group))
+        for (_, _, future), result in zip(group, results):
+            if future.done():  # клиент отключился, не дождавшись результата
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": settings.BOOKING_GROUP_COMMIT,
+            "window_ms": self.window * 1000,
+            "max_size": self.max_size,
+            "queued": sum(len(queue) for queue in self._queues.values()),
+            "groups": self.groups,
+            "bookings": self.bookings,
+            "average_group": round(self.bookings / self.groups, 2) if self.groups else 0,
+            "largest_group": self.largest_group,
+        }
+
+
+booking_committer = BookingGroupCommitter(settings.BOOKING_GROUP_WINDOW_MS / 1000, settings.BOOKING_GROUP_MAX_SIZE)
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
-from typing import Optional
+from typing import Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -9,6 +9,17 @@ class Settings(BaseSettings):
     ALGORITHM: str = Field("HS256", env="ALGORITHM")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(30, env="ACCESS_TOKEN_EXPIRE_MINUTES")
 
+    # Пароли: стоимость bcrypt и пул потоков для хэширования
+    BCRYPT_ROUNDS: int = Field(12, env="BCRYPT_ROUNDS")
+    PASSWORD_HASH_WORKERS: int = Field(4, env="PASSWORD_HASH_WORKERS")
+    PASSWORD_HASH_MAX_QUEUE: int = Field(64, env="PASSWORD_HASH_MAX_QUEUE")
+
+    # Кэш пользователей для авторизации (в памяти воркера)
+    PRINCIPAL_CACHE_SIZE: int = Field(10000, env="PRINCIPAL_CACHE_SIZE")
+    PRINCIPAL_CACHE_TTL: float = Field(60.0, env="PRINCIPAL_CACHE_TTL")  # секунды
+    # Смена роли и удаление в другом воркере видны здесь через столько секунд (сверка версии users)
+    PRINCIPAL_CACHE_CHECK_INTERVAL: float = Field(1.0, env="PRINCIPAL_CACHE_CHECK_INTERVAL")
+
     # Настройки БД
     DEBUG: bool = Field(True, env="DEBUG")
     DB_HOST: str = Field("db", env="DB_HOST")
@@ -16,6 +27,91 @@ class Settings(BaseSettings):
     DB_PASSWORD: str = Field("password", env="DB_PASSWORD")
     DB_NAME: str = Field("foodbasket", env="DB_NAME")
     DB_PORT: int = Field(3306, env="DB_PORT")
+    # Полные URL перекрывают параметры выше, например для локальной SQLite:
+    # DATABASE_URL=sqlite:///./dev.db, ASYNC_DATABASE_URL=sqlite+aiosqlite:///./dev.db
+    DATABASE_URL: Optional[str] = Field(None, env="DATABASE_URL")
+    ASYNC_DATABASE_URL: Optional[str] = Field(None, env="ASYNC_DATABASE_URL")
+
+    # Пул соединений (на каждый движок и каждый воркер uvicorn)
+    DB_POOL_SIZE: int = Field(10, env="DB_POOL_SIZE")
+    DB_MAX_OVERFLOW: int = Field(20, env="DB_MAX_OVERFLOW")
+    DB_POOL_TIMEOUT: float = Field(30.0, env="DB_POOL_TIMEOUT")  # секунды ожидания свободного соединения
+    DB_POOL_RECYCLE: int = Field(1800, env="DB_POOL_RECYCLE")  # меньше wait_timeout MySQL
+    DB_POOL_PRE_PING: bool = Field(True, env="DB_POOL_PRE_PING")
+    # Реплики для чтения: асинхронные URL через запятую (mysql+aiomysql://...); пусто - всё в основную БД.
+    # После записи чтения клиента DB_READ_YOUR_WRITES секунд идут в основную БД
+    DB_REPLICA_URLS: str = Field("", env="DB_REPLICA_URLS")
+    DB_READ_YOUR_WRITES: float = Field(5.0, env="DB_READ_YOUR_WRITES")  # секунды
+    # Старт: применять миграции автоматически (иначе - ошибка, если схема отстаёт) и ожидание блокировки
+    DB_AUTO_MIGRATE: bool = Field(True, env="DB_AUTO_MIGRATE")
+    STARTUP_LOCK_TIMEOUT: int = Field(60, env="STARTUP_LOCK_TIMEOUT")  # секунды
+
+    # Бронирование: повтор транзакции при deadlock / lock wait timeout
+    BOOKING_MAX_RETRIES: int = Field(5, env="BOOKING_MAX_RETRIES")
+    BOOKING_RETRY_BASE_DELAY: float = Field(0.01, env="BOOKING_RETRY_BASE_DELAY")  # секунды
+    BOOKING_RETRY_MAX_DELAY: float = Field(0.2, env="BOOKING_RETRY_MAX_DELAY")
+    # Групповая фиксация бронирований одной корзины (app/booking_pipeline.py)
+    BOOKING_GROUP_COMMIT: bool = Field(False, env="BOOKING_GROUP_COMMIT")
+    BOOKING_GROUP_WINDOW_MS: float = Field(5.0, env="BOOKING_GROUP_WINDOW_MS")  # сбор запросов перед фиксацией
+    BOOKING_GROUP_MAX_SIZE: int = Field(200, env="BOOKING_GROUP_MAX_SIZE")  # бронирований в одной транзакции
+
+    # Список корзин: keyset-пагинация и потоковая выдача
+    FOOD_BAGS_PAGE_SIZE: int = Field(100, env="FOOD_BAGS_PAGE_SIZE")
+    FOOD_BAGS_MAX_PAGE_SIZE: int = Field(1000, env="FOOD_BAGS_MAX_PAGE_SIZE")
+    FOOD_BAGS_STREAM_BATCH: int = Field(500, env="FOOD_BAGS_STREAM_BATCH")
+    FOOD_BAGS_ETAG_WINDOW: int = Field(60, env="FOOD_BAGS_ETAG_WINDOW")  # секунды, см. app/etag.py
+    NEARBY_MAX_RADIUS_KM: float = Field(50.0, env="NEARBY_MAX_RADIUS_KM")
+    BATCH_MAX_ITEMS: int = Field(500, env="BATCH_MAX_ITEMS")  # корзин в одном пакетном запросе
+
+    # Живой индекс непросроченных корзин в памяти воркера (app/inventory.py)
+    INVENTORY_ENABLED: bool = Field(True, env="INVENTORY_ENABLED")
+    INVENTORY_SYNC_INTERVAL: float = Field(1.0, env="INVENTORY_SYNC_INTERVAL")  # секунды между сверками версии с БД
+    INVENTORY_VERIFY: bool = Field(False, env="INVENTORY_VERIFY")  # сверять каждый ответ с БД (отладка)
+
+    # Удаление просроченных корзин: размер порции (одна транзакция на порцию) и период запуска
+    CLEANUP_CHUNK_SIZE: int = Field(500, env="CLEANUP_CHUNK_SIZE")
+    CLEANUP_INTERVAL: float = Field(60.0, env="CLEANUP_INTERVAL")  # секунды
+
+    # Периодические задачи (app/scheduler.py): каждую выполняет один воркер из всех процессов и хостов
+    SCHEDULER_ENABLED: bool = Field(True, env="SCHEDULER_ENABLED")
+    SCHEDULER_POLL_INTERVAL: float = Field(5.0, env="SCHEDULER_POLL_INTERVAL")  # секунды между проверками, не больше
+    SCHEDULER_LEASE_TTL: float = Field(600.0, env="SCHEDULER_LEASE_TTL")  # аренда задачи упавшего воркера истекает
+    SCHEDULER_HISTORY_DAYS: int = Field(14, env="SCHEDULER_HISTORY_DAYS")  # хранение истории запусков
+
+    # Списки корзин и пользователей: строки БД сразу в JSON (orjson) без валидации pydantic
+    FAST_JSON_RESPONSES: bool = Field(False, env="FAST_JSON_RESPONSES")
+
+    # Поток изменений корзин (SSE, app/events.py)
+    EVENTS_QUEUE_SIZE: int = Field(256, env="EVENTS_QUEUE_SIZE")  # событий в буфере клиента, дальше - отключение
+    EVENTS_HEARTBEAT: float = Field(15.0, env="EVENTS_HEARTBEAT")  # секунды между комментариями keep-alive
+    EVENTS_MAX_SUBSCRIBERS: int = Field(10000, env="EVENTS_MAX_SUBSCRIBERS")  # на воркер
+    EVENTS_RESYNC_INTERVAL: float = Field(5.0, env="EVENTS_RESYNC_INTERVAL")  # без живого индекса: секунды между resync
+
+    # Собранная статика фронтенда (python -m app.assets); вне пакета app, чтобы bind mount ./app не скрывал её
+    STATIC_BUILD_DIR: str = Field("static_build", env="STATIC_BUILD_DIR")
+
+    # Фото корзин (app/photos.py): файлы по sha256 в MEDIA_DIR, раздаются по /media
+    MEDIA_DIR: str = Field("media", env="MEDIA_DIR")  # общий каталог для всех воркеров и хостов
+    PHOTO_MAX_BYTES: int = Field(10 * 1024 * 1024, env="PHOTO_MAX_BYTES")
+    PHOTO_SIZES: str = Field("160,480,1080", env="PHOTO_SIZES")  # ширины превью через запятую
+    PHOTO_DEFAULT_SIZE: int = Field(480, env="PHOTO_DEFAULT_SIZE")  # превью в photo_url корзины
+    PHOTO_WORKERS: int = Field(2, env="PHOTO_WORKERS")  # процессы Pillow на воркер
+    PHOTO_QUALITY: int = Field(82, env="PHOTO_QUALITY")  # качество JPEG превью
+    # Префикс внутреннего location nginx: файл отдаёт nginx (X-Accel-Redirect), а не Python
+    MEDIA_ACCEL_REDIRECT: Optional[str] = Field(None, env="MEDIA_ACCEL_REDIRECT")
+
+    # Логи (app/logs.py): json или text; доля запросов, чьи info-записи сохраняются (warning и выше - всегда);
+    # записи сверх LOG_QUEUE_SIZE в очереди фонового потока отбрасываются
+    LOG_LEVEL: str = Field("INFO", env="LOG_LEVEL")
+    LOG_FORMAT: Literal["json", "text"] = Field("json", env="LOG_FORMAT")
+    LOG_SAMPLE_RATE: float = Field(1.0, env="LOG_SAMPLE_RATE")
+    LOG_QUEUE_SIZE: int = Field(10000, env="LOG_QUEUE_SIZE")
+
+    # Метрики Prometheus на /metrics (app/metrics.py)
+    METRICS_ENABLED: bool = Field(True, env="METRICS_ENABLED")
+
+    # Счётчик SQL-запросов на HTTP-запрос (app/query_counter.py): off, warn или raise
+    QUERY_BUDGET_MODE: Literal["off", "warn", "raise"] = Field("off", env="QUERY_BUDGET_MODE")
 
     # Настройки API
     API_V1_STR: str = Field("/api/v1", env="API_V1_STR")
@@ -25,8 +121,16 @@ class Settings(BaseSettings):
 
     @property
     def database_url(self) -> str:
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
         return f"mysql+pymysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    @property
+    def async_database_url(self) -> str:
+        if self.ASYNC_DATABASE_URL:
+            return self.ASYNC_DATABASE_URL
+        return f"mysql+aiomysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+
     class Config:
         env_file = ".env"
         case_sensitive = True
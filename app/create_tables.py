@@ -1,8 +1,7 @@
-from app.database import Base, engine
-import app.models  # Чтобы зарегистрировались все модели
+from app.database import run_migrations
 
 def create_tables():
-    Base.metadata.create_all(bind=engine)
+    run_migrations()
     print("Таблицы успешно созданы!")
 
 if __name__ == "__main__":
@@ -1,34 +1,47 @@
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, delete, func, insert, or_, select, tuple_, update
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import Session, contains_eager
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import OperationalError
+from dataclasses import dataclass
 from datetime import datetime
-from . import models, schemas
-from passlib.context import CryptContext
+from . import geo, models, passwords, schemas
+from .config import settings
+from .events import event_broker
+from .inventory import live_inventory
+from .metrics import booking_retries, db_function
+from .pagination import Cursor
+from .principal_cache import principal_cache
+from .serialization import FOOD_BAG_COLUMNS, USER_COLUMNS
+import asyncio
 import logging
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
+import random
+import time
 
 # Пользователи
+@db_function
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
 
+@db_function
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
 
+@db_function
 def get_all_users(db: Session):
     return db.query(models.User).all()
 
 
+@db_function
+def get_all_user_rows(db: Session):
+    # Только колонки UserResponse, без ORM-объектов (быстрый путь сериализации)
+    return db.execute(select(*USER_COLUMNS)).all()
+
+
+@db_function
 def create_user(db: Session, email: str, hashed_password: str, role: str):
     db_user = models.User(email=email, hashed_password=hashed_password, role=role)
     db.add(db_user)
@@ -37,55 +50,278 @@ def create_user(db: Session, email: str, hashed_password: str, role: str):
     return db_user
 
 
+@db_function
+def update_user_role(db: Session, user_id: int, role: str):
+    db_user = get_user(db, user_id)
+    if not db_user:
+        return None
+    db_user.role = role
+    bump_users_version(db)
+    db.commit()
+    db.refresh(db_user)
+    # Роль входит в закэшированного Principal - сбрасываем явно (другие воркеры - по версии users)
+    _after_commit(principal_cache.invalidate_user, user_id)
+    return db_user
+
+
+@db_function
+def delete_user(db: Session, user_id: int):
+    db_user = get_user(db, user_id)
+    if not db_user:
+        return False
+    db.delete(db_user)
+    # Вместе с пользователем каскадно удаляются его корзины
+    version = bump_food_bags_version(db)
+    bump_users_version(db)
+    db.commit()
+    _after_commit(live_inventory.remove_owner, user_id, version)
+    _after_commit(event_broker.publish_owner_deleted, user_id, version)
+    _after_commit(principal_cache.invalidate_user, user_id)
+    return True
+
+
+@db_function
+def update_password_hash(db: Session, user_id: int, hashed_password: str):
+    db.query(models.User).filter(models.User.id == user_id).update(
+        {models.User.hashed_password: hashed_password}, synchronize_session=False
+    )
+    db.commit()
+
+
+@db_function
 def authenticate_user(db: Session, email: str, password: str):
     user = get_user_by_email(db, email)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not passwords.verify_password(password, user.hashed_password):
         return False
     return user
 
 
 # Корзины
+# Версия данных списка корзин: увеличивается каждой записью в food_bags (включая остатки).
+# Увеличивается в той же транзакции, что и изменение (перед commit), а читается ДО выборки
+# данных - версия и данные становятся видны вместе, ETag со старой версией не может
+# "закрепить" новые данные. Отдельная транзакция после commit могла упасть (блокировка) уже
+# после записи и попасть в повтор бронирования
+FOOD_BAGS_VERSION = "food_bags"
+
+
+@db_function
+def bump_food_bags_version(db: Session) -> int:
+    # Без commit: фиксирует вызывающая функция вместе со своим изменением. Сначала flush самого
+    # изменения - общая строка версии блокируется последней и держится только до commit
+    db.flush()
+    db.execute(
+        update(models.ChangeVersion)
+        .where(models.ChangeVersion.name == FOOD_BAGS_VERSION)
+        .values(version=models.ChangeVersion.version + 1)
+    )
+    # Новое значение читается в той же транзакции: по нему live_inventory понимает,
+    # были ли между его версией и этой записью чужие изменения
+    return get_food_bags_version(db)
+
+
+@db_function
+def get_food_bags_version(db: Session) -> int:
+    version = db.execute(
+        select(models.ChangeVersion.version).where(models.ChangeVersion.name == FOOD_BAGS_VERSION)
+    ).scalar()
+    return version or 0
+
+
+# Версия пользователей: увеличивается сменой роли и удалением в той же транзакции. Кэш
+# авторизации каждого воркера (app/principal_cache.py) сверяется с ней фоном и сбрасывается
+USERS_VERSION = "users"
+
+
+@db_function
+def bump_users_version(db: Session):
+    db.flush()
+    db.execute(
+        update(models.ChangeVersion)
+        .where(models.ChangeVersion.name == USERS_VERSION)
+        .values(version=models.ChangeVersion.version + 1)
+    )
+
+
+@db_function
+def get_users_version(db: Session) -> int:
+    version = db.execute(
+        select(models.ChangeVersion.version).where(models.ChangeVersion.name == USERS_VERSION)
+    ).scalar()
+    return version or 0
+
+
+def _after_commit(hook, *args):
+    # Живой индекс и события SSE обновляются после commit. Изменение уже записано: ошибка здесь
+    # логируется, но не превращает запрос в 500 и не повторяет транзакцию (индекс пересоберётся
+    # по версии, подписчики получат изменение из разницы снимков)
+    try:
+        hook(*args)
+    except Exception:
+        logging.exception("Post-commit hook %s failed", hook.__qualname__)
+
+
+def _set_geohash(db_food_bag: models.FoodBag):
+    if db_food_bag.latitude is not None and db_food_bag.longitude is not None:
+        db_food_bag.geohash = geo.geohash_encode(db_food_bag.latitude, db_food_bag.longitude)
+    else:
+        db_food_bag.geohash = None
+
+
+@db_function
 def create_food_bag(db: Session, food_bag: schemas.FoodBagCreate, user_id: int):
     db_food_bag = models.FoodBag(
-        **food_bag.dict(),
+        **food_bag.model_dump(),
         owner_id=user_id,
         photo_url="/placeholder.jpg"
     )
+    _set_geohash(db_food_bag)
     db.add(db_food_bag)
     try:
+        version = bump_food_bags_version(db)
         db.commit()
     except Exception as e:
         db.rollback()
-        logging.error(f"Failed to commit new food bag: {e}")
+        logging.error("Failed to commit new food bag: %s", e)
         raise
     db.refresh(db_food_bag)
-    logging.info(f"Food bag created with id {db_food_bag.id}")
+    _after_commit(live_inventory.upsert, db_food_bag, version)
+    _after_commit(event_broker.publish_upserted, "created", [db_food_bag], version)
+    logging.info("Food bag created with id %s", db_food_bag.id)
     return db_food_bag
 
 
+@db_function
 def get_food_bag(db: Session, food_bag_id: int):
     return db.query(models.FoodBag).filter(models.FoodBag.id == food_bag_id).first()
 
 
-def get_food_bags(db: Session, current_user=None, address: str = None, filter_expired: bool = False):
-    query = db.query(models.FoodBag).join(models.User, models.FoodBag.owner)
+def _contains(column, text: str):
+    # Подстрока без учёта регистра, как в живом индексе: % и _ из ввода - обычные символы, не шаблон
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return column.ilike(f"%{escaped}%", escape="\\")
+
+
+def _food_bags_query(current_user=None, address: str = None, filter_expired: bool = False, after: Cursor = None):
+    # Владелец подгружается тем же JOIN, что используется для фильтрации
+    query = (
+        select(models.FoodBag)
+        .join(models.User, models.FoodBag.owner)
+        .options(contains_eager(models.FoodBag.owner))
+    )
 
     if filter_expired:
-        query = query.filter(models.FoodBag.pickup_time > datetime.utcnow())
+        query = query.where(models.FoodBag.pickup_time > datetime.utcnow())
 
     if current_user and current_user.role == "establishment":
-        query = query.filter(models.FoodBag.owner_id == current_user.id)
+        query = query.where(models.FoodBag.owner_id == current_user.id)
 
     if address:
-        query = query.filter(models.FoodBag.address.ilike(f"%{address}%"))
-    return query.all()
-    logging.info(
-        f"Fetched {len(result)} food bags for user {current_user.email if current_user else 'anonymous'} with filter '{address}'")
-    return result
-
-
+        query = query.where(_contains(models.FoodBag.address, address))
+
+    # Keyset: всё, что строго после курсора в порядке (pickup_time, id)
+    if after:
+        query = query.where(tuple_(models.FoodBag.pickup_time, models.FoodBag.id) > tuple_(*after))
+    return query.order_by(models.FoodBag.pickup_time, models.FoodBag.id)
+
+
+@db_function
+def get_food_bags(db: Session, current_user=None, address: str = None, filter_expired: bool = False,
+                  limit: int = None, after: Cursor = None):
+    query = _food_bags_query(current_user, address, filter_expired, after)
+    if limit:
+        query = query.limit(limit)
+    return db.execute(query).scalars().all()
+
+
+@db_function
+def get_food_bag_rows(db: Session, current_user=None, address: str = None, filter_expired: bool = False,
+                      limit: int = None, after: Cursor = None):
+    # Те же условия, что get_food_bags, но только колонки FoodBagResponse (быстрый путь сериализации)
+    query = _food_bags_query(current_user, address, filter_expired, after).with_only_columns(*FOOD_BAG_COLUMNS)
+    if limit:
+        query = query.limit(limit)
+    return db.execute(query).all()
+
+
+@db_function
+def get_food_bags_nearby(db: Session, latitude: float, longitude: float, radius_km: float,
+                         current_user=None, limit: int = None):
+    # 1) кандидаты по индексу geohash: диапазоны префиксов ячеек вокруг точки + bounding box;
+    #    у антимеридиана долготы bounding box - два диапазона по обе стороны от ±180;
+    #    читаются только id и координаты. Без ORDER BY: кандидаты ранжируются по расстоянию ниже,
+    #    а сортировка по pickup_time уводила планировщик на индекс pickup_time (почти вся таблица)
+    cells = geo.covering_cells(latitude, longitude, radius_km)
+    min_lat, max_lat, min_lon, max_lon = geo.bounding_box(latitude, longitude, radius_km)
+    candidates = _food_bags_query(current_user, filter_expired=True).order_by(None).where(
+        or_(*[and_(models.FoodBag.geohash >= cell, models.FoodBag.geohash < cell + "~") for cell in cells]),
+        models.FoodBag.latitude.between(min_lat, max_lat),
+        or_(*[models.FoodBag.longitude.between(low, high)
+              for low, high in geo.longitude_ranges(min_lon, max_lon)]),
+    ).with_only_columns(models.FoodBag.id, models.FoodBag.latitude, models.FoodBag.longitude)
+
+    # 2) точное расстояние и ранжирование
+    ranked = []
+    for food_bag_id, lat, lon in db.execute(candidates):
+        distance = geo.haversine_km(latitude, longitude, lat, lon)
+        if distance <= radius_km:
+            ranked.append((distance, food_bag_id))
+    ranked.sort()
+    if limit:
+        ranked = ranked[:limit]
+    if not ranked:
+        return []
+
+    # 3) полные строки только для отобранных корзин
+    food_bags = {
+        food_bag.id: food_bag
+        for food_bag in db.execute(
+            _food_bags_query().where(models.FoodBag.id.in_([food_bag_id for _, food_bag_id in ranked]))
+        ).scalars()
+    }
+    return [(distance, food_bags[food_bag_id]) for distance, food_bag_id in ranked if food_bag_id in food_bags]
+
+
+# Веса полей для запасного (неиндексированного) поиска вне MySQL
+SEARCH_FIELD_WEIGHTS = (("name", 3.0), ("address", 2.0), ("description", 1.0))
+
+
+@db_function
+def search_food_bags(db: Session, text: str, current_user=None, limit: int = None):
+    query = _food_bags_query(current_user, filter_expired=True).order_by(None)
+
+    if db.get_bind().dialect.name == "mysql":
+        # MATCH ... AGAINST по FULLTEXT-индексу: релевантность считает сама БД
+        score = mysql.match(
+            models.FoodBag.name, models.FoodBag.description, models.FoodBag.address, against=text
+        ).in_natural_language_mode()
+        score_column = score.label("score")
+        query = query.add_columns(score_column).where(score > 0).order_by(score_column.desc(), models.FoodBag.id)
+        if limit:
+            query = query.limit(limit)
+        return [(float(relevance), food_bag) for food_bag, relevance in db.execute(query)]
+
+    # Запасной вариант для локальной БД (SQLite): полный просмотр с ILIKE по каждому слову
+    words = [word for word in text.lower().split() if word]
+    if not words:
+        return []
+    query = query.where(or_(*[
+        _contains(getattr(models.FoodBag, field), word) for word in words for field, _ in SEARCH_FIELD_WEIGHTS
+    ]))
+    ranked = []
+    for food_bag in db.execute(query).scalars():
+        relevance = sum(
+            weight * (getattr(food_bag, field) or "").lower().count(word)
+            for word in words for field, weight in SEARCH_FIELD_WEIGHTS
+        )
+        ranked.append((relevance, food_bag))
+    ranked.sort(key=lambda item: (-item[0], item[1].id))
+    return ranked[:limit] if limit else ranked
+
+
+@db_function
 def update_food_bag(db: Session, food_bag_id: int, food_bag_update: schemas.FoodBagCreate, current_user):
     if current_user.role == 'admin':
         db_food_bag = db.query(models.FoodBag).filter(models.FoodBag.id == food_bag_id).first()
@@ -96,13 +332,18 @@ def update_food_bag(db: Session, food_bag_id: int, food_bag_update: schemas.Food
     if not db_food_bag:
         return None
 
-    for key, value in food_bag_update.dict().items():
+    for key, value in food_bag_update.model_dump().items():
         setattr(db_food_bag, key, value)
+    _set_geohash(db_food_bag)
+    version = bump_food_bags_version(db)
     db.commit()
     db.refresh(db_food_bag)
+    _after_commit(live_inventory.upsert, db_food_bag, version)
+    _after_commit(event_broker.publish_upserted, "updated", [db_food_bag], version)
     return db_food_bag
 
 
+@db_function
 def delete_food_bag(db: Session, food_bag_id: int, current_user):
     if current_user.role == 'admin':
         db_food_bag = db.query(models.FoodBag).filter(models.FoodBag.id == food_bag_id).first()
@@ -113,34 +354,499 @@ def delete_food_bag(db: Session, food_bag_id: int, current_user):
     if not db_food_bag:
         return False
 
+    # Владелец и адрес - для фильтров подписчиков SSE: после commit удалённый объект недоступен
+    deleted = [(food_bag_id, db_food_bag.owner_id, db_food_bag.address)]
     db.delete(db_food_bag)
+    version = bump_food_bags_version(db)
     db.commit()
+    _after_commit(event_broker.publish_deleted, deleted, version)
+    _after_commit(live_inventory.remove, [food_bag_id], version)
     return True
 
 
+
+# Фото корзин (app/photos.py). Файлы уже на диске, здесь меняется только photo_url
+@db_function
+def get_owned_food_bag_id(db: Session, food_bag_id: int, current_user):
+    query = _owned_food_bags_query(select(models.FoodBag.id).where(models.FoodBag.id == food_bag_id), current_user)
+    return db.execute(query).scalar()
+
+
+@db_function
+def set_food_bag_photo(db: Session, food_bag_id: int, photo_url: str, current_user):
+    query = _owned_food_bags_query(select(models.FoodBag).where(models.FoodBag.id == food_bag_id), current_user)
+    db_food_bag = db.execute(query).scalars().first()
+    if not db_food_bag:
+        return None
+    db_food_bag.photo_url = photo_url
+    version = bump_food_bags_version(db)
+    db.commit()
+    db.refresh(db_food_bag)
+    _after_commit(live_inventory.upsert, db_food_bag, version)
+    _after_commit(event_broker.publish_upserted, "updated", [db_food_bag], version)
+    return db_food_bag
+
+
+@db_function
+def replace_food_bag_photo(db: Session, old_url: str, new_url: str) -> int:
+    # Готовые превью: все корзины с исходным файлом переходят на превью (одно фото - много корзин)
+    food_bag_ids = list(db.execute(select(models.FoodBag.id).where(models.FoodBag.photo_url == old_url)).scalars())
+    if not food_bag_ids:
+        return 0
+    db.execute(
+        update(models.FoodBag)
+        .where(models.FoodBag.id.in_(food_bag_ids), models.FoodBag.photo_url == old_url)
+        .values(photo_url=new_url),
+        execution_options={"synchronize_session": False},
+    )
+    version = bump_food_bags_version(db)
+    db.commit()
+    updated = _load_food_bags(db, food_bag_ids)
+    _after_commit(live_inventory.upsert_many, updated, version)
+    _after_commit(event_broker.publish_upserted, "updated", updated, version)
+    return len(food_bag_ids)
+
+# Пакетные операции с корзинами: одна транзакция и одно увеличение версии на весь пакет,
+# результат по каждому элементу - со статусом, который вернул бы одиночный запрос
+def _load_food_bags(db: Session, food_bag_ids):
+    # Свежие строки с владельцами одним запросом, вместо refresh на каждую корзину
+    food_bags = {
+        food_bag.id: food_bag
+        for food_bag in db.execute(_food_bags_query().where(models.FoodBag.id.in_(food_bag_ids))).scalars()
+    }
+    return [food_bags[food_bag_id] for food_bag_id in food_bag_ids]
+
+
+def _owned_food_bags_query(query, current_user):
+    if current_user.role != 'admin':
+        query = query.where(models.FoodBag.owner_id == current_user.id)
+    return query
+
+
+@db_function
+def create_food_bags(db: Session, food_bags: list[schemas.FoodBagCreate], user_id: int):
+    # Один INSERT на пачку: Core insert со списком строк уходит в executemany, который драйверы
+    # MySQL сворачивают в INSERT ... VALUES (...), (...). ORM add_all + flush без RETURNING
+    # (MySQL) отправлял INSERT на каждую строку ради id
+    rows = []
+    for food_bag in food_bags:
+        row = food_bag.model_dump()
+        row.update(owner_id=user_id, photo_url="/placeholder.jpg", geohash=None)
+        if row["latitude"] is not None and row["longitude"] is not None:
+            row["geohash"] = geo.geohash_encode(row["latitude"], row["longitude"])
+        rows.append(row)
+    try:
+        # id новых строк - больше последнего id, видимого транзакции до вставки: строки других
+        # транзакций, зафиксированные позже, в её снимке не видны (REPEATABLE READ в MySQL,
+        # единственный писатель в SQLite)
+        last_id = db.execute(select(func.max(models.FoodBag.id))).scalar() or 0
+        db.execute(insert(models.FoodBag), rows)
+        food_bag_ids = db.execute(
+            select(models.FoodBag.id)
+            .where(models.FoodBag.owner_id == user_id, models.FoodBag.id > last_id)
+            .order_by(models.FoodBag.id)
+        ).scalars().all()
+        if len(food_bag_ids) != len(rows):
+            raise RuntimeError(f"Expected {len(rows)} new food bags, found {len(food_bag_ids)}")
+        version = bump_food_bags_version(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logging.error("Failed to commit batch of %s food bags: %s", len(rows), e)
+        raise
+    created = _load_food_bags(db, food_bag_ids)
+    _after_commit(live_inventory.upsert_many, created, version)
+    _after_commit(event_broker.publish_upserted, "created", created, version)
+    logging.info("Batch of %s food bags created by user %s", len(created), user_id)
+    return [
+        schemas.FoodBagBatchResult(
+            index=index, id=food_bag.id, status=201, food_bag=schemas.FoodBagResponse.model_validate(food_bag)
+        )
+        for index, food_bag in enumerate(created)
+    ]
+
+
+@db_function
+def update_food_bags(db: Session, items: list[schemas.FoodBagBatchUpdateItem], current_user):
+    query = _owned_food_bags_query(
+        select(models.FoodBag).where(models.FoodBag.id.in_([item.id for item in items])), current_user
+    )
+    found = {food_bag.id: food_bag for food_bag in db.execute(query).scalars()}
+
+    results = []
+    updated_ids = []
+    for index, item in enumerate(items):
+        db_food_bag = found.get(item.id)
+        if item.id in updated_ids:
+            results.append(schemas.FoodBagBatchResult(index=index, id=item.id, status=400, detail="Duplicate id in batch"))
+            continue
+        if not db_food_bag:
+            results.append(schemas.FoodBagBatchResult(
+                index=index, id=item.id, status=404, detail="Food bag not found or permission denied"
+            ))
+            continue
+        for key, value in item.model_dump(exclude={"id"}).items():
+            setattr(db_food_bag, key, value)
+        _set_geohash(db_food_bag)
+        updated_ids.append(item.id)
+        results.append(schemas.FoodBagBatchResult(index=index, id=item.id, status=200))
+
+    if updated_ids:
+        version = bump_food_bags_version(db)
+        db.commit()
+        updated = {food_bag.id: food_bag for food_bag in _load_food_bags(db, updated_ids)}
+        _after_commit(live_inventory.upsert_many, updated.values(), version)
+        _after_commit(event_broker.publish_upserted, "updated", updated.values(), version)
+        for result in results:
+            if result.status == 200:
+                result.food_bag = schemas.FoodBagResponse.model_validate(updated[result.id])
+    return results
+
+
+@db_function
+def delete_food_bags(db: Session, food_bag_ids: list[int], current_user):
+    query = _owned_food_bags_query(
+        select(models.FoodBag.id, models.FoodBag.owner_id, models.FoodBag.address)
+        .where(models.FoodBag.id.in_(food_bag_ids)),
+        current_user,
+    )
+    found = {row.id: row for row in db.execute(query)}
+
+    results = []
+    deleted_ids = []
+    for index, food_bag_id in enumerate(food_bag_ids):
+        if food_bag_id in deleted_ids:
+            results.append(schemas.FoodBagBatchResult(
+                index=index, id=food_bag_id, status=400, detail="Duplicate id in batch"
+            ))
+        elif food_bag_id not in found:
+            results.append(schemas.FoodBagBatchResult(
+                index=index, id=food_bag_id, status=404, detail="Food bag not found or permission denied"
+            ))
+        else:
+            deleted_ids.append(food_bag_id)
+            results.append(schemas.FoodBagBatchResult(
+                index=index, id=food_bag_id, status=200, detail="Food bag deleted successfully"
+            ))
+
+    if deleted_ids:
+        # Как и при очистке просроченных: set-based DELETE, сначала бронирования
+        db.execute(
+            delete(models.Booking).where(models.Booking.food_bag_id.in_(deleted_ids)),
+            execution_options={"synchronize_session": False},
+        )
+        db.execute(
+            delete(models.FoodBag).where(models.FoodBag.id.in_(deleted_ids)),
+            execution_options={"synchronize_session": False},
+        )
+        version = bump_food_bags_version(db)
+        db.commit()
+        _after_commit(event_broker.publish_deleted, [found[food_bag_id] for food_bag_id in deleted_ids], version)
+        _after_commit(live_inventory.remove, deleted_ids, version)
+    return results
+
+
 # Бронирования
-def book_food_bag(db: Session, booking: schemas.BookingCreate, user_id: int):
-    food_bag = get_food_bag(db, booking.food_bag_id)
-    if not food_bag:
-        raise HTTPException(status_code=404, detail="Food bag not found")
-    if food_bag.quantity < booking.quantity:
-        raise HTTPException(status_code=400, detail="Not enough food bags available")
+# Коды ошибок MySQL, при которых транзакцию можно безопасно повторить:
+# 1213 - deadlock, 1205 - lock wait timeout
+RETRYABLE_DB_ERRORS = {1213, 1205}
+
+
+def is_retryable_db_error(exc: OperationalError) -> bool:
+    args = getattr(exc.orig, "args", ())
+    return bool(args) and args[0] in RETRYABLE_DB_ERRORS
+
+
+def booking_retry_delay(attempt: int) -> float:
+    # Экспоненциальная задержка с "full jitter", ограниченная сверху
+    delay = min(settings.BOOKING_RETRY_MAX_DELAY, settings.BOOKING_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return random.uniform(0, delay)
+
 
-    db_booking = models.Booking(**booking.dict(), user_id=user_id)
-    food_bag.quantity -= booking.quantity
+@db_function
+def _book_food_bag_once(db: Session, booking: schemas.BookingCreate, user_id: int):
+    # Условное списание одним UPDATE: строка блокируется самой БД,
+    # поэтому параллельные бронирования не могут уйти в минус (нет lost update)
+    updated = (
+        db.query(models.FoodBag)
+        .filter(models.FoodBag.id == booking.food_bag_id, models.FoodBag.quantity >= booking.quantity)
+        .update({models.FoodBag.quantity: models.FoodBag.quantity - booking.quantity}, synchronize_session=False)
+    )
+    if not updated:
+        db.rollback()
+        # Отдельный запрос только на неуспешном пути, чтобы различить 404 и 400
+        if not db.query(models.FoodBag.id).filter(models.FoodBag.id == booking.food_bag_id).first():
+            raise HTTPException(status_code=404, detail="Food bag not found")
+        raise HTTPException(status_code=400, detail="Not enough food bags available")
 
+    # Бронирование вставляется в той же транзакции, что и списание
+    db_booking = models.Booking(**booking.model_dump(), user_id=user_id)
     db.add(db_booking)
+    version = bump_food_bags_version(db)
     db.commit()
-    db.refresh(db_booking)
+    # Хуки - в вызывающей функции, после цикла повторов: здесь только транзакция
+    return db_booking, version
+
+
+def _booking_committed(food_bag_id: int, quantity: int, version: int):
+    _after_commit(live_inventory.adjust_quantity, food_bag_id, -quantity, version)
+    _after_commit(event_broker.publish_quantity, food_bag_id, -quantity, version)
+
+
+@db_function
+def book_food_bag(db: Session, booking: schemas.BookingCreate, user_id: int):
+    attempt = 0
+    while True:
+        try:
+            db_booking, version = _book_food_bag_once(db, booking, user_id)
+            break
+        except OperationalError as e:
+            db.rollback()
+            attempt += 1
+            if not is_retryable_db_error(e) or attempt > settings.BOOKING_MAX_RETRIES:
+                raise
+            booking_retries.inc()
+            logging.warning("Retrying booking for food_bag_id=%s after %s (attempt %s)", booking.food_bag_id, e.orig, attempt)
+            time.sleep(booking_retry_delay(attempt))
+    _booking_committed(booking.food_bag_id, booking.quantity, version)
     return db_booking
 
 
+@db_function
+def book_food_bag_group(db: Session, food_bag_id: int, requests):
+    # Групповая фиксация (app/booking_pipeline.py): бронирования одной корзины, собранные за
+    # несколько миллисекунд, распределяются по остатку в порядке поступления и пишутся одной транзакцией.
+    # requests - [(BookingCreate, user_id)]; результат - (по каждому Booking или HTTPException,
+    # списанное количество, версия или None, если ничего не записано)
+    quantity = db.execute(
+        select(models.FoodBag.quantity).where(models.FoodBag.id == food_bag_id).with_for_update()
+    ).scalar()
+    if quantity is None:
+        db.rollback()
+        return [HTTPException(status_code=404, detail="Food bag not found") for _ in requests], 0, None
+
+    results = []
+    allocated = 0
+    for booking, user_id in requests:
+        if booking.quantity <= quantity - allocated:
+            allocated += booking.quantity
+            results.append(models.Booking(**booking.model_dump(), user_id=user_id))
+        else:
+            results.append(HTTPException(status_code=400, detail="Not enough food bags available"))
+    winners = [result for result in results if isinstance(result, models.Booking)]
+    if not winners:
+        db.rollback()
+        return results, 0, None
+
+    # Строка уже заблокирована FOR UPDATE; условие остаётся защитой для БД без блокировок строк
+    updated = db.execute(
+        update(models.FoodBag)
+        .where(models.FoodBag.id == food_bag_id, models.FoodBag.quantity >= allocated)
+        .values(quantity=models.FoodBag.quantity - allocated)
+    ).rowcount
+    if not updated:
+        db.rollback()
+        raise RuntimeError(f"Food bag {food_bag_id} changed during group booking")
+    db.add_all(winners)
+    db.flush()
+    version = bump_food_bags_version(db)
+    db.commit()
+    return results, allocated, version
+
+
 # Автоматическое удаление просроченных корзин
-def delete_expired_food_bags(db: Session):
+@dataclass
+class CleanupResult:
+    food_bags_deleted: int = 0
+    bookings_deleted: int = 0
+    chunks: int = 0
+    duration: float = 0.0  # секунды
+
+
+@db_function
+def delete_expired_food_bags(db: Session, chunk_size: int = None):
+    # Set-based удаление порциями по индексу pickup_time: сначала бронирования, затем корзины,
+    # commit после каждой порции - блокировки держатся недолго, объекты в память не грузятся
+    chunk_size = chunk_size or settings.CLEANUP_CHUNK_SIZE
     now = datetime.utcnow()
-    expired_bags = db.query(models.FoodBag).filter(models.FoodBag.pickup_time <= now).all()
-    count = len(expired_bags)
-    for bag in expired_bags:
-        db.delete(bag)
-    db.commit()
-    return count
+    started = time.perf_counter()
+    result = CleanupResult()
+    deleted = []  # (id, owner_id, address) - для фильтров подписчиков SSE
+    while True:
+        rows = db.execute(
+            select(models.FoodBag.id, models.FoodBag.owner_id, models.FoodBag.address)
+            .where(models.FoodBag.pickup_time <= now)
+            .order_by(models.FoodBag.pickup_time, models.FoodBag.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        ids = [row.id for row in rows]
+        result.bookings_deleted += db.execute(
+            delete(models.Booking).where(models.Booking.food_bag_id.in_(ids)),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+        result.food_bags_deleted += db.execute(
+            delete(models.FoodBag).where(models.FoodBag.id.in_(ids)),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+        # Версия - в транзакции каждой порции: порция видна читателям вместе с новой версией
+        version = bump_food_bags_version(db)
+        db.commit()
+        deleted.extend(rows)
+        result.chunks += 1
+        if len(ids) < chunk_size:
+            break
+    if result.food_bags_deleted:
+        _after_commit(event_broker.publish_deleted, deleted, version)
+        _after_commit(live_inventory.remove, [row.id for row in deleted], version)
+    result.duration = time.perf_counter() - started
+    return result
+
+
+# Асинхронные версии для роутеров.
+# Логика остаётся в синхронных функциях выше и выполняется через AsyncSession.run_sync:
+# ввод-вывод идёт через асинхронный драйвер и не блокирует event loop
+async def get_user_async(db: AsyncSession, user_id: int):
+    return await db.run_sync(get_user, user_id)
+
+
+async def get_user_by_email_async(db: AsyncSession, email: str):
+    return await db.run_sync(get_user_by_email, email)
+
+
+async def get_all_users_async(db: AsyncSession):
+    return await db.run_sync(get_all_users)
+
+
+async def get_all_user_rows_async(db: AsyncSession):
+    return await db.run_sync(get_all_user_rows)
+
+
+async def create_user_async(db: AsyncSession, email: str, hashed_password: str, role: str):
+    return await db.run_sync(create_user, email, hashed_password, role)
+
+
+async def update_user_role_async(db: AsyncSession, user_id: int, role: str):
+    return await db.run_sync(update_user_role, user_id, role)
+
+
+async def delete_user_async(db: AsyncSession, user_id: int):
+    return await db.run_sync(delete_user, user_id)
+
+
+async def authenticate_user_async(db: AsyncSession, email: str, password: str):
+    user = await get_user_by_email_async(db, email)
+    if not user:
+        return False
+    # bcrypt выполняется в пуле потоков, а не на event loop
+    valid, new_hash = await passwords.verify_and_update_async(password, user.hashed_password)
+    if not valid:
+        return False
+    if new_hash:
+        # Хэш со старой стоимостью - сохраняем пересчитанный
+        await db.run_sync(update_password_hash, user.id, new_hash)
+        user.hashed_password = new_hash
+    return user
+
+
+async def create_food_bag_async(db: AsyncSession, food_bag: schemas.FoodBagCreate, user_id: int):
+    return await db.run_sync(create_food_bag, food_bag, user_id)
+
+
+async def get_food_bag_async(db: AsyncSession, food_bag_id: int):
+    return await db.run_sync(get_food_bag, food_bag_id)
+
+
+async def get_food_bags_version_async(db: AsyncSession) -> int:
+    return await db.run_sync(get_food_bags_version)
+
+
+async def get_users_version_async(db: AsyncSession) -> int:
+    return await db.run_sync(get_users_version)
+
+
+async def get_food_bags_async(db: AsyncSession, **kwargs):
+    return await db.run_sync(get_food_bags, **kwargs)
+
+
+async def get_food_bag_rows_async(db: AsyncSession, **kwargs):
+    return await db.run_sync(get_food_bag_rows, **kwargs)
+
+
+async def iter_food_bags_async(db: AsyncSession, current_user=None, address: str = None,
+                               filter_expired: bool = False, after: Cursor = None, batch_size: int = 500):
+    # Серверный курсор (stream_results): строки читаются пачками, память не растёт с размером выборки
+    query = _food_bags_query(current_user, address, filter_expired, after)
+    result = await db.stream_scalars(query.execution_options(yield_per=batch_size))
+    async for food_bag in result:
+        yield food_bag
+
+
+async def get_food_bags_nearby_async(db: AsyncSession, **kwargs):
+    return await db.run_sync(get_food_bags_nearby, **kwargs)
+
+
+async def search_food_bags_async(db: AsyncSession, text: str, **kwargs):
+    return await db.run_sync(search_food_bags, text, **kwargs)
+
+
+async def update_food_bag_async(db: AsyncSession, food_bag_id: int, food_bag_update: schemas.FoodBagCreate,
+                                current_user):
+    return await db.run_sync(update_food_bag, food_bag_id, food_bag_update, current_user)
+
+
+async def delete_food_bag_async(db: AsyncSession, food_bag_id: int, current_user):
+    return await db.run_sync(delete_food_bag, food_bag_id, current_user)
+
+
+async def get_owned_food_bag_id_async(db: AsyncSession, food_bag_id: int, current_user):
+    return await db.run_sync(get_owned_food_bag_id, food_bag_id, current_user)
+
+
+async def set_food_bag_photo_async(db: AsyncSession, food_bag_id: int, photo_url: str, current_user):
+    return await db.run_sync(set_food_bag_photo, food_bag_id, photo_url, current_user)
+
+async def create_food_bags_async(db: AsyncSession, food_bags: list[schemas.FoodBagCreate], user_id: int):
+    return await db.run_sync(create_food_bags, food_bags, user_id)
+
+
+async def update_food_bags_async(db: AsyncSession, items: list[schemas.FoodBagBatchUpdateItem], current_user):
+    return await db.run_sync(update_food_bags, items, current_user)
+
+
+async def delete_food_bags_async(db: AsyncSession, food_bag_ids: list[int], current_user):
+    return await db.run_sync(delete_food_bags, food_bag_ids, current_user)
+
+
+async def _run_booking_with_retries(db: AsyncSession, food_bag_id: int, fn, *args):
+    # Повторы при deadlock ждут через asyncio.sleep, а не time.sleep
+    attempt = 0
+    while True:
+        try:
+            return await db.run_sync(fn, *args)
+        except OperationalError as e:
+            await db.rollback()
+            attempt += 1
+            if not is_retryable_db_error(e) or attempt > settings.BOOKING_MAX_RETRIES:
+                raise
+            booking_retries.inc()
+            logging.warning("Retrying booking for food_bag_id=%s after %s (attempt %s)", food_bag_id, e.orig, attempt)
+            await asyncio.sleep(booking_retry_delay(attempt))
+
+
+async def book_food_bag_async(db: AsyncSession, booking: schemas.BookingCreate, user_id: int):
+    db_booking, version = await _run_booking_with_retries(
+        db, booking.food_bag_id, _book_food_bag_once, booking, user_id
+    )
+    _booking_committed(booking.food_bag_id, booking.quantity, version)
+    return db_booking
+
+
+async def book_food_bag_group_async(db: AsyncSession, food_bag_id: int, requests):
+    results, allocated, version = await _run_booking_with_retries(
+        db, food_bag_id, book_food_bag_group, food_bag_id, requests
+    )
+    if allocated:
+        _booking_committed(food_bag_id, allocated, version)
+    return results
@@ -1,8 +1,21 @@
+import itertools
+import logging
 import os
-from sqlalchemy import create_engine
+import re
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import create_engine, exc, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from starlette.requests import Request
+from starlette.responses import Response
 from app.config import settings
+from app.metrics import db_read_sessions
+from app.pool_stats import instrumented_pool_class, register_engine
+
+logger = logging.getLogger(__name__)
 
 DB_USER = os.getenv("DB_USER", "user")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
@@ -10,36 +23,228 @@ DB_HOST = os.getenv("DB_HOST", "db")
 DB_NAME = os.getenv("DB_NAME", "foodbasket")
 
 SQLALCHEMY_DATABASE_URL = settings.database_url
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS_DIR = os.path.join(PROJECT_DIR, "migrations")
+STARTUP_LOCK_NAME = "quickbag_startup"
+
+
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+def pool_options(name: str, async_driver: bool = False) -> dict:
+    return dict(
+        poolclass=instrumented_pool_class(name, async_driver),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **pool_options("sync"))
+register_engine("sync", engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный движок для роутеров: запросы не блокируют event loop.
+# expire_on_commit=False - объекты остаются читаемыми после commit без повторной загрузки
+async_engine = create_async_engine(settings.async_database_url, **pool_options("async", async_driver=True))
+register_engine("async", async_engine)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# Реплики только для чтения (DB_REPLICA_URLS): списки, поиск, пользователи. Сессии выдаются по кругу;
+# session.info["replica"] - имя реплики. Синхронный движок и фоновые задачи работают только с основной БД
+def _replica_sessions() -> list:
+    sessions = []
+    for index, url in enumerate(url.strip() for url in settings.DB_REPLICA_URLS.split(",") if url.strip()):
+        name = f"replica{index}"
+        replica_engine = create_async_engine(url, **pool_options(name, async_driver=True))
+        register_engine(name, replica_engine)
+        sessions.append(async_sessionmaker(
+            bind=replica_engine, autoflush=False, expire_on_commit=False, info={"replica": name}
+        ))
+    return sessions
+
+
+ReplicaSessions = _replica_sessions()
+_next_replica = itertools.cycle(ReplicaSessions) if ReplicaSessions else None
+
 Base = declarative_base()
 
 
-# Перенесём импорт моделей и utils внутрь функций, чтобы избежать циклических импортов
+def run_migrations(url: str = None):
+    # Схема БД ведётся миграциями Alembic (migrations/versions) вместо create_all
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(PROJECT_DIR, "alembic.ini"))
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    config.set_main_option("sqlalchemy.url", (url or SQLALCHEMY_DATABASE_URL).replace("%", "%%"))
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+
+
+_REVISION_RE = re.compile(r"^(down_revision|revision)(?:\s*:[^=\n]+)?\s*=\s*['\"]([^'\"]+)['\"]", re.MULTILINE)
+
+
+def head_revision():
+    # Последняя ревизия по файлам migrations/versions - без импорта Alembic (~0.2 с на старте).
+    # None, если голов несколько или файлы не разобрать: тогда решает сам Alembic
+    revisions, parents = set(), set()
+    versions_dir = os.path.join(MIGRATIONS_DIR, "versions")
+    for name in os.listdir(versions_dir):
+        if not name.endswith(".py"):
+            continue
+        with open(os.path.join(versions_dir, name), encoding="utf-8") as f:
+            values = dict(_REVISION_RE.findall(f.read()))
+        if "revision" not in values:
+            return None
+        revisions.add(values["revision"])
+        if "down_revision" in values:
+            parents.add(values["down_revision"])
+    heads = revisions - parents
+    return heads.pop() if len(heads) == 1 else None
+
+
+def current_revision(connection):
+    # Ревизия, записанная Alembic в БД; None - схема ещё не создана
+    if not inspect(connection).has_table("alembic_version"):
+        return None
+    return connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+
+
+@contextmanager
+def startup_lock(name: str = STARTUP_LOCK_NAME):
+    # Межпроцессная блокировка на время миграций и создания администратора:
+    # воркеры uvicorn стартуют одновременно, работу выполняет один, остальные ждут и перепроверяют.
+    # В MySQL - GET_LOCK на отдельном соединении; SQLite (разработка, один воркер) - без блокировки
+    if engine.dialect.name != "mysql":
+        yield
+        return
+    with engine.connect() as connection:
+        acquired = connection.execute(
+            text("SELECT GET_LOCK(:name, :timeout)"), {"name": name, "timeout": settings.STARTUP_LOCK_TIMEOUT}
+        ).scalar()
+        if acquired != 1:
+            raise RuntimeError(f"Не удалось получить блокировку {name} за {settings.STARTUP_LOCK_TIMEOUT} с")
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": name})
+
+
+def ensure_schema():
+    head = head_revision()
+    with engine.connect() as connection:
+        current = current_revision(connection)
+    if head is not None and current == head:
+        return
+    if not settings.DB_AUTO_MIGRATE:
+        raise RuntimeError(
+            f"Схема БД на ревизии {current}, приложению нужна {head}: выполните alembic upgrade head"
+        )
+    with startup_lock():
+        # Пока ждали блокировку, миграции мог применить другой воркер
+        with engine.connect() as connection:
+            current = current_revision(connection)
+        if head is None or current != head:
+            logger.info("Applying migrations: %s -> %s", current, head or "head")
+            run_migrations()
+
+
+def seed_admin(email: str = "admin@admin", password: str = "admin") -> bool:
+    from . import models, passwords  # Локальный импорт: bcrypt нужен, только если администратора нет
+
+    def admin_exists(db) -> bool:
+        return db.query(models.User.id).filter(models.User.email == email).first() is not None
+
+    with SessionLocal() as db:
+        if admin_exists(db):
+            return False
+    with startup_lock():
+        with SessionLocal() as db:
+            if admin_exists(db):
+                return False
+            db.add(models.User(email=email, hashed_password=passwords.hash_password(password), role="admin"))
+            try:
+                db.commit()
+            except exc.IntegrityError:
+                # Администратора создал процесс без общей блокировки (SQLite)
+                db.rollback()
+                return False
+    logger.info("Created admin user %s", email)
+    return True
+
+
+# Вызывается из lifespan приложения (app/main.py), а не при импорте модуля
 def init_db():
-    from . import models, utils  # Локальный импорт
+    started = time.perf_counter()
+    ensure_schema()
+    seed_admin()
+    logger.info("Database ready in %.3fs", time.perf_counter() - started)
 
-    # Создаём таблицы
-    models.Base.metadata.create_all(bind=engine)
 
-    db = SessionLocal()
-    try:
-        # Создаем администратора если его нет
-        admin_email = "admin@admin"
-        admin = db.query(models.User).filter(models.User.email == admin_email).first()
-        if not admin:
-            hashed_password = utils.hash_password("admin")
-            admin = models.User(
-                email=admin_email,
-                hashed_password=hashed_password,
-                role="admin"
-            )
-            db.add(admin)
-            db.commit()
-    finally:
-        db.close()
+class ReadYourWrites:
+    """После записи чтения того же клиента DB_READ_YOUR_WRITES секунд идут в основную БД,
+    а не в реплику, которая могла ещё не получить изменения.
+
+    Метка ставится в двух местах: в памяти воркера по токену клиента (API-клиенты без cookie)
+    и в cookie с моментом окончания - её видят остальные воркеры и хосты.
+    """
+
+    COOKIE = "db_primary_until"
+
+    def __init__(self, window: float):
+        self.window = window
+        self._pins = {}  # токен -> time.monotonic() окончания
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _client_key(request: Request):
+        return request.headers.get("authorization") or request.cookies.get("access_token")
+
+    def pin(self, request: Request, response: Response):
+        if self.window <= 0:
+            return
+        key = self._client_key(request)
+        if key is not None:
+            now = time.monotonic()
+            with self._lock:
+                self._pins[key] = now + self.window
+                # Просроченные метки убираются, когда их становится много
+                if len(self._pins) > 10000:
+                    self._pins = {k: until for k, until in self._pins.items() if until > now}
+        response.set_cookie(
+            self.COOKIE, f"{time.time() + self.window:.3f}", max_age=int(self.window) + 1,
+            httponly=True, samesite="lax", secure=not settings.DEBUG
+        )
+
+    def pinned(self, request: Request) -> bool:
+        key = self._client_key(request)
+        if key is not None:
+            with self._lock:
+                until = self._pins.get(key)
+            if until is not None and until > time.monotonic():
+                return True
+        try:
+            until = float(request.cookies.get(self.COOKIE, 0))
+        except ValueError:
+            return False
+        # Cookie задаёт клиент: дальше окна вперёд она не действует
+        now = time.time()
+        return now < until <= now + self.window
+
+
+read_your_writes = ReadYourWrites(settings.DB_READ_YOUR_WRITES)
+
+
+def read_session(request: Request = None) -> AsyncSession:
+    # Сессия для чтения: реплика, если они настроены и клиент недавно не писал
+    if _next_replica is None:
+        return AsyncSessionLocal()
+    if request is not None and read_your_writes.pinned(request):
+        db_read_sessions.inc("pinned")
+        return AsyncSessionLocal()
+    db_read_sessions.inc("replica")
+    return next(_next_replica)()
 
 
 def get_db():
@@ -47,4 +252,17 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_read_db(request: Request):
+    async with read_session(request) as db:
+        yield db
+
+
+async def get_write_db(request: Request, response: Response):
+    # Основная БД; после изменяющего запроса чтения клиента ненадолго закрепляются за ней
+    if request.method not in ("GET", "HEAD"):
+        read_your_writes.pin(request, response)
+    async with AsyncSessionLocal() as db:
+        yield db
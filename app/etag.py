@@ -0,0 +1,26 @@
+import hashlib
+import time
+from typing import Optional
+
+from app.config import settings
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def expiry_bucket() -> int:
+    # Корзины пропадают из списка по pickup_time без записи в БД, поэтому в ETag входит
+    # номер временного окна: ответ устаревает не позже чем через FOOD_BAGS_ETAG_WINDOW секунд
+    return int(time.time() // settings.FOOD_BAGS_ETAG_WINDOW)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Сравнение слабых ETag: префикс W/ не учитывается
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
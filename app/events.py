@@ -0,0 +1,256 @@
+import asyncio
+import dataclasses
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+import orjson
+
+from app.config import settings
+from app.inventory import FoodBagSnapshot, live_inventory
+from app.serialization import food_bag_item
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class FoodBagEvent:
+    # payload - готовый кадр SSE: кодируется один раз на событие, а не на подписчика
+    type: str
+    payload: bytes
+    owner_id: Optional[int] = None  # None - неизвестен: подписчику с фильтром владельца не отправляется
+    address: Optional[str] = None  # None - неизвестен, проходит фильтр адреса
+    broadcast: bool = False  # для всех подписчиков (resync)
+
+
+def _frame(event_type: str, data: dict) -> bytes:
+    return b"event: " + event_type.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+class Subscriber:
+    """Ограниченный буфер одного клиента: переполнение - отключение, а не рост очереди."""
+
+    def __init__(self, owner_id: Optional[int], address: Optional[str], max_queue: int):
+        self.owner_id = owner_id
+        self.address = address.lower() if address else None
+        self.max_queue = max_queue
+        self.buffer = deque()
+        self.wakeup = asyncio.Event()
+        self.dropped = False
+
+    def matches(self, event: FoodBagEvent) -> bool:
+        if event.broadcast:
+            return True
+        # Фильтр владельца - это права (заведение видит только свои корзины): событие с неизвестным
+        # владельцем не проходит. Фильтр адреса только сужает поток
+        if self.owner_id is not None and event.owner_id != self.owner_id:
+            return False
+        if self.address is not None and event.address is not None and self.address not in event.address.lower():
+            return False
+        return True
+
+    def offer(self, event: FoodBagEvent):
+        if len(self.buffer) >= self.max_queue:
+            self.dropped = True
+            self.buffer.clear()
+        else:
+            self.buffer.append(event.payload)
+        self.wakeup.set()
+
+
+class EventBroker:
+    """Рассылка изменений корзин подписчикам SSE этого воркера.
+
+    crud публикует события после commit; рассылка всегда идёт в потоке event loop
+    (из других потоков - через call_soon_threadsafe). Изменения других воркеров приходят
+    разницей снимков живого индекса: пока есть подписчики, индекс сверяется с БД не реже
+    INVENTORY_SYNC_INTERVAL, и каждое найденное изменение рассылается обычным событием.
+    Без живого индекса видна только версия change_versions: подписчики получают resync,
+    не чаще раза в EVENTS_RESYNC_INTERVAL.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._loop = None
+        self._watcher = None
+        self.version = None  # версия change_versions, все изменения до которой уже разосланы
+        self.published = 0
+        self.dropped = 0
+        self.resyncs = 0
+        self._resync_at = 0.0
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    # Подписка
+    def subscribe(self, owner_id: Optional[int] = None, address: Optional[str] = None) -> Subscriber:
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(owner_id, address, settings.EVENTS_QUEUE_SIZE)
+        self._subscribers.add(subscriber)
+        if self._watcher is None or self._watcher.done():
+            self._watcher = self._loop.create_task(self._watch_remote_changes())
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    async def stream(self, owner_id: Optional[int] = None, address: Optional[str] = None):
+        # Генератор для StreamingResponse: кадры SSE и комментарий-heartbeat в простое.
+        # Подписка внутри генератора - отписка в finally гарантирована
+        subscriber = self.subscribe(owner_id, address)
+        try:
+            yield b": connected\n\n"
+            while True:
+                try:
+                    await asyncio.wait_for(subscriber.wakeup.wait(), timeout=settings.EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield b": heartbeat\n\n"
+                    continue
+                subscriber.wakeup.clear()
+                if subscriber.dropped:
+                    yield _frame("dropped", {"reason": "client too slow, reconnect and reload the list"})
+                    return
+                frames = b"".join(subscriber.buffer)
+                subscriber.buffer.clear()
+                yield frames
+        finally:
+            self.unsubscribe(subscriber)
+
+    # Публикация (вызывается из crud)
+    def publish_upserted(self, event_type: str, food_bags, version: Optional[int]):
+        events = []
+        if self._subscribers:
+            for food_bag in food_bags:
+                snapshot = FoodBagSnapshot.from_model(food_bag)
+                events.append(FoodBagEvent(
+                    event_type, _frame(event_type, food_bag_item(snapshot)), snapshot.owner_id, snapshot.address
+                ))
+        self._publish(events, version)
+
+    def publish_deleted(self, food_bags, version: Optional[int]):
+        # food_bags - (id, owner_id, address) удалённых строк: crud читает их до удаления, живой
+        # индекс мог уже забыть корзину (просроченные вычищаются из него сами)
+        events = []
+        if self._subscribers:
+            for food_bag_id, owner_id, address in food_bags:
+                events.append(FoodBagEvent("deleted", _frame("deleted", {"id": food_bag_id}), owner_id, address))
+        self._publish(events, version)
+
+    def publish_quantity(self, food_bag_id: int, delta: int, version: Optional[int]):
+        events = []
+        if self._subscribers:
+            snapshot = live_inventory.get(food_bag_id)
+            data = {"id": food_bag_id, "delta": delta}
+            if snapshot:
+                data["quantity"] = snapshot.quantity
+            events.append(FoodBagEvent(
+                "quantity", _frame("quantity", data),
+                snapshot.owner_id if snapshot else None, snapshot.address if snapshot else None,
+            ))
+        self._publish(events, version)
+
+    def publish_owner_deleted(self, owner_id: int, version: Optional[int]):
+        events = [FoodBagEvent("owner_deleted", _frame("owner_deleted", {"owner_id": owner_id}), owner_id)]
+        self._publish(events if self._subscribers else [], version)
+
+    def publish_remote(self, changed, removed, version: int):
+        # Слушатель перестройки живого индекса: changed - [(прежний снимок или None, новый)],
+        # removed - снимки удалённых. Свои записи сюда не попадают - индекс уже получил их через хуки
+        events = []
+        if self._subscribers:
+            for previous, snapshot in changed:
+                if previous is None:
+                    events.append(FoodBagEvent(
+                        "created", _frame("created", food_bag_item(snapshot)), snapshot.owner_id, snapshot.address
+                    ))
+                elif dataclasses.replace(previous, quantity=snapshot.quantity) == snapshot:
+                    data = {"id": snapshot.id, "delta": snapshot.quantity - previous.quantity, "quantity": snapshot.quantity}
+                    events.append(FoodBagEvent(
+                        "quantity", _frame("quantity", data), snapshot.owner_id, snapshot.address
+                    ))
+                else:
+                    events.append(FoodBagEvent(
+                        "updated", _frame("updated", food_bag_item(snapshot)), snapshot.owner_id, snapshot.address
+                    ))
+            for snapshot in removed:
+                events.append(FoodBagEvent(
+                    "deleted", _frame("deleted", {"id": snapshot.id}), snapshot.owner_id, snapshot.address
+                ))
+        self._publish(events, version, remote=True)
+
+    def _publish(self, events, version: Optional[int], remote: bool = False):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            on_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._fanout(events, version, remote)
+        else:
+            loop.call_soon_threadsafe(self._fanout, events, version, remote)
+
+    def _fanout(self, events, version: Optional[int], remote: bool = False):
+        # Своя запись: версия ровно +1. Иначе между ними была чужая - её разошлёт перестройка
+        # индекса (remote - уже она) или resync
+        if remote or (version is not None and self.version is not None and version == self.version + 1):
+            self.version = version
+        for event in events:
+            self.published += 1
+            for subscriber in list(self._subscribers):
+                if subscriber.dropped or not subscriber.matches(event):
+                    continue
+                subscriber.offer(event)
+                if subscriber.dropped:
+                    self.dropped += 1
+                    self._subscribers.discard(subscriber)
+                    logger.warning("SSE subscriber dropped: buffer overflow")
+
+    async def _watch_remote_changes(self):
+        from app import crud
+        from app.database import AsyncSessionLocal
+
+        while self._subscribers:
+            if settings.INVENTORY_ENABLED:
+                # Перестройка идёт фоном и сама вызывает publish_remote
+                if self.version is None:
+                    self.version = live_inventory.version
+                live_inventory.schedule_refresh()
+            else:
+                try:
+                    async with AsyncSessionLocal() as db:
+                        version = await crud.get_food_bags_version_async(db)
+                    self._resync(version)
+                except Exception as e:
+                    logger.error("SSE version watcher failed: %s", e)
+            await asyncio.sleep(settings.INVENTORY_SYNC_INTERVAL)
+
+    def _resync(self, version: int):
+        # Несколько чужих записей подряд - один resync: клиенты перечитывают список не чаще
+        # EVENTS_RESYNC_INTERVAL. Отложенный resync уходит со следующей сверкой (версия не сдвигается)
+        if self.version is None:
+            self.version = version
+            return
+        if version == self.version or time.monotonic() - self._resync_at < settings.EVENTS_RESYNC_INTERVAL:
+            return
+        self._resync_at = time.monotonic()
+        self.resyncs += 1
+        self._fanout([FoodBagEvent("resync", _frame("resync", {"version": version}), broadcast=True)], None)
+        self.version = version
+
+    def snapshot(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+            "resyncs": self.resyncs,
+            "version": self.version,
+        }
+
+
+event_broker = EventBroker()
+live_inventory.add_listener(event_broker.publish_remote)
@@ -0,0 +1,90 @@
+import math
+from typing import List, Tuple
+
+# Геохеш: строка в base32, каждый символ сужает ячейку; общий префикс = общая ячейка.
+# По колонке с геохешем работает обычный B-tree индекс (поиск по диапазону префикса).
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 12
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    result = []
+    bits = 0
+    bit_count = 0
+    even = True  # биты чередуются: долгота, широта, долгота...
+    while len(result) < precision:
+        rng, value = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            result.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(result)
+
+
+def cell_size_degrees(precision: int) -> Tuple[float, float]:
+    # (высота по широте, ширина по долготе) ячейки заданной точности
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def precision_for_radius(latitude: float, radius_km: float) -> int:
+    # Самая мелкая точность, при которой ячейка не меньше радиуса:
+    # тогда круг целиком покрывается ячейкой центра и восемью соседями
+    cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_deg, lon_deg = cell_size_degrees(precision)
+        if lat_deg * KM_PER_DEGREE >= radius_km and lon_deg * KM_PER_DEGREE * cos_lat >= radius_km:
+            return precision
+    return 1
+
+
+def covering_cells(latitude: float, longitude: float, radius_km: float) -> List[str]:
+    precision = precision_for_radius(latitude, radius_km)
+    lat_deg, lon_deg = cell_size_degrees(precision)
+    cells = set()
+    for d_lat in (-lat_deg, 0.0, lat_deg):
+        for d_lon in (-lon_deg, 0.0, lon_deg):
+            lat = min(max(latitude + d_lat, -90.0), 90.0)
+            lon = (longitude + d_lon + 180.0) % 360.0 - 180.0
+            cells.add(geohash_encode(lat, lon, precision))
+    return sorted(cells)
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, float, float]:
+    d_lat = radius_km / KM_PER_DEGREE
+    d_lon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    return latitude - d_lat, latitude + d_lat, longitude - d_lon, longitude + d_lon
+
+
+def longitude_ranges(min_lon: float, max_lon: float) -> List[Tuple[float, float]]:
+    # Долготы bounding box за ±180 переносятся на другую сторону антимеридиана: два диапазона
+    if max_lon - min_lon >= 360.0:
+        return [(-180.0, 180.0)]
+    if min_lon < -180.0:
+        return [(min_lon + 360.0, 180.0), (-180.0, max_lon)]
+    if max_lon > 180.0:
+        return [(min_lon, 180.0), (-180.0, max_lon - 360.0)]
+    return [(min_lon, max_lon)]
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
@@ -0,0 +1,336 @@
+import asyncio
+import contextvars
+import dataclasses
+import logging
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, contains_eager
+
+from app import models
+from app.config import settings
+from app.metrics import db_function
+
+logger = logging.getLogger(__name__)
+
+# Ключ сортировки, как в crud._food_bags_query: (pickup_time, id)
+_AFTER_ALL_IDS = float("inf")
+
+
+@dataclass(frozen=True, slots=True)
+class OwnerSnapshot:
+    id: int
+    email: str
+
+
+@dataclass(frozen=True, slots=True)
+class FoodBagSnapshot:
+    # Неизменяемая копия строки food_bags с владельцем; поля совпадают с FoodBagResponse
+    id: int
+    name: str
+    description: Optional[str]
+    photo_url: Optional[str]
+    price: float
+    discounted_price: float
+    quantity: int
+    address: str
+    pickup_time: datetime
+    latitude: Optional[float]
+    longitude: Optional[float]
+    owner_id: int
+    owner: OwnerSnapshot
+
+    @property
+    def key(self):
+        return self.pickup_time, self.id
+
+    @property
+    def owner_email(self):
+        return self.owner.email
+
+    @classmethod
+    def from_model(cls, food_bag: models.FoodBag) -> "FoodBagSnapshot":
+        return cls(
+            id=food_bag.id, name=food_bag.name, description=food_bag.description, photo_url=food_bag.photo_url,
+            price=food_bag.price, discounted_price=food_bag.discounted_price, quantity=food_bag.quantity,
+            address=food_bag.address, pickup_time=food_bag.pickup_time, latitude=food_bag.latitude,
+            longitude=food_bag.longitude, owner_id=food_bag.owner_id,
+            owner=OwnerSnapshot(id=food_bag.owner.id, email=food_bag.owner.email),
+        )
+
+
+class LiveInventory:
+    """Непросроченные корзины в памяти воркера: общий список по (pickup_time, id) и списки по владельцам.
+
+    Изменения этого воркера приходят через хуки в crud. Изменения других воркеров видны по
+    счётчику change_versions: не чаще раза в INVENTORY_SYNC_INTERVAL секунд фоновая задача
+    сверяет версию с БД и при расхождении перестраивает индекс целиком. Запрос перестройку
+    не ждёт: до её завершения отдаётся текущий снимок, чужие записи видны с задержкой не больше
+    интервала и времени перестройки.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rebuild_lock = None
+        self._refresh_task = None
+        self._listeners = []
+        self._reset()
+        self.version = None  # версия change_versions, которой соответствует содержимое; None - нужна перестройка
+        # После своей записи замечен пропуск версий: чужие изменения между ними придут с перестройкой
+        self.partial = False
+        self.synced_at = 0.0
+        self.rebuilds = 0
+
+    def _reset(self):
+        self._bags = {}
+        self._order = []
+        self._by_owner = {}
+
+    # Загрузка и синхронизация
+    @db_function
+    def rebuild(self, db: Session):
+        from app import crud  # Локальный импорт: crud сам вызывает хуки этого модуля
+
+        started = time.perf_counter()
+        # Версия читается до данных: если запись проскочит между ними, следующая сверка её заметит
+        version = crud.get_food_bags_version(db)
+        rows = db.execute(
+            select(models.FoodBag)
+            .join(models.User, models.FoodBag.owner)
+            .options(contains_eager(models.FoodBag.owner))
+            .where(models.FoodBag.pickup_time > datetime.utcnow())
+            .order_by(models.FoodBag.pickup_time, models.FoodBag.id)
+        ).scalars()
+        snapshots = [FoodBagSnapshot.from_model(food_bag) for food_bag in rows]
+        with self._lock:
+            previous = self._bags if self.version is not None else None
+            self._reset()
+            for snapshot in snapshots:
+                self._insert(snapshot)
+            self.version = version
+            self.partial = False
+            self.synced_at = time.monotonic()
+            self.rebuilds += 1
+        logger.info("Live inventory rebuilt: %s food bags, version %s, %.3fs",
+                    len(snapshots), version, time.perf_counter() - started)
+        if previous is not None and self._listeners:
+            self._notify(previous, snapshots, version)
+
+    def add_listener(self, listener):
+        # listener(changed, removed, version): разница снимков при перестройке - изменения,
+        # которых этот воркер не видел через хуки (записи других воркеров)
+        self._listeners.append(listener)
+
+    def _notify(self, previous: dict, snapshots, version: int):
+        now = datetime.utcnow()
+        current = {snapshot.id for snapshot in snapshots}
+        changed = [
+            (previous.get(snapshot.id), snapshot) for snapshot in snapshots if previous.get(snapshot.id) != snapshot
+        ]
+        # Просроченные пропадают из индекса без записи в БД - это не удаление
+        removed = [
+            snapshot for food_bag_id, snapshot in previous.items()
+            if food_bag_id not in current and snapshot.pickup_time > now
+        ]
+        if not changed and not removed:
+            return
+        for listener in self._listeners:
+            try:
+                listener(changed, removed, version)
+            except Exception:
+                logger.exception("Live inventory listener failed")
+
+    @property
+    def etag_version(self) -> str:
+        # Для ETag: с пропуском версий содержимое не совпадает с состоянием БД ни на одной версии,
+        # после перестройки на той же версии ETag должен смениться
+        return f"{self.version}p" if self.partial else str(self.version)
+
+    async def ensure_fresh(self):
+        # Ждёт только первая загрузка (индекс не загружен при старте или сброшен);
+        # дальше сверка и перестройка - фоновой задачей, запрос отдаёт текущий снимок
+        if self.version is None:
+            await self.refresh()
+        elif time.monotonic() - self.synced_at >= settings.INVENTORY_SYNC_INTERVAL:
+            self.schedule_refresh()
+
+    def schedule_refresh(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            # Пустой контекст, как у планировщика: задача не относится к запросу, который её начал
+            self._refresh_task = asyncio.get_running_loop().create_task(
+                self._refresh_in_background(), context=contextvars.Context()
+            )
+
+    async def _refresh_in_background(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error("Live inventory refresh failed: %s", e)
+
+    async def refresh(self):
+        # Сверка всегда с основной БД: хуки записи ведут версию основной, реплика может отставать
+        from app import crud
+        from app.database import AsyncSessionLocal
+
+        if self._rebuild_lock is None:
+            self._rebuild_lock = asyncio.Lock()
+        async with self._rebuild_lock:
+            if self.version is not None and time.monotonic() - self.synced_at < settings.INVENTORY_SYNC_INTERVAL:
+                return
+            # Отметка до обращения к БД: при ошибке следующая попытка - через интервал
+            self.synced_at = time.monotonic()
+            async with AsyncSessionLocal() as db:
+                version = await crud.get_food_bags_version_async(db)
+                if version == self.version and not self.partial:
+                    return
+                await db.run_sync(self.rebuild)
+
+    def _observe(self, version: Optional[int]):
+        # Версия после собственной записи: ровно +1 - других записей не было. Пропуск - между ними
+        # были чужие: запись применяется, индекс помечается partial до плановой перестройки
+        # (не чаще раза в INVENTORY_SYNC_INTERVAL, а не на каждый запрос)
+        if self.version is None:
+            return
+        if version is None or version != self.version + 1:
+            self.partial = True
+        if version is not None and version > self.version:
+            self.version = version
+
+    # Хуки записи (вызываются из crud после commit)
+    def upsert(self, food_bag: models.FoodBag, version: Optional[int] = None):
+        self.upsert_many([food_bag], version)
+
+    def upsert_many(self, food_bags, version: Optional[int] = None):
+        # Несколько корзин, записанных одной транзакцией (одно увеличение версии)
+        snapshots = [FoodBagSnapshot.from_model(food_bag) for food_bag in food_bags]
+        now = datetime.utcnow()
+        with self._lock:
+            for snapshot in snapshots:
+                self._delete(snapshot.id)
+                if snapshot.pickup_time > now:
+                    self._insert(snapshot)
+            self._observe(version)
+
+    def adjust_quantity(self, food_bag_id: int, delta: int, version: Optional[int] = None):
+        with self._lock:
+            snapshot = self._bags.get(food_bag_id)
+            if snapshot is not None:
+                self._replace(dataclasses.replace(snapshot, quantity=snapshot.quantity + delta))
+            self._observe(version)
+
+    def remove(self, food_bag_ids, version: Optional[int] = None):
+        with self._lock:
+            for food_bag_id in food_bag_ids:
+                self._delete(food_bag_id)
+            self._observe(version)
+
+    def remove_owner(self, owner_id: int, version: Optional[int] = None):
+        with self._lock:
+            for _, food_bag_id in list(self._by_owner.get(owner_id, ())):
+                self._delete(food_bag_id)
+            self._observe(version)
+
+    # Чтение
+    def get(self, food_bag_id: int) -> Optional[FoodBagSnapshot]:
+        return self._bags.get(food_bag_id)
+
+    def list_food_bags(self, current_user=None, address: str = None, limit: int = None, after=None):
+        now = datetime.utcnow()
+        needle = address.lower() if address else None
+        with self._lock:
+            self._purge_expired(now)
+            if current_user and current_user.role == "establishment":
+                keys = self._by_owner.get(current_user.id, [])
+            else:
+                keys = self._order
+            start = bisect_right(keys, (after[0], after[1])) if after else 0
+            result = []
+            for index in range(start, len(keys)):
+                snapshot = self._bags[keys[index][1]]
+                if needle is not None and needle not in snapshot.address.lower():
+                    continue
+                result.append(snapshot)
+                if limit and len(result) >= limit:
+                    break
+            return result
+
+    @db_function
+    def check(self, db: Session) -> dict:
+        # Сверка с БД: какие корзины отсутствуют, лишние или отличаются
+        from app import crud
+
+        expected = {
+            food_bag.id: FoodBagSnapshot.from_model(food_bag)
+            for food_bag in crud.get_food_bags(db, filter_expired=True)
+        }
+        now = datetime.utcnow()
+        with self._lock:
+            actual = {food_bag_id: snapshot for food_bag_id, snapshot in self._bags.items() if snapshot.pickup_time > now}
+            version = self.version
+        missing = sorted(expected.keys() - actual.keys())
+        extra = sorted(actual.keys() - expected.keys())
+        different = sorted(
+            food_bag_id for food_bag_id in expected.keys() & actual.keys()
+            if expected[food_bag_id] != actual[food_bag_id]
+        )
+        return {
+            "consistent": not (missing or extra or different),
+            "version": version,
+            "db_version": crud.get_food_bags_version(db),
+            "size": len(actual),
+            "missing": missing,
+            "extra": extra,
+            "different": different,
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._bags),
+                "owners": len(self._by_owner),
+                "version": self.version,
+                "partial": self.partial,
+                "synced_seconds_ago": round(time.monotonic() - self.synced_at, 3) if self.synced_at else None,
+                "rebuilds": self.rebuilds,
+            }
+
+    # Внутренние операции, вызываются под self._lock
+    def _insert(self, snapshot: FoodBagSnapshot):
+        self._bags[snapshot.id] = snapshot
+        insort(self._order, snapshot.key)
+        insort(self._by_owner.setdefault(snapshot.owner_id, []), snapshot.key)
+
+    def _replace(self, snapshot: FoodBagSnapshot):
+        self._delete(snapshot.id)
+        self._insert(snapshot)
+
+    def _delete(self, food_bag_id: int):
+        snapshot = self._bags.pop(food_bag_id, None)
+        if snapshot is None:
+            return
+        self._remove_key(self._order, snapshot.key)
+        owner_keys = self._by_owner.get(snapshot.owner_id)
+        if owner_keys is not None:
+            self._remove_key(owner_keys, snapshot.key)
+            if not owner_keys:
+                del self._by_owner[snapshot.owner_id]
+
+    @staticmethod
+    def _remove_key(keys: list, key):
+        index = bisect_left(keys, key)
+        if index < len(keys) and keys[index] == key:
+            del keys[index]
+
+    def _purge_expired(self, now: datetime):
+        # Просроченные всегда в начале общего списка
+        end = bisect_right(self._order, (now, _AFTER_ALL_IDS))
+        for _, food_bag_id in self._order[:end]:
+            self._delete(food_bag_id)
+
+
+live_inventory = LiveInventory()
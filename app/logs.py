@@ -0,0 +1,169 @@
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import re
+import sys
+import uuid
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from app.config import settings
+from app.metrics import log_records_dropped
+
+# Логи запроса пишет фоновый поток: обработчик в запросе только кладёт запись в очередь.
+# Сообщения - в стиле logger.info("... %s", value): при выключенном уровне строка не собирается
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+_request_sampled = contextvars.ContextVar("request_sampled", default=True)
+
+# Входящий X-Request-ID принимается, только если похож на идентификатор
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# Поля LogRecord, которые не считаются пользовательскими (extra=...)
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id", "color_message"}
+
+_listener = None
+
+
+def request_id():
+    return _request_id.get()
+
+
+def is_sampled(request_id: str, rate: float) -> bool:
+    # Решение по хэшу id: все записи одного запроса сохраняются или отбрасываются вместе,
+    # и одинаково во всех воркерах, через которые прошёл запрос
+    if rate >= 1:
+        return True
+    if rate <= 0:
+        return False
+    return zlib.crc32(request_id.encode()) < rate * 2 ** 32
+
+
+class RequestContextFilter(logging.Filter):
+    # Выполняется в потоке, который пишет лог, - пока доступен контекст запроса
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        # Предупреждения и ошибки сохраняются всегда; info запросов - с долей LOG_SAMPLE_RATE
+        return record.levelno >= logging.WARNING or _request_sampled.get()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s - %(levelname)s - %(message)s")
+
+    def formatMessage(self, record):
+        line = super().formatMessage(record)
+        rid = getattr(record, "request_id", None)
+        return f"{line} [{rid}]" if rid else line
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """Кладёт запись в ограниченную очередь; форматирование и запись - в потоке QueueListener.
+
+    В потоке запроса только собирается текст сообщения (аргументы могут измениться позже)
+    и трассировка исключения. Переполненная очередь не блокирует запрос: запись отбрасывается
+    и учитывается в log_records_dropped_total.
+    """
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record = logging.makeLogRecord(vars(record))
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped.inc()
+
+
+def setup_logging():
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+    records = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    handler = BackgroundQueueHandler(records)
+    handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(settings.LOG_LEVEL)
+    # Логи uvicorn (в том числе access) - через ту же очередь и в том же формате
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    # Остаток очереди дописывается при выходе процесса
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """Идентификатор запроса: из заголовка X-Request-ID (от прокси) или новый.
+
+    Попадает во все записи лога запроса и в заголовок ответа X-Request-ID.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                incoming = value.decode("latin-1")
+                break
+        rid = incoming if incoming and _REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+        id_token = _request_id.set(rid)
+        sampled_token = _request_sampled.set(is_sampled(rid, settings.LOG_SAMPLE_RATE))
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), (b"x-request-id", rid.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            _request_sampled.reset(sampled_token)
+            _request_id.reset(id_token)
@@ -1,57 +1,115 @@
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-from starlette.responses import FileResponse
-import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+import asyncio
 import logging
 
+from app.assets import INDEX, static_assets
 from app.database import init_db, SessionLocal
-from app.routers import auth, users, food_bags, bookings
+from app.routers import auth, users, food_bags, bookings, internal
 from sqlalchemy.orm import Session
 from app.crud import delete_expired_food_bags
-from fastapi_utils.tasks import repeat_every
+from app.config import settings
+from app.inventory import live_inventory
+from app.query_counter import QueryCounterMiddleware
+from app import metrics
+from app.logs import RequestIdMiddleware, setup_logging
+from app.photos import MEDIA_URL, MediaFiles, photo_pipeline
+from app.scheduler import scheduler
+from starlette.responses import PlainTextResponse
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Логи пишет фоновый поток (app/logs.py), запросы только ставят записи в очередь
+setup_logging()
 
-# Инициализация базы данных
-init_db()
+
+# Инициализация при старте воркера, а не при импорте модуля: импорт остаётся дешёвым,
+# а схема и администратор проверяются один раз (см. init_db)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(init_db)
+    await asyncio.to_thread(load_live_inventory)
+    await asyncio.to_thread(static_assets.load)
+    if settings.SCHEDULER_ENABLED:
+        scheduler.start()
+    yield
+    await scheduler.stop()
+    await photo_pipeline.drain()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Бюджет SQL-запросов на эндпоинт - только в dev и тестах
+if settings.QUERY_BUDGET_MODE != "off":
+    app.add_middleware(QueryCounterMiddleware)
+
+# Метрики добавляются последними - внешний слой, учитывает всё время запроса
+if settings.METRICS_ENABLED:
+    # Слушатели SQL ставятся при импорте, до первого запроса к БД: стек middleware строится
+    # лениво, при первом HTTP-запросе, когда планировщик уже может выполнять запрос
+    metrics.install()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def read_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Идентификатор запроса - самый внешний слой: он есть во всех записях лога запроса
+app.add_middleware(RequestIdMiddleware)
 
 # Подключение роутеров API
 app.include_router(auth, prefix="/auth", tags=["Auth"])
 app.include_router(users, prefix="/users", tags=["Users"])
 app.include_router(food_bags, prefix="/food-bags", tags=["Food Bags"])
 app.include_router(bookings, prefix="/bookings", tags=["Bookings"])
+app.include_router(internal, prefix="/internal", tags=["Internal"])
 
-for route in app.routes:
-    logging.info(f"Registered route: path={route.path}, name={route.name}, methods={route.methods}")
+# Статика фронтенда (app/assets.py): манифест и файлы в памяти, загружаются при старте
+app.mount("/static", static_assets, name="static")
 
-# Определяем абсолютный путь к папке со статикой относительно этого файла
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-STATIC_DIR = os.path.join(BASE_DIR, "static")
+# Фото корзин (app/photos.py): каталог создаётся при первой загрузке
+app.mount(MEDIA_URL, MediaFiles(directory=settings.MEDIA_DIR, check_dir=False), name="media")
 
-# Монтируем папку со статикой по пути /static
-app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
-
-# Эндпоинт для отдачи index.html при обращении к /
+# index.html - без обращения к диску, с ETag: повторный заход получает 304
 @app.get("/")
-async def read_index():
-    index_path = os.path.join(STATIC_DIR, "index.html")
-    if os.path.exists(index_path):
-        return FileResponse(index_path)
-    return {"detail": "index.html not found"}
-
-# Фоновая задача для удаления просроченных корзин, повторяется раз в час
-@app.on_event("startup")
-@repeat_every(seconds=60 * 60)  # каждые 60 минут
-def periodic_cleanup_expired_food_bags_task() -> None:
+async def read_index(request: Request):
+    return static_assets.response(INDEX, request.headers)
+
+# Живой индекс корзин загружается при старте, дальше его поддерживают хуки в crud
+def load_live_inventory() -> None:
+    if not settings.INVENTORY_ENABLED:
+        return
     db: Session = SessionLocal()
     try:
-        count = delete_expired_food_bags(db)
-        if count > 0:
-            print(f"Deleted {count} expired food bags")
+        live_inventory.rebuild(db)
     finally:
         db.close()
+
+# Удаление просроченных корзин. Запускается планировщиком (app/scheduler.py) в одном воркере
+# из всех процессов и хостов, каждые CLEANUP_INTERVAL секунд - корзины удаляются вскоре после pickup_time
+@scheduler.job("cleanup_expired_food_bags", seconds=settings.CLEANUP_INTERVAL)
+def cleanup_expired_food_bags(db: Session) -> dict:
+    try:
+        result = delete_expired_food_bags(db)
+    except Exception:
+        metrics.cleanup_runs.inc("failed")
+        raise
+    metrics.cleanup_runs.inc("success")
+    metrics.cleanup_deleted.inc("food_bags", amount=result.food_bags_deleted)
+    metrics.cleanup_deleted.inc("bookings", amount=result.bookings_deleted)
+    metrics.cleanup_duration.observe(result.duration)
+    if result.food_bags_deleted:
+        logger.info(
+            "Expired food bags cleanup: deleted %s food bags and %s bookings in %s chunks, %.3fs",
+            result.food_bags_deleted, result.bookings_deleted, result.chunks, result.duration,
+            extra={"food_bags_deleted": result.food_bags_deleted, "bookings_deleted": result.bookings_deleted},
+        )
+    return {
+        "food_bags_deleted": result.food_bags_deleted,
+        "bookings_deleted": result.bookings_deleted,
+        "chunks": result.chunks,
+    }
+
+
+# История запусков задач хранится SCHEDULER_HISTORY_DAYS дней
+scheduler.job("prune_job_runs", seconds=60 * 60)(scheduler.prune_history)
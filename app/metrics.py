@@ -0,0 +1,294 @@
+import contextvars
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Метрики процесса в текстовом формате Prometheus (GET /metrics).
+# Запись - одна блокировка и пара операций со словарём, поэтому метрики включены всегда.
+# Каждый воркер uvicorn отдаёт свои значения: Prometheus различает их по instance/pod
+
+# Границы корзин гистограмм, в секундах
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values) -> str:
+    if not labelnames:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)) + "}"
+
+
+def _format_value(value) -> str:
+    return str(int(value)) if isinstance(value, int) or float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # метки -> [счётчики корзин (последняя +Inf), сумма]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        labelnames = self.labelnames + ("le",)
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(labelnames, labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    # Значения читаются при каждом запросе /metrics функцией collect() -> [(метки, значение)].
+    # metric_type="counter" - для счётчиков, которые уже ведутся в другом месте (пул, bcrypt)
+    def __init__(self, name: str, documentation: str, labelnames=(), collect=None, metric_type: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+        self.metric_type = metric_type
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for labels, value in self.collect():
+            if value is not None:
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+# HTTP
+http_requests = Counter("http_requests_total", "HTTP requests by route template and status.",
+                        ("method", "route", "status"))
+http_request_duration = Histogram("http_request_duration_seconds", "HTTP request latency until the last body byte.",
+                                  ("method", "route"))
+
+# БД: метка - функция crud (или другая функция, помеченная db_function), в которой выполнен запрос
+db_queries = Counter("db_queries_total", "SQL statements executed, by calling function.", ("function",))
+db_query_errors = Counter("db_query_errors_total", "SQL statements that raised, by calling function.", ("function",))
+db_query_duration = Histogram("db_query_duration_seconds", "SQL statement execution time, by calling function.",
+                              ("function",), buckets=QUERY_BUCKETS)
+db_read_sessions = Counter("db_read_sessions_total",
+                           "Read sessions by target: replica, or pinned to the primary after a write.", ("target",))
+
+# Пароли, бронирования, логи, очистка
+password_hash_duration = Histogram("password_hash_duration_seconds", "bcrypt work time in the hashing thread pool.",
+                                   ("operation",), buckets=(0.01, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0, 5.0))
+bookings = Counter("bookings_total", "Booking attempts by outcome: success, sold_out, not_found, conflict, error.",
+                   ("outcome",))
+booking_retries = Counter("booking_retries_total", "Booking transactions retried after a deadlock or lock wait timeout.")
+log_records_dropped = Counter("log_records_dropped_total", "Log records dropped because the log queue was full.")
+cleanup_runs = Counter("cleanup_runs_total", "Expired food bag cleanup runs by status.", ("status",))
+cleanup_deleted = Counter("cleanup_deleted_total", "Rows deleted by the expired food bag cleanup.", ("table",))
+cleanup_duration = Histogram("cleanup_duration_seconds", "Expired food bag cleanup run time.",
+                             buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0))
+
+# Периодические задачи (app/scheduler.py): только запуски, выполненные этим воркером
+scheduler_runs = Counter("scheduler_runs_total", "Scheduled job runs executed by this worker, by job and status.",
+                         ("job", "status"))
+scheduler_run_duration = Histogram("scheduler_run_duration_seconds", "Scheduled job run time.", ("job",),
+                                   buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0))
+
+# Фото корзин (app/photos.py)
+photo_uploads = Counter("photo_uploads_total", "Photo uploads by result: stored, deduplicated, rejected.", ("result",))
+photo_thumbnails = Counter("photo_thumbnails_total", "Thumbnail jobs run in the process pool, by status.", ("status",))
+photo_thumbnail_duration = Histogram("photo_thumbnail_duration_seconds", "Time to build all thumbnails of a photo.",
+                                     buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+
+
+def _pool_gauges():
+    from app.pool_stats import POOL_STATS
+
+    def collect(field):
+        def values():
+            for stats in POOL_STATS.values():
+                pool = stats.engine.pool if stats.engine is not None else None
+                if pool is not None and hasattr(pool, field):
+                    yield (stats.name,), getattr(pool, field)()
+        return values
+
+    def counters(attribute):
+        def values():
+            for stats in POOL_STATS.values():
+                yield (stats.name,), getattr(stats, attribute)
+        return values
+
+    return [
+        Gauge("db_pool_size", "Configured pool size.", ("engine",), collect("size")),
+        Gauge("db_pool_checked_out", "Connections currently in use.", ("engine",), collect("checkedout")),
+        Gauge("db_pool_overflow", "Connections opened above pool size.", ("engine",), collect("overflow")),
+        Gauge("db_pool_checkouts_total", "Connections handed out.", ("engine",), counters("checkouts"), "counter"),
+        Gauge("db_pool_checkout_timeouts_total", "Connection checkouts that timed out.", ("engine",),
+              counters("timeouts"), "counter"),
+    ]
+
+
+def _app_gauges():
+    from app.events import event_broker
+    from app.inventory import live_inventory
+    from app.passwords import password_hasher
+
+    def hasher():
+        snapshot = password_hasher.snapshot()
+        yield ("running",), snapshot["running"]
+        yield ("queued",), snapshot["queued"]
+
+    return [
+        Gauge("password_hash_pending", "bcrypt jobs running and queued.", ("state",), hasher),
+        Gauge("live_inventory_size", "Food bags held by the in-memory inventory.", (),
+              lambda: [((), live_inventory.stats()["size"])]),
+        Gauge("sse_subscribers", "Open server-sent event streams.", (), lambda: [((), event_broker.subscribers)]),
+    ]
+
+
+METRICS = [
+    http_requests, http_request_duration, db_queries, db_query_errors, db_query_duration, db_read_sessions,
+    password_hash_duration, bookings, booking_retries, log_records_dropped,
+    cleanup_runs, cleanup_deleted, cleanup_duration, scheduler_runs, scheduler_run_duration,
+    photo_uploads, photo_thumbnails, photo_thumbnail_duration,
+]
+
+
+def render() -> str:
+    lines = []
+    for metric in METRICS + _pool_gauges() + _app_gauges():
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Метки запросов к БД
+_db_function = contextvars.ContextVar("db_function", default="other")
+
+
+def db_function(fn):
+    # Запросы внутри fn (и вложенных вызовов без своей метки) учитываются под её именем
+    name = fn.__qualname__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _db_function.set(name)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _db_function.reset(token)
+    return wrapper
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Слушатели, поставленные посреди запроса, видят его конец без начала - такой запрос не считается
+    query_started = conn.info.get("query_started")
+    if not query_started:
+        return
+    started = query_started.pop()
+    function = _db_function.get()
+    db_queries.inc(function)
+    db_query_duration.observe(time.perf_counter() - started, function)
+
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+    db_query_errors.inc(_db_function.get())
+
+
+def install():
+    # Слушатели на классе Engine: и синхронный движок, и async_engine.sync_engine
+    for name, listener in (
+        ("before_cursor_execute", _before_cursor_execute),
+        ("after_cursor_execute", _after_cursor_execute),
+        ("handle_error", _handle_error),
+    ):
+        if not event.contains(Engine, name, listener):
+            event.listen(Engine, name, listener)
+
+
+def route_label(scope) -> str:
+    # Шаблон пути вместо самого пути: /food-bags/{food_bag_id}, а не /food-bags/12.
+    # route.path у роутера, подключённого с prefix, - без префикса: он восстанавливается из пути запроса
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        root_path = scope.get("root_path")
+        return root_path + "/{path}" if root_path else "unmatched"
+    segments = scope["path"].split("/")
+    return "/".join(segments[:len(segments) - template.count("/")]) + template
+
+
+class MetricsMiddleware:
+    """Число и длительность HTTP-запросов по шаблону маршрута (до отправки последнего байта тела)."""
+
+    def __init__(self, app):
+        self.app = app
+        install()  # без app.main (бенчмарки); повторная установка ничего не делает
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = route_label(scope)
+            http_requests.inc(scope["method"], route, status)
+            http_request_duration.observe(time.perf_counter() - started, scope["method"], route)
+
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -6,7 +6,7 @@ from .database import Base
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     email = Column(String(100), unique=True, index=True)
     hashed_password = Column(String(100))
     role = Column(String(20))
@@ -18,7 +18,7 @@ class User(Base):
 class FoodBag(Base):
     __tablename__ = "food_bags"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String(100))
     description = Column(String(500))
     photo_url = Column(String(200), default="/placeholder.jpg")
@@ -27,19 +27,75 @@ class FoodBag(Base):
     quantity = Column(Integer)
     address = Column(String(200))
     pickup_time = Column(DateTime)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    geohash = Column(String(12), nullable=True)  # ячейка для поиска "рядом со мной"
     owner_id = Column(Integer, ForeignKey("users.id"))
 
-    owner = relationship("User", back_populates="food_bags")
+    # Владелец нужен в каждом ответе (FoodBagResponse.owner), поэтому грузится сразу
+    owner = relationship("User", back_populates="food_bags", lazy="joined")
     bookings = relationship("Booking", back_populates="food_bag", cascade="all, delete")
 
+    # Индексы меняются только миграциями (migrations/versions), здесь - их описание для ORM
+    __table_args__ = (
+        # Список клиента и чистка просроченных: WHERE pickup_time > ? ORDER BY pickup_time, id
+        Index("ix_food_bags_pickup_time_id", "pickup_time", "id"),
+        # Список заведения: WHERE owner_id = ? AND pickup_time > ? ORDER BY pickup_time
+        Index("ix_food_bags_owner_id_pickup_time", "owner_id", "pickup_time"),
+        Index("ix_food_bags_geohash", "geohash"),
+        # Переход корзин с исходного фото на превью: WHERE photo_url = ?
+        Index("ix_food_bags_photo_url", "photo_url"),
+        # Полнотекстовый индекс для поиска по словам; создаётся только в MySQL
+        Index("ix_food_bags_fulltext", "name", "description", "address", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
+
 
 class Booking(Base):
     __tablename__ = "bookings"
 
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    food_bag_id = Column(Integer, ForeignKey("food_bags.id"))
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    food_bag_id = Column(Integer, ForeignKey("food_bags.id"), index=True)
     quantity = Column(Integer)
 
     user = relationship("User", back_populates="bookings")
     food_bag = relationship("FoodBag", back_populates="bookings")
+
+
+class ChangeVersion(Base):
+    # Счётчики изменений данных: по ним строятся ETag ответов без чтения самих таблиц
+    __tablename__ = "change_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+class SchedulerJob(Base):
+    # Аренда периодической задачи (app/scheduler.py): задачу выполняет тот воркер,
+    # который первым обновил строку, когда подошло next_run_at и истекла чужая аренда
+    __tablename__ = "scheduler_jobs"
+
+    name = Column(String(100), primary_key=True)
+    next_run_at = Column(DateTime, nullable=False)
+    locked_by = Column(String(100), nullable=True)
+    locked_until = Column(DateTime, nullable=True)
+
+
+class JobRun(Base):
+    # История запусков периодических задач
+    __tablename__ = "job_runs"
+
+    id = Column(Integer, primary_key=True)
+    job = Column(String(100), nullable=False)
+    runner = Column(String(100), nullable=False)
+    status = Column(String(20), nullable=False)  # running, success, failed
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+    duration = Column(Float, nullable=True)  # секунды
+    detail = Column(String(1000), nullable=True)  # результат задачи (JSON) или текст ошибки
+
+    __table_args__ = (
+        # Последние запуски задачи и удаление старой истории
+        Index("ix_job_runs_job_started_at", "job", "started_at"),
+        Index("ix_job_runs_started_at", "started_at"),
+    )
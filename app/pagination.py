@@ -0,0 +1,24 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+
+# Курсор keyset-пагинации: позиция последней отданной корзины в порядке (pickup_time, id)
+Cursor = Tuple[datetime, int]
+
+
+def encode_cursor(pickup_time: datetime, food_bag_id: int) -> str:
+    raw = f"{pickup_time.isoformat()}|{food_bag_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Cursor]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        pickup_time, food_bag_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(pickup_time), int(food_bag_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
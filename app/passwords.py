@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from app.config import settings
+from app.metrics import password_hash_duration
+
+# Единственный CryptContext приложения. Хэши с другой стоимостью (rounds) считаются
+# устаревшими и перехэшируются при успешном входе
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """Пул потоков для bcrypt: работа уходит с event loop, число одновременных
+    хэширований ограничено, а переполненная очередь отвечает 503 вместо бесконечного ожидания."""
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.pending = 0  # в очереди + в работе
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait_sum = 0.0
+        self.queue_wait_max = 0.0
+        self.work_sum = 0.0
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many authentication requests, try again later",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            with self._lock:
+                self.running += 1
+                wait = started - submitted
+                self.queue_wait_sum += wait
+                self.queue_wait_max = max(self.queue_wait_max, wait)
+            try:
+                return fn(*args)
+            finally:
+                work = time.perf_counter() - started
+                password_hash_duration.observe(work, fn.__name__)
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+                    self.work_sum += work
+
+        # Место освобождает сама задача пула (завершилась или отменена до запуска), а не ожидающий
+        # запрос: отменённый клиентом запрос не должен пускать новые хэширования, пока bcrypt ещё занят
+        future = self._executor.submit(job)
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future):
+        with self._lock:
+            self.pending -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": self.pending - self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "queue_wait_seconds_sum": round(self.queue_wait_sum, 6),
+                "queue_wait_seconds_max": round(self.queue_wait_max, 6),
+                "work_seconds_sum": round(self.work_sum, 6),
+            }
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE)
+
+
+async def hash_password_async(password: str) -> str:
+    return await password_hasher.run(pwd_context.hash, password)
+
+
+async def verify_and_update_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    # (пароль верен, новый хэш или None, если перехэширование не требуется)
+    return await password_hasher.run(pwd_context.verify_and_update, plain_password, hashed_password)
@@ -0,0 +1,220 @@
+import asyncio
+import contextvars
+import hashlib
+import logging
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException, Request, status
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+from app import crud
+from app.config import settings
+from app.database import SessionLocal
+from app.metrics import photo_thumbnail_duration, photo_thumbnails, photo_uploads
+
+# Фото хранятся по содержимому: photos/<первые 2 символа sha256>/<sha256>.<ext> - исходный файл,
+# <sha256>-<ширина>.jpg - превью. Одинаковые фото разных корзин - один файл, а URL никогда
+# не меняет содержимое, поэтому файлы кэшируются навсегда (Cache-Control: immutable).
+MEDIA_URL = "/media"
+PHOTO_SIZES = sorted({int(size) for size in settings.PHOTO_SIZES.split(",") if size.strip()})
+DEFAULT_SIZE = settings.PHOTO_DEFAULT_SIZE if settings.PHOTO_DEFAULT_SIZE in PHOTO_SIZES else PHOTO_SIZES[-1]
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# Формат определяется по первым байтам, а не по Content-Type клиента
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"RIFF", "webp"),  # плюс b"WEBP" с 8-го байта, см. _sniff
+)
+_WRITE_CHUNK = 256 * 1024
+
+
+def _relative(key: str, name: str) -> str:
+    return f"photos/{key[:2]}/{name}"
+
+
+def media_path(key: str, name: str) -> str:
+    return os.path.join(settings.MEDIA_DIR, _relative(key, name))
+
+
+def original_url(key: str, ext: str) -> str:
+    return f"{MEDIA_URL}/{_relative(key, f'{key}.{ext}')}"
+
+
+def variant_url(key: str, width: int = DEFAULT_SIZE) -> str:
+    return f"{MEDIA_URL}/{_relative(key, f'{key}-{width}.jpg')}"
+
+
+def variant_targets(key: str) -> dict:
+    return {width: media_path(key, f"{key}-{width}.jpg") for width in PHOTO_SIZES}
+
+
+def variants_ready(key: str) -> bool:
+    return all(os.path.exists(path) for path in variant_targets(key).values())
+
+
+def _sniff(head: bytes):
+    for signature, ext in _SIGNATURES:
+        if head.startswith(signature) and (ext != "webp" or head[8:12] == b"WEBP"):
+            return ext
+    return None
+
+
+def _reject(status_code: int, detail: str):
+    photo_uploads.inc("rejected")
+    raise HTTPException(status_code=status_code, detail=detail)
+
+
+def _write(file, hasher, data: bytes):
+    # В потоке: и запись, и sha256 (hashlib отпускает GIL на больших блоках)
+    hasher.update(data)
+    file.write(data)
+
+
+def _store(temporary: str, key: str, ext: str) -> bool:
+    # Переименование в пределах MEDIA_DIR атомарно; такой файл уже есть - дубликат, копия удаляется
+    target = media_path(key, f"{key}.{ext}")
+    if os.path.exists(target):
+        os.remove(temporary)
+        return False
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(temporary, target)
+    return True
+
+
+async def save_upload(request: Request):
+    """Тело запроса потоком на диск: в памяти не больше одного блока. Возвращает (sha256, расширение)."""
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > settings.PHOTO_MAX_BYTES:
+        _reject(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "Photo is too large")
+
+    temporary_dir = os.path.join(settings.MEDIA_DIR, "tmp")
+    await asyncio.to_thread(os.makedirs, temporary_dir, exist_ok=True)
+    temporary = os.path.join(temporary_dir, uuid.uuid4().hex)
+    hasher = hashlib.sha256()
+    file = await asyncio.to_thread(open, temporary, "wb")
+    try:
+        ext = None
+        size = 0
+        buffer = bytearray()
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > settings.PHOTO_MAX_BYTES:
+                _reject(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "Photo is too large")
+            buffer += chunk
+            if ext is None and len(buffer) >= 12:
+                ext = _sniff(bytes(buffer[:12]))
+                if ext is None:
+                    _reject(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, "Photo must be JPEG, PNG or WebP")
+            if len(buffer) >= _WRITE_CHUNK:
+                await asyncio.to_thread(_write, file, hasher, bytes(buffer))
+                buffer.clear()
+        if ext is None:
+            _reject(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, "Photo must be JPEG, PNG or WebP")
+        await asyncio.to_thread(_write, file, hasher, bytes(buffer))
+        await asyncio.to_thread(file.close)
+        key = hasher.hexdigest()
+        stored = await asyncio.to_thread(_store, temporary, key, ext)
+    except BaseException:
+        file.close()
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    photo_uploads.inc("stored" if stored else "deduplicated")
+    return key, ext
+
+
+class PhotoPipeline:
+    """Превью в пуле процессов, вне запроса и вне event loop.
+
+    Пока превью нет, корзина показывает исходный файл; после обработки все корзины с этим файлом
+    переходят на превью DEFAULT_SIZE (crud.replace_food_bag_photo). Одно фото, загруженное
+    несколько раз, обрабатывается одной задачей; превью, которые уже есть на диске, не пересчитываются.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool = None
+        self._pending = {}
+
+    def _executor(self) -> ProcessPoolExecutor:
+        # Пул создаётся при первой загрузке: старт воркера не ждёт процессов Pillow.
+        # spawn, а не fork: у воркера уже есть потоки (логи, пул БД), fork их не переносит
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def ensure(self, key: str, ext: str):
+        # Вызывается после коммита photo_url: задача, завершившаяся раньше, этой корзины не видела
+        if key in self._pending:
+            return
+        # Пустой контекст, как у планировщика: работа не относится к запросу, который её начал
+        self._pending[key] = asyncio.get_running_loop().create_task(
+            self._process(key, ext), context=contextvars.Context()
+        )
+
+    async def _process(self, key: str, ext: str):
+        try:
+            if not await asyncio.to_thread(variants_ready, key):
+                # Pillow импортируется при первом фото, а не при старте воркера
+                from app.thumbnails import make_thumbnails
+
+                loop = asyncio.get_running_loop()
+                duration = await loop.run_in_executor(
+                    self._executor(), make_thumbnails, media_path(key, f"{key}.{ext}"),
+                    variant_targets(key), settings.PHOTO_QUALITY,
+                )
+                photo_thumbnails.inc("success")
+                photo_thumbnail_duration.observe(duration)
+        except Exception as e:
+            photo_thumbnails.inc("failed")
+            logging.error("Thumbnails for photo %s failed: %s", key, e)
+            self._pending.pop(key, None)
+            return
+        # Снимается до обновления БД: корзина, закоммиченная позже, запустит обновление сама
+        self._pending.pop(key, None)
+        try:
+            await asyncio.to_thread(self._publish, key, ext)
+        except Exception as e:
+            logging.error("Switching food bags to thumbnails of photo %s failed: %s", key, e)
+
+    @staticmethod
+    def _publish(key: str, ext: str):
+        with SessionLocal() as db:
+            updated = crud.replace_food_bag_photo(db, original_url(key, ext), variant_url(key))
+        if updated:
+            logging.info("Photo %s: %s food bags switched to thumbnails", key, updated)
+
+    async def drain(self):
+        # Остановка воркера: незавершённые превью дописываются, пул закрывается
+        if self._pending:
+            await asyncio.gather(*self._pending.values(), return_exceptions=True)
+        if self._pool is not None:
+            await asyncio.to_thread(self._pool.shutdown)
+            self._pool = None
+
+
+photo_pipeline = PhotoPipeline(settings.PHOTO_WORKERS)
+
+
+class MediaFiles(StaticFiles):
+    """Раздача /media: адреса фото неизменяемы, поэтому кэш браузера и CDN - на год.
+
+    С MEDIA_ACCEL_REDIRECT файл отдаёт nginx (X-Accel-Redirect на internal location),
+    иначе - FileResponse Starlette (http.response.pathsend, если сервер его поддерживает).
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        if settings.MEDIA_ACCEL_REDIRECT:
+            relative = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+            response = Response(status_code=status_code, headers={
+                "X-Accel-Redirect": f"{settings.MEDIA_ACCEL_REDIRECT.rstrip('/')}/{relative}",
+            })
+        else:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["Cache-Control"] = IMMUTABLE
+        return response
@@ -0,0 +1,89 @@
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Границы корзин гистограммы ожидания соединения, в секундах
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class PoolStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.engine = None
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.wait_counts = [0] * (len(WAIT_BUCKETS) + 1)  # последняя корзина - +Inf
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_sum += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self.wait_counts[bisect_left(WAIT_BUCKETS, seconds)] += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        pool = self.engine.pool if self.engine is not None else None
+        with self._lock:
+            cumulative = 0
+            histogram = {}
+            for bound, count in zip(WAIT_BUCKETS + (float("inf"),), self.wait_counts):
+                cumulative += count
+                histogram["+Inf" if bound == float("inf") else str(bound)] = cumulative
+            return {
+                "name": self.name,
+                "size": pool.size() if pool is not None else None,
+                "checked_out": pool.checkedout() if pool is not None else None,
+                "checked_in": pool.checkedin() if pool is not None else None,
+                "overflow": pool.overflow() if pool is not None else None,
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "wait_seconds_sum": round(self.wait_sum, 6),
+                "wait_seconds_max": round(self.wait_max, 6),
+                "wait_seconds_histogram": histogram,
+            }
+
+
+# Статистика всех инструментированных пулов процесса по имени движка
+POOL_STATS: dict = {}
+
+
+def instrumented_pool_class(name: str, async_driver: bool = False):
+    # Отдельный подкласс на каждый движок: статистика хранится в классе и переживает
+    # пересоздание пула (engine.dispose() создаёт новый экземпляр того же класса)
+    stats = POOL_STATS.setdefault(name, PoolStats(name))
+    base = AsyncAdaptedQueuePool if async_driver else QueuePool
+
+    class InstrumentedPool(base):
+        pool_stats = stats
+
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                connection = super().connect()
+            except exc.TimeoutError:
+                self.pool_stats.record_timeout()
+                raise
+            self.pool_stats.record_wait(time.perf_counter() - started)
+            return connection
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
+
+
+def register_engine(name: str, engine):
+    # Для асинхронного движка пул живёт на sync_engine
+    POOL_STATS[name].engine = getattr(engine, "sync_engine", engine)
+
+
+def pool_stats_snapshot() -> list:
+    return [stats.snapshot() for stats in POOL_STATS.values()]
@@ -0,0 +1,124 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Principal:
+    # Снимок пользователя для авторизации: не привязан к сессии БД, безопасно хранить между запросами
+    id: int
+    email: str
+    role: str
+
+
+class PrincipalCache:
+    """LRU-кэш с TTL: (user_id, token) -> Principal.
+
+    Свои изменения сбрасываются сразу (invalidate_user после commit). Смену роли и удаление
+    в других воркерах кэш узнаёт по версии users в change_versions: не чаще раза в
+    check_interval фоновая задача читает её из основной БД и при изменении очищает кэш целиком.
+    Устаревшая роль живёт не дольше check_interval; если сверка не удаётся - не дольше TTL.
+    """
+
+    def __init__(self, max_size: int, ttl: float, check_interval: float = 1.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.version = None  # версия users, с которой сверено содержимое
+        self.checked_at = 0.0
+        self._check_task = None
+        self._entries = OrderedDict()  # (user_id, token) -> (principal, expires_at)
+        self._keys_by_user = {}  # user_id -> set ключей, для инвалидации
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, token: str) -> Optional[Principal]:
+        key = (user_id, token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return principal
+
+    def set(self, token: str, principal: Principal, token_expires_at: Optional[float] = None):
+        # Запись не переживает сам токен
+        ttl = self.ttl
+        if token_expires_at is not None:
+            ttl = min(ttl, token_expires_at - time.time())
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        key = (principal.id, token)
+        with self._lock:
+            self._entries[key] = (principal, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            self._keys_by_user.setdefault(principal.id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for key in self._keys_by_user.pop(user_id, ()):
+                self._entries.pop(key, None)
+
+    def schedule_check(self):
+        if time.monotonic() - self.checked_at < self.check_interval:
+            return
+        if self._check_task is None or self._check_task.done():
+            # Пустой контекст: запрос к БД не относится к запросу API, который начал сверку
+            self._check_task = asyncio.get_running_loop().create_task(
+                self._check_in_background(), context=contextvars.Context()
+            )
+
+    async def _check_in_background(self):
+        try:
+            await self.check()
+        except Exception as e:
+            logger.error("Principal cache version check failed: %s", e)
+
+    async def check(self):
+        # Версия - из основной БД: реплика может отставать от смены роли
+        from app import crud
+        from app.database import AsyncSessionLocal
+
+        # Отметка до обращения к БД: при ошибке следующая попытка - через интервал
+        self.checked_at = time.monotonic()
+        async with AsyncSessionLocal() as db:
+            version = await crud.get_users_version_async(db)
+        self.sync(version)
+
+    def sync(self, version: int):
+        # Первая сверка тоже очищает: записи до неё ни с какой версией не сверены
+        if version != self.version:
+            self.clear()
+            self.version = version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+
+principal_cache = PrincipalCache(
+    settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL, settings.PRINCIPAL_CACHE_CHECK_INTERVAL
+)
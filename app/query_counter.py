@@ -0,0 +1,85 @@
+import contextvars
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+@dataclass
+class QueryCounter:
+    count: int = 0
+    budget: Optional[int] = None  # задаётся зависимостью query_budget() эндпоинта
+    statements: list = field(default_factory=list)
+
+
+_current_counter = contextvars.ContextVar("query_counter", default=None)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.count += 1
+        counter.statements.append(statement)
+
+
+def install():
+    # Слушатель на классе Engine: видит и синхронный движок, и async_engine.sync_engine
+    if not event.contains(Engine, "before_cursor_execute", _count_query):
+        event.listen(Engine, "before_cursor_execute", _count_query)
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+
+
+def query_budget(limit: int):
+    # Зависимость эндпоинта: сколько SQL-запросов допускается на один запрос к API,
+    # независимо от числа строк в ответе. Без включённого счётчика ничего не делает
+    async def set_query_budget():
+        counter = _current_counter.get()
+        if counter is not None:
+            counter.budget = limit
+    return set_query_budget
+
+
+def check_budget(counter: QueryCounter, endpoint: str):
+    if counter.budget is None or counter.count <= counter.budget:
+        return
+    message = f"Query budget exceeded for {endpoint}: {counter.count} > {counter.budget}"
+    if settings.QUERY_BUDGET_MODE == "raise":
+        raise QueryBudgetExceeded(message + "\n" + "\n".join(counter.statements))
+    logging.error(message)
+
+
+class QueryCounterMiddleware:
+    """Считает SQL-запросы каждого HTTP-запроса и сверяет их с бюджетом эндпоинта.
+
+    Включается настройкой QUERY_BUDGET_MODE (warn - лог, raise - исключение) в dev и тестах.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        install()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with count_queries() as counter:
+            await self.app(scope, receive, send)
+        check_budget(counter, f"{scope['method']} {scope['path']}")
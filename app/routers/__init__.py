@@ -2,10 +2,12 @@ from .users import router as users
 from .food_bags import router as food_bags
 from .bookings import router as bookings
 from .auth import router as auth
+from .internal import router as internal
 
 __all__ = [
     "users",
     "food_bags",
     "bookings",
-    "auth"
+    "auth",
+    "internal"
 ]
@@ -1,11 +1,11 @@
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, status, Response, Form, Request
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Response, Form
+from jose import jwt
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import schemas, crud
-from app.database import get_db
+from app.database import get_write_db
 from app.config import settings
+from app.utils import get_current_user
 
 router = APIRouter(tags=["Auth"])
 
@@ -13,60 +13,20 @@ SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
-security = HTTPBearer()
-
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(
-    request: Request,
-    db: Session = Depends(get_db),
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-
-    token = None
-
-    # Попытка получить токен из заголовка Authorization
-    if credentials:
-        token = credentials.credentials
-    else:
-        # Попытка получить токен из cookie 'access_token'
-        token_in_cookie = request.cookies.get("access_token")
-        if token_in_cookie and token_in_cookie.startswith("Bearer "):
-            token = token_in_cookie[len("Bearer "):]
-
-    if token is None:
-        raise credentials_exception
-
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-
-    user = crud.get_user(db, int(user_id))
-    if user is None:
-        raise credentials_exception
-    return user
-
 @router.post("/login", response_model=schemas.Token)
 async def login(
     response: Response,
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_write_db)
 ):
-    user = crud.authenticate_user(db, email, password)
+    user = await crud.authenticate_user_async(db, email, password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
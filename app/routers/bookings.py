@@ -1,9 +1,15 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app import schemas, crud, models
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import schemas, crud
+from app.booking_pipeline import booking_committer
+from app.config import settings
+from app.database import get_write_db
+from app.metrics import bookings as booking_outcomes
+from sqlalchemy.exc import OperationalError
 from app.utils import get_current_user
+from app.principal_cache import Principal
+from app.query_counter import query_budget
 
 router = APIRouter(
     tags=["Bookings"]
@@ -13,41 +19,46 @@ router = APIRouter(
 def ping():
     return {"ping": "pong"}
 
-@router.post("/", response_model=schemas.BookingResponse, status_code=status.HTTP_201_CREATED)
-def create_booking(
+# Пользователь + списание + вставка + версия (UPDATE и SELECT) + refresh бронирования
+@router.post("/", response_model=schemas.BookingResponse, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(query_budget(6))])
+async def create_booking(
     booking: schemas.BookingCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_write_db),
+    current_user: Principal = Depends(get_current_user)
 ):
+    # Ленивое форматирование: при выключенном уровне или отброшенном сэмплом запросе строка не собирается
+    fields = {"user_id": current_user.id, "food_bag_id": booking.food_bag_id}
     logging.info(
-        f"Booking attempt by user_id={current_user.id} "
-        f"email={current_user.email} role={current_user.role} "
-        f"food_bag_id={booking.food_bag_id} quantity={booking.quantity}"
+        "Booking attempt by user_id=%s email=%s role=%s food_bag_id=%s quantity=%s",
+        current_user.id, current_user.email, current_user.role, booking.food_bag_id, booking.quantity,
+        extra=fields,
     )
 
     # Проверка роли пользователя - только "client" может бронировать
     if current_user.role != "client":
-        logging.warning(f"Booking forbidden for user_id={current_user.id} with role={current_user.role}")
+        logging.warning("Booking forbidden for user_id=%s with role=%s", current_user.id, current_user.role,
+                        extra=fields)
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only clients can book food bags")
 
-    # Проверка существования корзины в БД
-    food_bag = crud.get_food_bag(db, booking.food_bag_id)
-    if not food_bag:
-        logging.warning(f"Food bag with id={booking.food_bag_id} not found for booking")
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Food bag not found")
-
-    # Проверка доступного количества корзин
-    if food_bag.quantity < booking.quantity:
-        logging.warning(
-            f"Not enough quantity for food_bag_id={booking.food_bag_id}: requested={booking.quantity}, available={food_bag.quantity}"
-        )
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Not enough food bags available")
-
-    # Попытка создать бронирование в базе
+    # Наличие и остаток проверяются внутри crud.book_food_bag_async одним условным UPDATE,
+    # предварительная выборка корзины здесь не нужна. В режиме групповой фиксации запрос ждёт
+    # общей транзакции с другими бронированиями той же корзины
     try:
-        db_booking = crud.book_food_bag(db, booking, current_user.id)
-        logging.info(f"Booking created successfully with id={db_booking.id} for user_id={current_user.id}")
+        if settings.BOOKING_GROUP_COMMIT:
+            db_booking = await booking_committer.book(booking, current_user.id)
+        else:
+            db_booking = await crud.book_food_bag_async(db, booking, current_user.id)
+        logging.info("Booking created successfully with id=%s for user_id=%s", db_booking.id, current_user.id,
+                     extra=fields)
+        booking_outcomes.inc("success")
         return db_booking
+    except HTTPException as e:
+        booking_outcomes.inc("not_found" if e.status_code == status.HTTP_404_NOT_FOUND else "sold_out")
+        logging.warning("Booking rejected for food_bag_id=%s: %s", booking.food_bag_id, e.detail, extra=fields)
+        raise
     except Exception as e:
-        logging.error(f"Error occurred while creating booking: {e}", exc_info=True)
+        # conflict - повторы после deadlock / lock wait timeout исчерпаны
+        booking_outcomes.inc("conflict" if isinstance(e, OperationalError) and crud.is_retryable_db_error(e) else "error")
+        logging.error("Error occurred while creating booking: %s", e, exc_info=True, extra=fields)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not create booking")
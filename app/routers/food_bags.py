@@ -1,8 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
 from app import schemas, crud
-from app.database import get_db
+from app.config import settings
+from app.database import get_read_db, get_write_db, read_session, AsyncSessionLocal
+from app.etag import etag_matches, expiry_bucket, make_etag
+from app.events import event_broker
+from app.inventory import live_inventory
+from app.pagination import decode_cursor, encode_cursor
+from app.photos import original_url, photo_pipeline, save_upload, variant_url, variants_ready
+from app.query_counter import query_budget
+from app.serialization import fast_json_response, food_bag_item
 from app.utils import get_current_user, require_role
 
 router = APIRouter(tags=["Food Bags"])
@@ -11,30 +21,194 @@ router = APIRouter(tags=["Food Bags"])
 @router.post("/", response_model=schemas.FoodBagResponse)
 async def create_food_bag(
     food_bag: schemas.FoodBagCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_write_db),
     current_user=Depends(require_role(["establishment", "admin"]))
 ):
-    return crud.create_food_bag(db=db, food_bag=food_bag, user_id=current_user.id)
+    return await crud.create_food_bag_async(db=db, food_bag=food_bag, user_id=current_user.id)
 
 
-@router.get("/", response_model=list[schemas.FoodBagResponse])
+async def _stream_food_bags(request: Request, current_user, address: Optional[str], after):
+    # Своя сессия: генератор дочитывается уже после выхода из зависимости get_read_db
+    async with read_session(request) as db:
+        async for food_bag in crud.iter_food_bags_async(
+            db, current_user=current_user, address=address, filter_expired=True,
+            after=after, batch_size=settings.FOOD_BAGS_STREAM_BATCH
+        ):
+            yield schemas.FoodBagResponse.model_validate(food_bag).model_dump_json() + "\n"
+
+
+async def _verify_inventory_page(db: AsyncSession, food_bags, current_user, address, limit, after):
+    # Режим проверки: та же страница из БД, расхождения только логируются
+    expected = await crud.get_food_bags_async(
+        db=db, current_user=current_user, address=address, filter_expired=True, limit=limit, after=after
+    )
+    expected = [schemas.FoodBagResponse.model_validate(food_bag) for food_bag in expected]
+    actual = [schemas.FoodBagResponse.model_validate(food_bag) for food_bag in food_bags]
+    if expected != actual:
+        logging.warning(
+            "Live inventory mismatch for user %s: db ids=%s, inventory ids=%s", current_user.id,
+            [food_bag.id for food_bag in expected], [food_bag.id for food_bag in actual]
+        )
+
+
+# Бюджеты SQL-запросов не зависят от числа корзин в ответе: владельцы грузятся тем же запросом.
+# Список: пользователь + версия + перестройка индекса (версия и выборка) или выборка из БД
+@router.get("/", response_model=list[schemas.FoodBagResponse], dependencies=[Depends(query_budget(4))])
 async def read_food_bags(
+    request: Request,
+    response: Response,
     address: str = None,
-    db: Session = Depends(get_db),
+    limit: int = Query(settings.FOOD_BAGS_PAGE_SIZE, ge=1, le=settings.FOOD_BAGS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_read_db),
+    current_user=Depends(get_current_user)
+):
+    after = decode_cursor(cursor)
+
+    # NDJSON: по одной корзине в строке, без ограничения limit
+    if stream:
+        return StreamingResponse(
+            _stream_food_bags(request, current_user, address, after),
+            media_type="application/x-ndjson"
+        )
+
+    # Условный GET: версия читается до данных, и при совпадении ETag таблица food_bags не трогается.
+    # С живым индексом версия берётся из памяти и сверяется с основной БД фоном, не чаще INVENTORY_SYNC_INTERVAL
+    if settings.INVENTORY_ENABLED:
+        await live_inventory.ensure_fresh()
+        version = live_inventory.etag_version
+    else:
+        version = await crud.get_food_bags_version_async(db)
+    etag = make_etag(
+        version, expiry_bucket(), current_user.id, current_user.role, address, limit, cursor
+    )
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    # Только не просроченные корзины; лишняя строка показывает, есть ли следующая страница
+    if settings.INVENTORY_ENABLED:
+        food_bags = live_inventory.list_food_bags(current_user, address, limit=limit + 1, after=after)
+        if settings.INVENTORY_VERIFY:
+            # Индекс строится по основной БД - с ней и сверяется
+            async with AsyncSessionLocal() as primary:
+                await _verify_inventory_page(primary, food_bags, current_user, address, limit + 1, after)
+    else:
+        # Быстрый путь читает только нужные колонки, без ORM-объектов
+        read = crud.get_food_bag_rows_async if settings.FAST_JSON_RESPONSES else crud.get_food_bags_async
+        food_bags = await read(
+            db=db, current_user=current_user, address=address, filter_expired=True,
+            limit=limit + 1, after=after
+        )
+    if len(food_bags) > limit:
+        food_bags = food_bags[:limit]
+        last = food_bags[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.pickup_time, last.id)
+    if settings.FAST_JSON_RESPONSES:
+        return fast_json_response([food_bag_item(food_bag) for food_bag in food_bags], response)
+    return food_bags
+
+
+@router.get("/events")
+async def food_bag_events(
+    address: Optional[str] = None,
+    owner_id: Optional[int] = None,
+    current_user=Depends(get_current_user)
+):
+    # Server-sent events: created / updated / deleted / quantity / owner_deleted (изменения других
+    # воркеров - теми же событиями после сверки живого индекса), resync - только без живого индекса.
+    # Пользователь проверяется до начала потока, соединение БД на время подписки не держится.
+    # Заведение видит только свои корзины
+    if current_user.role == "establishment":
+        owner_id = current_user.id
+    if event_broker.subscribers >= settings.EVENTS_MAX_SUBSCRIBERS:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many event subscribers",
+            headers={"Retry-After": "5"}
+        )
+    return StreamingResponse(
+        event_broker.stream(owner_id=owner_id, address=address),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/nearby", response_model=list[schemas.FoodBagNearbyResponse], dependencies=[Depends(query_budget(3))])
+async def read_food_bags_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(2.0, gt=0, le=settings.NEARBY_MAX_RADIUS_KM, description="Радиус в километрах"),
+    limit: int = Query(settings.FOOD_BAGS_PAGE_SIZE, ge=1, le=settings.FOOD_BAGS_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+    current_user=Depends(get_current_user)
+):
+    nearby = await crud.get_food_bags_nearby_async(
+        db, latitude=lat, longitude=lon, radius_km=radius, current_user=current_user, limit=limit
+    )
+    return [
+        schemas.FoodBagNearbyResponse(
+            **schemas.FoodBagResponse.model_validate(food_bag).model_dump(),
+            distance_km=round(distance, 3)
+        )
+        for distance, food_bag in nearby
+    ]
+
+
+@router.get("/search", response_model=list[schemas.FoodBagSearchResponse], dependencies=[Depends(query_budget(2))])
+async def search_food_bags(
+    q: str = Query(..., min_length=1, max_length=200, description="Слова для поиска по названию, описанию и адресу"),
+    limit: int = Query(settings.FOOD_BAGS_PAGE_SIZE, ge=1, le=settings.FOOD_BAGS_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
     current_user=Depends(get_current_user)
 ):
-    # Только не просроченные корзины
-    return crud.get_food_bags(db=db, current_user=current_user, address=address, filter_expired=True)
+    found = await crud.search_food_bags_async(db, q, current_user=current_user, limit=limit)
+    return [
+        schemas.FoodBagSearchResponse(
+            **schemas.FoodBagResponse.model_validate(food_bag).model_dump(),
+            score=round(score, 4)
+        )
+        for score, food_bag in found
+    ]
+
+
+# Пакетные операции: до BATCH_MAX_ITEMS корзин за запрос, одна транзакция на пакет.
+# Объявлены до /{food_bag_id}, иначе путь "batch" попал бы в параметр
+@router.post("/batch", response_model=list[schemas.FoodBagBatchResult])
+async def create_food_bags_batch(
+    batch: schemas.FoodBagBatchCreate,
+    db: AsyncSession = Depends(get_write_db),
+    current_user=Depends(require_role(["establishment", "admin"]))
+):
+    return await crud.create_food_bags_async(db, batch.items, current_user.id)
+
+
+@router.put("/batch", response_model=list[schemas.FoodBagBatchResult])
+async def update_food_bags_batch(
+    batch: schemas.FoodBagBatchUpdate,
+    db: AsyncSession = Depends(get_write_db),
+    current_user=Depends(require_role(["establishment", "admin"]))
+):
+    return await crud.update_food_bags_async(db, batch.items, current_user)
+
+
+@router.post("/batch/delete", response_model=list[schemas.FoodBagBatchResult])
+async def delete_food_bags_batch(
+    batch: schemas.FoodBagBatchDelete,
+    db: AsyncSession = Depends(get_write_db),
+    current_user=Depends(require_role(["establishment", "admin"]))
+):
+    return await crud.delete_food_bags_async(db, batch.ids, current_user)
 
 
 @router.put("/{food_bag_id}", response_model=schemas.FoodBagResponse)
 async def update_food_bag(
     food_bag_id: int,
     food_bag_update: schemas.FoodBagCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_write_db),
     current_user=Depends(get_current_user),
 ):
-    updated_food_bag = crud.update_food_bag(
+    updated_food_bag = await crud.update_food_bag_async(
         db=db,
         food_bag_id=food_bag_id,
         food_bag_update=food_bag_update,
@@ -45,13 +219,35 @@ async def update_food_bag(
     return updated_food_bag
 
 
+# Фото корзины: тело запроса - сам файл (image/jpeg, image/png, image/webp), без multipart
+@router.put("/{food_bag_id}/photo", response_model=schemas.FoodBagResponse)
+async def upload_food_bag_photo(
+    food_bag_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_write_db),
+    current_user=Depends(require_role(["establishment", "admin"]))
+):
+    # Права проверяются до чтения тела: чужая загрузка не пишется на диск
+    if not await crud.get_owned_food_bag_id_async(db, food_bag_id, current_user):
+        raise HTTPException(status_code=404, detail="Food bag not found or permission denied")
+    key, ext = await save_upload(request)
+    ready = variants_ready(key)
+    photo_url = variant_url(key) if ready else original_url(key, ext)
+    food_bag = await crud.set_food_bag_photo_async(db, food_bag_id, photo_url, current_user)
+    if not food_bag:
+        raise HTTPException(status_code=404, detail="Food bag not found or permission denied")
+    if not ready:
+        photo_pipeline.ensure(key, ext)
+    return food_bag
+
+
 @router.delete("/{food_bag_id}")
 async def delete_food_bag(
     food_bag_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_write_db),
     current_user=Depends(require_role(["establishment", "admin"]))
 ):
-    success = crud.delete_food_bag(db=db, food_bag_id=food_bag_id, current_user=current_user)
+    success = await crud.delete_food_bag_async(db=db, food_bag_id=food_bag_id, current_user=current_user)
     if not success:
         raise HTTPException(status_code=404, detail="Food bag not found or permission denied")
     return {"message": "Food bag deleted successfully"}
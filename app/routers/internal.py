@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.booking_pipeline import booking_committer
+from app.database import get_write_db
+from app.events import event_broker
+from app.inventory import live_inventory
+from app.passwords import password_hasher
+from app.pool_stats import pool_stats_snapshot
+from app.scheduler import scheduler
+from app.utils import require_role
+
+router = APIRouter(tags=["Internal"])
+
+
+@router.get("/pool")
+async def read_pool_stats(current_user=Depends(require_role(["admin"]))):
+    # Состояние пулов соединений этого воркера: занятые соединения, overflow,
+    # гистограмма ожидания соединения и число таймаутов
+    return pool_stats_snapshot()
+
+
+@router.get("/passwords")
+async def read_password_hasher_stats(current_user=Depends(require_role(["admin"]))):
+    # Очередь и время работы пула bcrypt этого воркера
+    return password_hasher.snapshot()
+
+
+@router.get("/bookings")
+async def read_booking_pipeline_stats(current_user=Depends(require_role(["admin"]))):
+    # Групповая фиксация бронирований этого воркера: число и размер пачек
+    return booking_committer.snapshot()
+
+
+@router.get("/events")
+async def read_event_broker_stats(current_user=Depends(require_role(["admin"]))):
+    # Подписчики SSE этого воркера, разосланные события и отключённые медленные клиенты
+    return event_broker.snapshot()
+
+
+@router.get("/inventory")
+async def read_inventory_stats(current_user=Depends(require_role(["admin"]))):
+    # Размер и версия живого индекса корзин этого воркера
+    return live_inventory.stats()
+
+
+@router.get("/inventory/check")
+async def check_inventory(
+    db: AsyncSession = Depends(get_write_db),
+    current_user=Depends(require_role(["admin"]))
+):
+    # Полная сверка живого индекса с БД: отсутствующие, лишние и отличающиеся корзины
+    return await db.run_sync(live_inventory.check)
+
+
+@router.get("/scheduler")
+async def read_scheduler_state(
+    db: AsyncSession = Depends(get_write_db),
+    current_user=Depends(require_role(["admin"]))
+):
+    # Задачи планировщика (срок следующего запуска, чья аренда) и последние запуски во всех воркерах
+    return await db.run_sync(scheduler.snapshot)
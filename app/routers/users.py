@@ -1,27 +1,56 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app import schemas, crud
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import schemas, crud, passwords
+from app.config import settings
+from app.database import get_read_db, get_write_db
+from app.query_counter import query_budget
+from app.serialization import fast_json_response, user_item
 from app.utils import require_role
 
 router = APIRouter(tags=["Users"])
 
 @router.post("/register", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing_user = crud.get_user_by_email(db, user.email)
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_write_db)):
+    existing_user = await crud.get_user_by_email_async(db, user.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Пользователь с таким email уже зарегистрирован"
         )
-    hashed_password = crud.hash_password(user.password)
-    db_user = crud.create_user(db=db, email=user.email, hashed_password=hashed_password, role=user.role or "client")
+    hashed_password = await passwords.hash_password_async(user.password)
+    db_user = await crud.create_user_async(db=db, email=user.email, hashed_password=hashed_password, role=user.role or "client")
     return db_user
 
-@router.get("/", response_model=List[schemas.UserResponse])
-def read_users(
-    db: Session = Depends(get_db),
+@router.get("/", response_model=List[schemas.UserResponse], dependencies=[Depends(query_budget(2))])
+async def read_users(
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
     current_user=Depends(require_role(["admin"]))
 ):
-    return crud.get_all_users(db)
+    if settings.FAST_JSON_RESPONSES:
+        users = await crud.get_all_user_rows_async(db)
+        return fast_json_response([user_item(user) for user in users], response)
+    return await crud.get_all_users_async(db)
+
+@router.put("/{user_id}/role", response_model=schemas.UserResponse)
+async def update_user_role(
+    user_id: int,
+    role_update: schemas.UserRoleUpdate,
+    db: AsyncSession = Depends(get_write_db),
+    current_user=Depends(require_role(["admin"]))
+):
+    db_user = await crud.update_user_role_async(db, user_id, role_update.role)
+    if not db_user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return db_user
+
+@router.delete("/{user_id}")
+async def delete_user(
+    user_id: int,
+    db: AsyncSession = Depends(get_write_db),
+    current_user=Depends(require_role(["admin"]))
+):
+    if not await crud.delete_user_async(db, user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return {"message": "User deleted successfully"}
@@ -0,0 +1,217 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import delete, exc, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+from app.database import SessionLocal
+from app.metrics import db_function, scheduler_run_duration, scheduler_runs
+
+logger = logging.getLogger(__name__)
+
+# Имя воркера в аренде и истории: хост, pid и случайный суффикс (pid повторяется в контейнерах)
+RUNNER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+@dataclass
+class Job:
+    name: str
+    interval: float  # секунды между запусками
+    fn: Callable  # fn(db: Session) -> dict | None, результат пишется в историю
+
+
+class Scheduler:
+    """Периодические задачи, которые выполняет ровно один воркер из всех процессов и хостов.
+
+    У каждой задачи строка в scheduler_jobs. Каждый воркер раз в poll_interval (или к ближайшему
+    next_run_at) пытается условным UPDATE взять аренду: строка обновится только у одного, если
+    next_run_at наступил и чужая аренда истекла. Победитель сразу сдвигает next_run_at на interval,
+    выполняет задачу в потоке (event loop не блокируется), пишет запуск в job_runs и снимает аренду.
+    Аренда упавшего воркера истекает через lease_ttl - задачу подхватит другой.
+    Время - часы воркеров (UTC): на хостах нужна синхронизация времени (NTP).
+    """
+
+    def __init__(self, runner_id: str, poll_interval: float, lease_ttl: float):
+        self.runner_id = runner_id
+        self.poll_interval = poll_interval
+        self.lease_ttl = lease_ttl
+        self.jobs = {}
+        self._registered = False
+        self._task = None
+        self.runs = 0
+        self.failures = 0
+
+    def job(self, name: str, seconds: float):
+        def decorator(fn):
+            self.jobs[name] = Job(name, seconds, fn)
+            return fn
+        return decorator
+
+    def start(self):
+        if self._task is None and self.jobs:
+            # Пустой контекст: запросы задач не относятся ни к одному HTTP-запросу
+            self._task = asyncio.get_running_loop().create_task(self._loop(), context=contextvars.Context())
+
+    async def stop(self):
+        # Задача, уже запущенная в потоке, доработает и снимет аренду сама
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                delay = await asyncio.to_thread(self.run_pending)
+            except Exception as e:
+                logger.error("Scheduler tick failed: %s", e)
+                delay = self.poll_interval
+            # Случайная добавка разводит воркеры, проверяющие одну и ту же строку
+            await asyncio.sleep(delay + random.uniform(0, min(delay, 1.0) * 0.1))
+
+    def run_pending(self) -> float:
+        # Выполняет наступившие задачи; возвращает паузу до следующей проверки
+        with SessionLocal() as db:
+            if not self._registered:
+                self._register(db)
+            for job in self.jobs.values():
+                if self._acquire(db, job):
+                    self._run(job)
+            next_run_at = db.execute(
+                select(func.min(models.SchedulerJob.next_run_at))
+                .where(models.SchedulerJob.name.in_(list(self.jobs)))
+            ).scalar()
+        if next_run_at is None:
+            return self.poll_interval
+        return min(self.poll_interval, max(0.1, (next_run_at - datetime.utcnow()).total_seconds()))
+
+    @db_function
+    def _register(self, db: Session):
+        # Строки новых задач; одновременную вставку другим воркером отсекает первичный ключ
+        existing = set(db.execute(
+            select(models.SchedulerJob.name).where(models.SchedulerJob.name.in_(list(self.jobs)))
+        ).scalars())
+        for name in self.jobs.keys() - existing:
+            db.add(models.SchedulerJob(name=name, next_run_at=datetime.utcnow()))
+            try:
+                db.commit()
+            except exc.IntegrityError:
+                db.rollback()
+        self._registered = True
+
+    @db_function
+    def _acquire(self, db: Session, job: Job) -> bool:
+        now = datetime.utcnow()
+        taken = db.execute(
+            update(models.SchedulerJob)
+            .where(
+                models.SchedulerJob.name == job.name,
+                models.SchedulerJob.next_run_at <= now,
+                or_(models.SchedulerJob.locked_until.is_(None), models.SchedulerJob.locked_until < now),
+            )
+            .values(
+                next_run_at=now + timedelta(seconds=job.interval),
+                locked_by=self.runner_id,
+                locked_until=now + timedelta(seconds=self.lease_ttl),
+            ),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+        db.commit()
+        return taken == 1
+
+    @db_function
+    def _run(self, job: Job):
+        with SessionLocal() as db:
+            run = models.JobRun(job=job.name, runner=self.runner_id, status="running", started_at=datetime.utcnow())
+            db.add(run)
+            db.commit()
+            started = time.perf_counter()
+            try:
+                with SessionLocal() as job_db:
+                    result = job.fn(job_db)
+                run.status = "success"
+                run.detail = json.dumps(result, default=str)[:1000] if result is not None else None
+            except Exception as e:
+                logger.error("Scheduled job %s failed: %s", job.name, e, extra={"job": job.name})
+                run.status = "failed"
+                run.detail = f"{type(e).__name__}: {e}"[:1000]
+                self.failures += 1
+            run.duration = time.perf_counter() - started
+            run.finished_at = datetime.utcnow()
+            self.runs += 1
+            scheduler_runs.inc(job.name, run.status)
+            scheduler_run_duration.observe(run.duration, job.name)
+            self._release(db, job)
+
+    @db_function
+    def _release(self, db: Session, job: Job):
+        # Коммит вместе с записью истории; next_run_at уже сдвинут при взятии аренды
+        db.execute(
+            update(models.SchedulerJob)
+            .where(models.SchedulerJob.name == job.name, models.SchedulerJob.locked_by == self.runner_id)
+            .values(locked_by=None, locked_until=None),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+
+    @db_function
+    def prune_history(self, db: Session) -> dict:
+        before = datetime.utcnow() - timedelta(days=settings.SCHEDULER_HISTORY_DAYS)
+        deleted = db.execute(
+            delete(models.JobRun).where(models.JobRun.started_at < before),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+        db.commit()
+        return {"job_runs_deleted": deleted}
+
+    @db_function
+    def snapshot(self, db: Session, runs: int = 20) -> dict:
+        jobs = db.execute(select(models.SchedulerJob).order_by(models.SchedulerJob.name)).scalars().all()
+        history = db.execute(
+            select(models.JobRun).order_by(models.JobRun.started_at.desc(), models.JobRun.id.desc()).limit(runs)
+        ).scalars().all()
+        return {
+            "runner": self.runner_id,
+            "running": self._task is not None,
+            "runs": self.runs,
+            "failures": self.failures,
+            "jobs": [
+                {
+                    "name": job.name,
+                    "interval": self.jobs[job.name].interval if job.name in self.jobs else None,
+                    "next_run_at": job.next_run_at,
+                    "locked_by": job.locked_by,
+                    "locked_until": job.locked_until,
+                }
+                for job in jobs
+            ],
+            "history": [
+                {
+                    "job": run.job,
+                    "runner": run.runner,
+                    "status": run.status,
+                    "started_at": run.started_at,
+                    "duration": run.duration,
+                    "detail": run.detail,
+                }
+                for run in history
+            ],
+        }
+
+
+scheduler = Scheduler(RUNNER_ID, settings.SCHEDULER_POLL_INTERVAL, settings.SCHEDULER_LEASE_TTL)
@@ -1,6 +1,7 @@
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel, ConfigDict
+from typing import Literal, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from app.config import settings
 
 
 class Token(BaseModel):
@@ -18,6 +19,10 @@ class UserCreate(UserBase):
     role: Optional[str] = "client"
 
 
+class UserRoleUpdate(BaseModel):
+    role: Literal["client", "establishment", "admin"]
+
+
 class UserResponse(UserBase):
     id: int
     role: str
@@ -40,6 +45,8 @@ class FoodBagCreate(BaseModel):
     quantity: int
     address: str
     pickup_time: datetime
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -52,9 +59,42 @@ class FoodBagResponse(FoodBagCreate):
     model_config = ConfigDict(from_attributes=True)
 
 
+class FoodBagNearbyResponse(FoodBagResponse):
+    distance_km: float
+
+
+class FoodBagSearchResponse(FoodBagResponse):
+    score: float
+
+
+# Пакетные операции: все элементы валидируются до записи, результат - по каждому элементу
+class FoodBagBatchCreate(BaseModel):
+    items: list[FoodBagCreate] = Field(min_length=1, max_length=settings.BATCH_MAX_ITEMS)
+
+
+class FoodBagBatchUpdateItem(FoodBagCreate):
+    id: int
+
+
+class FoodBagBatchUpdate(BaseModel):
+    items: list[FoodBagBatchUpdateItem] = Field(min_length=1, max_length=settings.BATCH_MAX_ITEMS)
+
+
+class FoodBagBatchDelete(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=settings.BATCH_MAX_ITEMS)
+
+
+class FoodBagBatchResult(BaseModel):
+    index: int                       # позиция элемента в запросе
+    id: Optional[int] = None
+    status: int                      # HTTP-статус, который вернул бы одиночный запрос
+    detail: Optional[str] = None
+    food_bag: Optional[FoodBagResponse] = None
+
+
 class BookingCreate(BaseModel):
     food_bag_id: int
-    quantity: int
+    quantity: int = Field(gt=0)
 
     model_config = ConfigDict(from_attributes=True)
 
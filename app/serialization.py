@@ -0,0 +1,52 @@
+import orjson
+from fastapi import Response
+
+from app import models
+
+# Быстрый путь для больших списков (FAST_JSON_RESPONSES): строки БД проецируются в словари
+# с теми же полями и в том же порядке, что FoodBagResponse / UserResponse, и кодируются orjson
+# без валидации pydantic на каждый объект. response_model эндпоинтов не меняется - OpenAPI тот же
+
+FOOD_BAG_COLUMNS = (
+    models.FoodBag.name, models.FoodBag.description, models.FoodBag.price, models.FoodBag.discounted_price,
+    models.FoodBag.quantity, models.FoodBag.address, models.FoodBag.pickup_time, models.FoodBag.latitude,
+    models.FoodBag.longitude, models.FoodBag.id, models.FoodBag.owner_id, models.User.email.label("owner_email"),
+    models.FoodBag.photo_url,
+)
+
+USER_COLUMNS = (models.User.email, models.User.id, models.User.role)
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+def food_bag_item(row) -> dict:
+    # row - строка FOOD_BAG_COLUMNS или FoodBagSnapshot из живого индекса
+    return {
+        "name": row.name,
+        "description": row.description,
+        "price": row.price,
+        "discounted_price": row.discounted_price,
+        "quantity": row.quantity,
+        "address": row.address,
+        "pickup_time": row.pickup_time,
+        "latitude": row.latitude,
+        "longitude": row.longitude,
+        "id": row.id,
+        "owner": {"id": row.owner_id, "email": row.owner_email},
+        "photo_url": row.photo_url,
+    }
+
+
+def user_item(row) -> dict:
+    return {"email": row.email, "full_name": None, "id": row.id, "role": row.role}
+
+
+def fast_json_response(items: list, response: Response) -> FastJSONResponse:
+    # Заголовки, выставленные эндпоинтом на response (ETag, X-Next-Cursor), переносятся в ответ
+    headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return FastJSONResponse(items, headers=headers)
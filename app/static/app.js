@@ -0,0 +1,609 @@
+    let currentUser = null;
+    let currentUserRole = null;
+    let availableFoodBags = [];
+    // Список идёт страницами: следующая запрашивается по X-Next-Cursor с тем же фильтром
+    let foodBagsCursor = null;
+    let foodBagsAddress = '';
+
+    function showOutput(text) {
+        document.getElementById('output').textContent = text;
+    }
+
+    // Управление формами
+    function showCreateFoodBagForm() {
+        hideUpdateFoodBagForm();
+        hideDeleteFoodBagForm();
+        document.getElementById('createFoodBagForm').style.display = 'block';
+    }
+    function hideCreateFoodBagForm() {
+        document.getElementById('createFoodBagForm').style.display = 'none';
+    }
+    function showUpdateFoodBagForm() {
+        hideCreateFoodBagForm();
+        hideDeleteFoodBagForm();
+        document.getElementById('updateFoodBagForm').style.display = 'block';
+        populateUpdateFoodBagSelect(true);
+    }
+    function hideUpdateFoodBagForm() {
+        document.getElementById('updateFoodBagForm').style.display = 'none';
+    }
+    function showDeleteFoodBagForm() {
+        hideCreateFoodBagForm();
+        hideUpdateFoodBagForm();
+        document.getElementById('deleteFoodBagForm').style.display = 'block';
+        populateDeleteFoodBagSelect();
+    }
+    function hideDeleteFoodBagForm() {
+        document.getElementById('deleteFoodBagForm').style.display = 'none';
+    }
+
+    // Обновление UI после логина и при изменениях авторизации
+    function updateUI() {
+        const loggedIn = currentUser !== null;
+        document.getElementById('registerSection').style.display = loggedIn ? 'none' : 'block';
+        document.getElementById('loginSection').style.display = loggedIn ? 'none' : 'block';
+        document.getElementById('actionsSection').style.display = loggedIn ? 'block' : 'none';
+        document.getElementById('userInfo').style.display = loggedIn ? 'block' : 'none';
+        document.getElementById('foodBagsList').style.display = loggedIn ? 'block' : 'none';
+
+        hideCreateFoodBagForm();
+        hideUpdateFoodBagForm();
+        hideDeleteFoodBagForm();
+        document.getElementById('bookingForm').style.display = 'none';
+
+        if (loggedIn) {
+            document.getElementById('currentUser').textContent = currentUser.email || '';
+            document.getElementById('currentRole').textContent = currentUser.role || '';
+
+            document.getElementById('createFoodBagBtn').disabled = !(currentUser.role === 'admin' || currentUser.role === 'establishment');
+            document.getElementById('updateFoodBagBtn').disabled = !(currentUser.role === 'admin' || currentUser.role === 'establishment');
+            document.getElementById('deleteFoodBagBtn').disabled = !(currentUser.role === 'admin' || currentUser.role === 'establishment');
+            document.getElementById('getUsersBtn').disabled = currentUser.role !== 'admin';
+            document.getElementById('bookFoodBagBtn').disabled = !(currentUser.role === 'client' || currentUser.role === 'admin');
+        }
+    }
+
+    // Запросы к API
+
+    async function register() {
+        const form = document.getElementById('registerForm');
+        const payload = {
+            email: form.email.value,
+            password: form.password.value,
+            role: form.role.value
+        };
+        try {
+            const response = await fetch('/users/register', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(payload)
+            });
+            const data = await response.json();
+            if (response.ok) {
+                showOutput(`User ${payload.email} registered successfully as ${payload.role}`);
+            } else {
+                showOutput(`Registration failed: ${data.detail || JSON.stringify(data)}`);
+            }
+        } catch (err) {
+            showOutput('Error during registration: ' + err.message);
+        }
+    }
+
+    async function login() {
+        const form = document.getElementById('loginForm');
+        const params = new URLSearchParams({
+            email: form.email.value,
+            password: form.password.value
+        });
+        try {
+            const response = await fetch('/auth/login', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
+                body: params
+            });
+            const data = await response.json();
+            if (response.ok) {
+                localStorage.setItem('access_token', data.access_token);
+                await fetchCurrentUser();
+            } else {
+                showOutput(`Login failed: ${data.detail || JSON.stringify(data)}`);
+            }
+        } catch (err) {
+            showOutput('Error during login: ' + err.message);
+        }
+    }
+
+    async function fetchCurrentUser() {
+        const token = localStorage.getItem('access_token');
+        if (!token) {
+            currentUser = null;
+            updateUI();
+            return;
+        }
+        try {
+            const response = await fetch('/auth/me', {
+                headers: { 'Authorization': `Bearer ${token}` }
+            });
+            if (response.ok) {
+                currentUser = await response.json();
+                currentUserRole = currentUser.role;
+                showOutput(`Logged in successfully as ${currentUser.email} (${currentUser.role})`);
+            } else {
+                throw new Error('Failed to fetch user data');
+            }
+        } catch (err) {
+            showOutput('Error fetching user data: ' + err.message);
+            currentUser = null;
+            localStorage.removeItem('access_token');
+        }
+        updateUI();
+        await getFoodBagsWithFilter();
+    }
+
+    async function getFoodBagsWithFilter() {
+        const token = localStorage.getItem('access_token');
+        if (!token) {
+            showOutput('Please login first');
+            return;
+        }
+        foodBagsAddress = document.getElementById('filterAddress').value.trim();
+        foodBagsCursor = null;
+        availableFoodBags = [];
+        document.getElementById('foodBagsContainer').innerHTML = '';
+        await loadFoodBagsPage(token);
+    }
+
+    async function loadMoreFoodBags() {
+        const token = localStorage.getItem('access_token');
+        if (!token) {
+            showOutput('Please login first');
+            return;
+        }
+        await loadFoodBagsPage(token);
+    }
+
+    async function loadFoodBagsPage(token) {
+        const params = new URLSearchParams();
+        if (foodBagsAddress) params.set('address', foodBagsAddress);
+        if (foodBagsCursor) params.set('cursor', foodBagsCursor);
+        const loadMoreBtn = document.getElementById('loadMoreFoodBagsBtn');
+        loadMoreBtn.disabled = true;
+        try {
+            const query = params.toString();
+            const response = await fetch(query ? `/food-bags/?${query}` : '/food-bags/', {
+                headers: { 'Authorization': `Bearer ${token}` }
+            });
+            if (response.ok) {
+                const data = await response.json();
+                availableFoodBags = availableFoodBags.concat(data);
+                foodBagsCursor = response.headers.get('X-Next-Cursor');
+                renderFoodBagsList(data, availableFoodBags.length === data.length);
+                loadMoreBtn.style.display = foodBagsCursor ? 'block' : 'none';
+                showOutput(`Found ${availableFoodBags.length}${foodBagsCursor ? '+' : ''} food bags`);
+            } else {
+                const data = await response.json();
+                showOutput(`Failed to get food bags: ${data.detail || JSON.stringify(data)}`);
+            }
+        } catch (err) {
+            showOutput('Error while fetching food bags: ' + err.message);
+        } finally {
+            loadMoreBtn.disabled = false;
+        }
+    }
+
+    // Карточки страницы дописываются в конец списка; firstPage - список начинается заново
+    function renderFoodBagsList(foodBags, firstPage = true) {
+        const container = document.getElementById('foodBagsContainer');
+        if (firstPage) container.innerHTML = '';
+        if (!foodBags.length) {
+            if (firstPage) container.innerHTML = '<p>No food bags found.</p>';
+            return;
+        }
+        foodBags.forEach(fb => {
+            const card = document.createElement('div');
+            card.className = 'foodBagCard';
+            const pickupTimeFormatted = formatPickupTime(fb.pickup_time);
+            card.innerHTML = `
+                <strong>${fb.name}</strong> (${fb.description || 'No description'})<br/>
+                Price: ${fb.price.toFixed(2)} руб.<br/>
+                Discounted Price: ${fb.discounted_price.toFixed(2)} руб.<br/>
+                Quantity: ${fb.quantity}<br/>
+                Address: ${fb.address}<br/>
+                Owner: ${fb.owner?.email || 'Unknown'}<br/>
+                Pickup time: ${pickupTimeFormatted}<br/>
+                <label>Quantity to book: <input type="number" min="1" max="${fb.quantity}" value="1" id="bookQty_${fb.id}" style="width:50px" /></label><br/>
+                <button onclick="bookFoodBagDirect(${fb.id})" ${fb.quantity === 0 ? 'disabled' : ''}>
+                    Book This Food Bag
+                </button>
+            `;
+            container.appendChild(card);
+        });
+    }
+
+    function formatPickupTime(isoStr) {
+        if (!isoStr) return '';
+        const dt = new Date(isoStr);
+        return dt.toLocaleString([], { year: 'numeric', month: '2-digit', day: '2-digit', hour:'2-digit', minute:'2-digit' });
+    }
+
+    // Создание Food Bag
+    async function submitCreateFoodBag() {
+        const token = localStorage.getItem('access_token');
+        if (!token) {
+            showOutput('Please login first');
+            return;
+        }
+
+        const name = document.getElementById('foodBagName').value.trim();
+        const description = document.getElementById('foodBagDescription').value.trim();
+        const price = parseFloat(document.getElementById('foodBagPrice').value);
+        const discounted_price = parseFloat(document.getElementById('foodBagDiscountedPrice').value);
+        const quantity = parseInt(document.getElementById('foodBagQuantity').value);
+        const address = document.getElementById('foodBagAddress').value.trim();
+        const pickup_time_input = document.getElementById('foodBagPickupTime').value;
+
+        if (!name || isNaN(price) || isNaN(discounted_price) || !quantity || !address || !pickup_time_input) {
+            showOutput('Please fill all required fields with valid values.');
+            return;
+        }
+        const pickup_time = new Date(pickup_time_input).toISOString();
+
+        const body = {
+            name,
+            description,
+            price,
+            discounted_price,
+            quantity,
+            address,
+            pickup_time
+        };
+
+        try {
+            const response = await fetch('/food-bags/', {
+                method: 'POST',
+                headers: {
+                    'Authorization': `Bearer ${token}`,
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify(body)
+            });
+            if (response.ok) {
+                const data = await response.json();
+                showOutput(`Food Bag created:\n${JSON.stringify(data, null, 2)}`);
+                hideCreateFoodBagForm();
+                await getFoodBagsWithFilter();
+            } else {
+                const data = await response.json();
+                showOutput(`Failed to create food bag: ${data.detail || JSON.stringify(data)}`);
+            }
+        } catch (err) {
+            console.error(err);
+            showOutput(`Error creating food bag: ${err.message}`);
+        }
+    }
+
+    // Обновление Food Bag
+    function populateUpdateFoodBagSelect(setupListeners = false) {
+        const select = document.getElementById('updateFoodBagSelect');
+        select.innerHTML = '';
+        if (availableFoodBags.length === 0) {
+            const option = document.createElement('option');
+            option.text = 'No food bags available';
+            option.value = '';
+            select.add(option);
+            select.disabled = true;
+            return;
+        }
+        select.disabled = false;
+        availableFoodBags.forEach(fb => {
+            const option = document.createElement('option');
+            option.value = fb.id;
+            option.text = `${fb.name} - ${fb.description || 'No description'} (Qty: ${fb.quantity})`;
+            select.add(option);
+        });
+        if (setupListeners) {
+            select.removeEventListener('change', onUpdateFoodBagSelectChange);
+            select.addEventListener('change', onUpdateFoodBagSelectChange);
+            onUpdateFoodBagSelectChange();
+        }
+    }
+
+    function onUpdateFoodBagSelectChange() {
+        const select = document.getElementById('updateFoodBagSelect');
+        const fb = availableFoodBags.find(fb => fb.id == select.value);
+        if (fb) {
+            document.getElementById('updateFoodBagName').value = fb.name;
+            document.getElementById('updateFoodBagDescription').value = fb.description || '';
+            document.getElementById('updateFoodBagPrice').value = fb.price ?? 0;
+            document.getElementById('updateFoodBagDiscountedPrice').value = fb.discounted_price ?? 0;
+            document.getElementById('updateFoodBagQuantity').value = fb.quantity;
+            document.getElementById('updateFoodBagAddress').value = fb.address;
+            const dt = new Date(fb.pickup_time);
+            const tzoffset = dt.getTimezoneOffset() * 60000;
+            const localISOTime = (new Date(dt - tzoffset)).toISOString().slice(0,16);
+            document.getElementById('updateFoodBagPickupTime').value = localISOTime;
+        }
+    }
+
+    async function submitUpdateFoodBag() {
+        const token = localStorage.getItem('access_token');
+        if (!token) {
+            showOutput('Please login first');
+            return;
+        }
+
+        const select = document.getElementById('updateFoodBagSelect');
+        const foodBagId = select.value;
+
+        if (!foodBagId) {
+            showOutput('Please select a valid food bag');
+            return;
+        }
+
+        const name = document.getElementById('updateFoodBagName').value.trim();
+        const description = document.getElementById('updateFoodBagDescription').value.trim();
+        const price = parseFloat(document.getElementById('updateFoodBagPrice').value);
+        const discounted_price = parseFloat(document.getElementById('updateFoodBagDiscountedPrice').value);
+        const quantity = parseInt(document.getElementById('updateFoodBagQuantity').value);
+        const address = document.getElementById('updateFoodBagAddress').value.trim();
+        const pickup_time_input = document.getElementById('updateFoodBagPickupTime').value;
+
+        if (!name || isNaN(price) || isNaN(discounted_price) || !quantity || !address || !pickup_time_input) {
+            showOutput('Please fill all required fields with valid values.');
+            return;
+        }
+        const pickup_time = new Date(pickup_time_input).toISOString();
+
+        const body = {
+            name,
+            description,
+            price,
+            discounted_price,
+            quantity,
+            address,
+            pickup_time
+        };
+
+        try {
+            const response = await fetch(`/food-bags/${foodBagId}`, {
+                method: 'PUT',
+                headers: {
+                    'Authorization': `Bearer ${token}`,
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify(body)
+            });
+            if (response.ok) {
+                const data = await response.json();
+                showOutput(`Food Bag updated:\n${JSON.stringify(data, null, 2)}`);
+                hideUpdateFoodBagForm();
+                await getFoodBagsWithFilter();
+            } else {
+                const data = await response.json();
+                showOutput(`Failed to update food bag: ${data.detail || JSON.stringify(data)}`);
+            }
+        } catch (err) {
+            showOutput(`Error updating food bag: ${err.message}`);
+        }
+    }
+
+    // Удаление Food Bag
+    function populateDeleteFoodBagSelect() {
+        const select = document.getElementById('deleteFoodBagSelect');
+        select.innerHTML = '';
+        if (availableFoodBags.length === 0) {
+            const option = document.createElement('option');
+            option.text = 'No food bags available';
+            option.value = '';
+            select.add(option);
+            select.disabled = true;
+            return;
+        }
+        select.disabled = false;
+        availableFoodBags.forEach(fb => {
+            const option = document.createElement('option');
+            option.value = fb.id;
+            option.text = `${fb.name} - ${fb.description || 'No description'} (Qty: ${fb.quantity})`;
+            select.add(option);
+        });
+    }
+
+    async function submitDeleteFoodBag() {
+        const token = localStorage.getItem('access_token');
+        if (!token) {
+            showOutput('Please login first');
+            return;
+        }
+        const select = document.getElementById('deleteFoodBagSelect');
+        const foodBagId = select.value;
+        if (!foodBagId) {
+            showOutput('Please select a valid food bag');
+            return;
+        }
+
+        try {
+            const response = await fetch(`/food-bags/${foodBagId}`, {
+                method: 'DELETE',
+                headers: {
+                    'Authorization': `Bearer ${token}`
+                }
+            });
+            if (response.ok) {
+                const data = await response.json();
+                showOutput(data.message || 'Food Bag deleted successfully');
+                hideDeleteFoodBagForm();
+                await getFoodBagsWithFilter();
+            } else {
+                const data = await response.json();
+                showOutput(`Failed to delete food bag: ${data.detail || JSON.stringify(data)}`);
+            }
+        } catch (err) {
+            showOutput(`Error deleting food bag: ${err.message}`);
+        }
+    }
+
+    // Функция бронирования food bag
+    async function bookFoodBag() {
+        const token = localStorage.getItem('access_token');
+        if (!token) {
+            showOutput('Please login first');
+            return;
+        }
+        if (!(currentUser.role === 'client' || currentUser.role === 'admin')) {
+            showOutput('Only clients or admins can book food bags');
+            return;
+        }
+
+        const select = document.getElementById('foodBagSelect');
+        const quantityInput = document.getElementById('quantityInput');
+
+        const selectedFoodBagId = select.value;
+        const quantity = parseInt(quantityInput.value);
+
+        if (!selectedFoodBagId) {
+            showOutput('Please select a valid food bag');
+            return;
+        }
+        if (!quantity || quantity < 1) {
+            showOutput('Please enter a valid quantity (>=1)');
+            return;
+        }
+
+        try {
+            const response = await fetch('/bookings/', {
+                method: 'POST',
+                headers: {
+                    'Authorization': `Bearer ${token}`,
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({
+                    food_bag_id: Number(selectedFoodBagId),
+                    quantity: quantity
+                })
+            });
+            if (response.ok) {
+                const data = await response.json();
+                showOutput('Booking successful:\n' + JSON.stringify(data, null, 2));
+                document.getElementById('bookingForm').style.display = 'none';
+                await getFoodBagsWithFilter();
+            } else {
+                const data = await response.json();
+                showOutput('Failed to book food bag: ' + (data.detail || JSON.stringify(data)));
+            }
+        } catch (err) {
+            showOutput('Error during booking: ' + err.message);
+        }
+    }
+
+    // Помощь — показать/скрыть форму бронирования и заполнить селект
+    function toggleBookingForm() {
+        const form = document.getElementById('bookingForm');
+        form.style.display = (form.style.display === 'block') ? 'none' : 'block';
+        if (form.style.display === 'block') {
+            populateBookingFoodBagSelect();
+        }
+    }
+
+    function populateBookingFoodBagSelect() {
+        const select = document.getElementById('foodBagSelect');
+        select.innerHTML = '';
+        if (availableFoodBags.length === 0) {
+            const option = document.createElement('option');
+            option.text = 'No food bags available';
+            option.value = '';
+            select.add(option);
+            select.disabled = true;
+            return;
+        }
+        select.disabled = false;
+        availableFoodBags.forEach(fb => {
+            const option = document.createElement('option');
+            option.value = fb.id;
+            option.text = `${fb.name} - ${fb.description || 'No description'} (Qty: ${fb.quantity})`;
+            select.add(option);
+        });
+    }
+
+    // Получить список пользователей (админ)
+    async function getUsers() {
+        const token = localStorage.getItem('access_token');
+        if (!token) {
+            showOutput('Please login first');
+            return;
+        }
+        try {
+            const response = await fetch('/users/', {
+                headers: { 'Authorization': `Bearer ${token}` }
+            });
+            const data = await response.json();
+            if (response.ok) {
+                showOutput('Users:\n' + JSON.stringify(data, null, 2));
+            } else {
+                showOutput(`Failed to get users: ${data.detail || JSON.stringify(data)}`);
+            }
+        } catch (err) {
+            showOutput('Error getting users: ' + err.message);
+        }
+    }
+
+    function logout() {
+        localStorage.removeItem('access_token');
+        currentUser = null;
+        currentUserRole = null;
+        updateUI();
+        showOutput('Logged out successfully');
+    }
+
+    // Загрузка начальных данных при старте
+    window.onload = () => {
+        fetchCurrentUser();
+    };
+
+    async function bookFoodBagDirect(foodBagId) {
+    const token = localStorage.getItem('access_token');
+    if (!token) {
+        showOutput('Please login first');
+        return;
+    }
+    if (!(currentUser.role === 'client' || currentUser.role === 'admin')) {
+        showOutput('Only clients or admins can book food bags');
+        return;
+    }
+    const quantityInput = document.getElementById(`bookQty_${foodBagId}`);
+    const quantity = quantityInput ? parseInt(quantityInput.value) : 1;
+    if (!quantity || quantity < 1) {
+        showOutput('Please enter a valid quantity (>=1)');
+        return;
+    }
+    try {
+        const response = await fetch('/bookings/', {
+            method: 'POST',
+            headers: {
+                'Authorization': `Bearer ${token}`,
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                food_bag_id: Number(foodBagId),
+                quantity: quantity
+            })
+        });
+
+        if (!response.ok) {
+            let errorDetail = '';
+            try {
+                const errorData = await response.json();
+                errorDetail = errorData.detail || JSON.stringify(errorData);
+            } catch {
+                errorDetail = await response.text();
+            }
+            showOutput(`Failed to book food bag: HTTP ${response.status} - ${errorDetail}`);
+            return;
+        }
+
+        const data = await response.json();
+        showOutput('Booking successful:\n' + JSON.stringify(data, null, 2));
+        await getFoodBagsWithFilter();
+    } catch (err) {
+        showOutput('Error during booking: ' + err.message);
+    }
+}
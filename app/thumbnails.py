@@ -0,0 +1,31 @@
+import os
+import time
+
+from PIL import Image, ImageOps
+
+# Выполняется в процессах пула app/photos.py. Модуль импортирует только Pillow:
+# дочерний процесс (spawn) не поднимает приложение, настройки и подключения к БД
+
+
+def make_thumbnails(source: str, targets: dict, quality: int) -> float:
+    """Превью исходного фото: targets - {ширина: путь}. Возвращает время работы в секундах.
+
+    Каждое превью пишется во временный файл и переименовывается: читатель не увидит
+    недописанный файл, а повторная обработка того же фото просто перезапишет его тем же содержимым.
+    """
+    started = time.perf_counter()
+    with Image.open(source) as image:
+        # JPEG декодируется сразу в уменьшенном масштабе (1/2..1/8), если самое большое превью позволяет
+        largest = max(targets)
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        for width in sorted(targets, reverse=True):
+            thumbnail = image.copy()
+            thumbnail.thumbnail((width, width), Image.Resampling.LANCZOS)
+            target = targets[width]
+            temporary = f"{target}.{os.getpid()}.tmp"
+            thumbnail.save(temporary, "JPEG", quality=quality, optimize=True, progressive=True)
+            os.replace(temporary, target)
+    return time.perf_counter() - started
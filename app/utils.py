@@ -1,33 +1,41 @@
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
 from app.config import settings
-from app.database import get_db
+from app.database import AsyncSessionLocal, read_session
 from app import crud
+from app.principal_cache import Principal, principal_cache
 
-security = HTTPBearer()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# auto_error=False: без заголовка Authorization пробуем cookie
+security = HTTPBearer(auto_error=False)
+def get_token(request: Request, credentials: Optional[HTTPAuthorizationCredentials]) -> Optional[str]:
+    # Попытка получить токен из заголовка Authorization
+    if credentials:
+        return credentials.credentials
+    # Попытка получить токен из cookie 'access_token'
+    token_in_cookie = request.cookies.get("access_token")
+    if token_in_cookie and token_in_cookie.startswith("Bearer "):
+        return token_in_cookie[len("Bearer "):]
+    return None
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_current_user(
-    db: Session = Depends(get_db),
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-):
+async def get_current_user(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
+) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+    token = get_token(request, credentials)
+    if token is None:
+        raise credentials_exception
+
     try:
         payload = jwt.decode(
-            credentials.credentials,
+            token,
             settings.SECRET_KEY,
             algorithms=[settings.ALGORITHM]
         )
@@ -37,10 +45,28 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = crud.get_user(db, int(user_id))
+    # Сначала кэш, в БД идём только при промахе. Изменения пользователей в других воркерах
+    # кэш узнаёт фоновой сверкой версии users (не чаще PRINCIPAL_CACHE_CHECK_INTERVAL)
+    principal_cache.schedule_check()
+    principal = principal_cache.get(int(user_id), token)
+    if principal is not None:
+        return principal
+
+    # Своя короткая сессия, закрытая до обработчика: зависимость get_read_db держала бы соединение
+    # до конца запроса - рядом с сессией записи это два соединения пула на запрос (при нагрузке
+    # пул заканчивается), а у потока SSE - соединение на всё время подписки
+    async with read_session(request) as db:
+        user = await crud.get_user_async(db, int(user_id))
+        replica = db.info.get("replica")
+    if user is None and replica:
+        # Только что созданного пользователя на реплике может ещё не быть
+        async with AsyncSessionLocal() as primary:
+            user = await crud.get_user_async(primary, int(user_id))
     if user is None:
         raise credentials_exception
-    return user
+    principal = Principal(id=user.id, email=user.email, role=user.role)
+    principal_cache.set(token, principal, token_expires_at=payload.get("exp"))
+    return principal
 
 def require_role(allowed_roles: list):
     def role_checker(current_user = Depends(get_current_user)):
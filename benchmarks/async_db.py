@@ -0,0 +1,115 @@
+"""Синхронная сессия внутри async-обработчика против AsyncSession под конкурентной нагрузкой.
+
+Оба варианта отдают одну и ту же страницу GET /food-bags/ (crud.get_food_bags).
+Параллельно замеряется задержка лёгкого /ping: при синхронном доступе к БД
+event loop блокируется, и страдают все запросы воркера.
+Показательны замеры на MySQL (BENCH_DATABASE_URL=mysql+pymysql://...): SQLite
+сериализует запросы, а aiosqlite добавляет накладные расходы на поток.
+
+    python -m benchmarks.async_db --concurrency 50 --requests 2000
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app import crud, schemas
+from benchmarks.common import (
+    async_url, make_engine, make_session_factory, percentile, reset_schema, seed_food_bag, seed_users,
+)
+
+
+def build_app(SessionLocal, AsyncSessionLocal) -> FastAPI:
+    app = FastAPI()
+
+    def get_sync_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    # Было: async def + синхронный SQLAlchemy - каждый запрос к БД останавливает event loop
+    @app.get("/sync", response_model=list[schemas.FoodBagResponse])
+    async def read_sync(db=Depends(get_sync_db)):
+        return crud.get_food_bags(db, filter_expired=True, limit=100)
+
+    # Стало: AsyncSession, ожидание БД отдаёт управление другим запросам
+    @app.get("/async", response_model=list[schemas.FoodBagResponse])
+    async def read_async(db: AsyncSession = Depends(get_async_db)):
+        return await crud.get_food_bags_async(db, filter_expired=True, limit=100)
+
+    @app.get("/ping")
+    async def ping():
+        return {"ping": "pong"}
+
+    return app
+
+
+async def load(client: httpx.AsyncClient, path: str, concurrency: int, total: int):
+    latencies = []
+    ping_latencies = []
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(path)
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            started = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    async def pinger():
+        while not queue.empty():
+            started = time.perf_counter()
+            await client.get("/ping")
+            ping_latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0.005)
+
+    started = time.perf_counter()
+    await asyncio.gather(pinger(), *[worker() for _ in range(concurrency)])
+    duration = time.perf_counter() - started
+    return total / duration, latencies, ping_latencies
+
+
+async def run(concurrency: int, total: int, bags: int):
+    engine = make_engine(pool_size=concurrency)
+    reset_schema(engine)
+    SessionLocal = make_session_factory(engine)
+    with SessionLocal() as db:
+        owner_id = seed_users(db, 1, role="establishment", prefix="owner")[0]
+        for _ in range(bags):
+            seed_food_bag(db, owner_id, quantity=5)
+
+    # Пулы обоих движков рассчитаны на полную конкурентность, чтобы сравнивать только модель ожидания
+    engine_url = engine.url.render_as_string(hide_password=False)
+    async_engine = create_async_engine(async_url(engine_url), pool_size=concurrency, max_overflow=concurrency)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    app = build_app(SessionLocal, AsyncSessionLocal)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"database: {engine.url.render_as_string(hide_password=True)}, concurrency={concurrency}")
+        for label, path in (("before (sync session)", "/sync"), ("after (AsyncSession)", "/async")):
+            rps, latencies, pings = await load(client, path, concurrency, total)
+            print(f"{label:<22} {rps:8.1f} req/s  p50={percentile(latencies, 50) * 1000:7.1f} ms  "
+                  f"p99={percentile(latencies, 99) * 1000:7.1f} ms  /ping p99={percentile(pings, 99) * 1000:7.1f} ms")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--bags", type=int, default=300)
+    args = parser.parse_args()
+    asyncio.run(run(args.concurrency, args.requests, args.bags))
@@ -0,0 +1,83 @@
+"""Конкурентные бронирования одной "горячей" корзины.
+
+Проверяет, что остаток не уходит в минус и число успешных бронирований
+равно начальному остатку, и замеряет bookings/sec.
+
+    python -m benchmarks.booking_concurrency --threads 32 --stock 500 --attempts 2000
+"""
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from sqlalchemy import func
+
+from app import crud, models, schemas
+from benchmarks.common import make_engine, make_session_factory, percentile, reset_schema, seed_food_bag, seed_users
+
+
+def run(threads: int, stock: int, attempts: int) -> int:
+    engine = make_engine(pool_size=threads)
+    reset_schema(engine)
+    SessionLocal = make_session_factory(engine)
+
+    with SessionLocal() as db:
+        owner_id = seed_users(db, 1, role="establishment", prefix="owner")[0]
+        client_ids = seed_users(db, threads, role="client")
+        bag_id = seed_food_bag(db, owner_id, quantity=stock)
+
+    outcomes = {"success": 0, "sold_out": 0, "error": 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def attempt(i: int):
+        booking = schemas.BookingCreate(food_bag_id=bag_id, quantity=1)
+        started = time.perf_counter()
+        with SessionLocal() as db:
+            try:
+                crud.book_food_bag(db, booking, client_ids[i % len(client_ids)])
+                outcome = "success"
+            except HTTPException:
+                outcome = "sold_out"
+            except Exception:
+                outcome = "error"
+        elapsed = time.perf_counter() - started
+        with lock:
+            outcomes[outcome] += 1
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(attempt, range(attempts)))
+    duration = time.perf_counter() - started
+
+    with SessionLocal() as db:
+        remaining = db.query(models.FoodBag.quantity).filter(models.FoodBag.id == bag_id).scalar()
+        booked = db.query(func.coalesce(func.sum(models.Booking.quantity), 0)).scalar()
+
+    print(f"database:        {engine.url.render_as_string(hide_password=True)}")
+    print(f"threads:         {threads}")
+    print(f"attempts:        {attempts} in {duration:.2f}s ({attempts / duration:.0f} attempts/sec)")
+    print(f"bookings:        {outcomes['success']} ({outcomes['success'] / duration:.0f} bookings/sec)")
+    print(f"sold out / err:  {outcomes['sold_out']} / {outcomes['error']}")
+    print(f"latency p50/p99: {percentile(latencies, 50) * 1000:.1f} / {percentile(latencies, 99) * 1000:.1f} ms")
+    print(f"stock:           initial={stock} remaining={remaining} booked={booked}")
+
+    expected = min(stock, attempts)
+    oversold = remaining < 0 or booked != stock - remaining or outcomes["success"] != booked
+    if oversold or outcomes["success"] != expected:
+        print("FAIL: inconsistent stock after concurrent bookings")
+        return 1
+    print("OK: no overselling")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--stock", type=int, default=500)
+    parser.add_argument("--attempts", type=int, default=2000)
+    args = parser.parse_args()
+    sys.exit(run(args.threads, args.stock, args.attempts))
@@ -0,0 +1,84 @@
+"""Групповая фиксация бронирований (BOOKING_GROUP_COMMIT) против транзакции на каждое бронирование.
+
+Клиенты параллельно бронируют одну "горячую" корзину через POST /bookings/.
+Для каждого режима: bookings/sec, p50/p95/p99 задержки и проверка, что продано
+ровно min(остаток, попытки) и остаток не ушёл в минус. Код возврата 1 при нарушении.
+
+    python -m benchmarks.booking_group_commit --clients 64 --stock 1000 --attempts 2000
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import httpx
+from sqlalchemy import func
+
+# benchmarks.common первым: задаёт адрес БД до импорта app.*
+from benchmarks.common import (
+    access_token, make_engine, make_session_factory, percentile, reset_schema, seed_food_bag, seed_users,
+)
+from app import models  # noqa: E402
+
+
+async def flash_sale(client, tokens, bag_id: int, clients: int, attempts: int):
+    latencies = []
+    statuses = {}
+    next_attempt = iter(range(attempts))
+
+    async def worker(index: int):
+        headers = {"Authorization": f"Bearer {tokens[index % len(tokens)]}"}
+        for _ in next_attempt:
+            started = time.perf_counter()
+            response = await client.post("/bookings/", json={"food_bag_id": bag_id, "quantity": 1}, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker(i) for i in range(clients)])
+    return time.perf_counter() - started, latencies, statuses
+
+
+async def run(args) -> int:
+    engine = make_engine()
+    reset_schema(engine)
+    SessionLocal = make_session_factory(engine)
+    with SessionLocal() as db:
+        owner_id = seed_users(db, 1, role="establishment", prefix="owner")[0]
+        client_ids = seed_users(db, args.clients, role="client")
+    tokens = [access_token(user_id, "client") for user_id in client_ids]
+
+    from app.config import settings
+    from app.main import app
+
+    failed = False
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for label, group_commit in (("per-request", False), ("group commit", True)):
+            settings.BOOKING_GROUP_COMMIT = group_commit
+            with SessionLocal() as db:
+                bag_id = seed_food_bag(db, owner_id, quantity=args.stock)
+            duration, latencies, statuses = await flash_sale(client, tokens, bag_id, args.clients, args.attempts)
+
+            with SessionLocal() as db:
+                remaining = db.query(models.FoodBag.quantity).filter(models.FoodBag.id == bag_id).scalar()
+                booked = db.query(func.coalesce(func.sum(models.Booking.quantity), 0)).filter(
+                    models.Booking.food_bag_id == bag_id
+                ).scalar()
+            expected = min(args.stock, args.attempts)
+            ok = booked == expected == statuses.get(201, 0) and remaining == args.stock - expected
+            failed = failed or not ok
+            print(f"{label:<13} {len(latencies) / duration:8.0f} bookings/s  "
+                  f"p50={percentile(latencies, 50) * 1000:7.1f} ms  p95={percentile(latencies, 95) * 1000:7.1f} ms  "
+                  f"p99={percentile(latencies, 99) * 1000:7.1f} ms  statuses={dict(sorted(statuses.items()))}  "
+                  f"booked={booked} remaining={remaining} {'ok' if ok else 'FAIL'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--stock", type=int, default=1000)
+    parser.add_argument("--attempts", type=int, default=2000)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
@@ -0,0 +1,100 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+# По умолчанию бенчмарки работают с временной SQLite-базой;
+# для замеров на MySQL задайте BENCH_DATABASE_URL (mysql+pymysql://...)
+BENCH_DATABASE_URL = os.getenv(
+    "BENCH_DATABASE_URL",
+    f"sqlite:///{os.path.join(tempfile.gettempdir(), 'quickbag_bench.db')}",
+)
+
+
+def async_url(url: str = BENCH_DATABASE_URL) -> str:
+    # Тот же адрес БД для асинхронного драйвера
+    for sync_driver, async_driver in (("sqlite://", "sqlite+aiosqlite://"), ("mysql+pymysql://", "mysql+aiomysql://")):
+        if url.startswith(sync_driver):
+            return async_driver + url[len(sync_driver):]
+    return url
+
+
+# Приложение (app.main), запущенное из бенчмарка, работает с той же базой.
+# Должно выполниться до первого импорта app.*: настройки читаются при импорте
+os.environ.setdefault("DATABASE_URL", BENCH_DATABASE_URL)
+os.environ.setdefault("ASYNC_DATABASE_URL", async_url(BENCH_DATABASE_URL))
+
+from app import models  # noqa: E402
+from app.database import Base, run_migrations  # noqa: E402
+
+
+def make_engine(url: str = BENCH_DATABASE_URL, pool_size: int = 20):
+    if url.startswith("sqlite"):
+        engine = create_engine(
+            url, connect_args={"check_same_thread": False, "timeout": 30}, pool_size=pool_size, max_overflow=pool_size
+        )
+
+        # WAL позволяет читателям не ждать писателя
+        @event.listens_for(engine, "connect")
+        def _set_sqlite_pragma(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.close()
+    else:
+        engine = create_engine(url, pool_size=pool_size, max_overflow=pool_size)
+    return engine
+
+
+def reset_schema(engine):
+    # Схема создаётся миграциями - бенчмарки видят те же индексы, что и production
+    Base.metadata.drop_all(bind=engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE IF EXISTS alembic_version")
+    run_migrations(engine.url.render_as_string(hide_password=False))
+
+
+def make_session_factory(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def seed_users(db, count: int, role: str = "client", prefix: str = "user"):
+    users = [
+        models.User(email=f"{prefix}{i}@bench", hashed_password="x", role=role)
+        for i in range(count)
+    ]
+    db.add_all(users)
+    db.commit()
+    return [u.id for u in users]
+
+
+def seed_food_bag(db, owner_id: int, quantity: int, **fields):
+    values = dict(
+        name="Bench bag",
+        description="Benchmark food bag",
+        price=10.0,
+        discounted_price=5.0,
+        quantity=quantity,
+        address="Bench street, 1",
+        pickup_time=datetime.utcnow() + timedelta(hours=2),
+        owner_id=owner_id,
+    )
+    values.update(fields)
+    bag = models.FoodBag(**values)
+    db.add(bag)
+    db.commit()
+    return bag.id
+
+
+def percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def access_token(user_id: int, role: str) -> str:
+    from app.routers.auth import create_access_token
+    return create_access_token(data={"sub": str(user_id), "role": role})
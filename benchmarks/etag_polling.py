@@ -0,0 +1,109 @@
+"""Сколько запросов к БД экономят ETag/304 при постоянном опросе GET /food-bags/.
+
+Клиенты опрашивают список с интервалом --poll-interval, заведения меняют данные
+с частотой --writes-per-sec. Время моделируется (без реальных пауз), запросы к БД
+считаются по событиям движка. Сравниваются клиенты с If-None-Match и без него.
+
+    python -m benchmarks.etag_polling --clients 1000 --poll-interval 5 --writes-per-sec 0.05 --duration 60
+"""
+import argparse
+import asyncio
+import heapq
+import random
+
+import httpx
+from sqlalchemy import event
+
+from benchmarks.common import (
+    access_token, make_engine, make_session_factory, reset_schema, seed_food_bag, seed_users,
+)
+
+
+async def simulate(client, tokens, bag_ids, owner_token, args, conditional: bool, counter):
+    rng = random.Random(7)
+    # События: (время, тип, индекс клиента)
+    timeline = [(rng.uniform(0, args.poll_interval), "poll", i) for i in range(len(tokens))]
+    if args.writes_per_sec > 0:
+        timeline.append((rng.expovariate(args.writes_per_sec), "write", None))
+    heapq.heapify(timeline)
+
+    etags = {}
+    polls = not_modified = body_bytes = 0
+    poll_queries = 0
+    while timeline:
+        at, kind, index = heapq.heappop(timeline)
+        if at > args.duration:
+            break
+        if kind == "write":
+            bag_id = rng.choice(bag_ids)
+            await client.put(f"/food-bags/{bag_id}", headers={"Authorization": f"Bearer {owner_token}"}, json={
+                "name": f"Bag {bag_id}", "price": 10, "discounted_price": rng.randint(1, 9), "quantity": 5,
+                "address": "Bench street, 1", "pickup_time": "2100-01-01T00:00:00",
+            })
+            heapq.heappush(timeline, (at + rng.expovariate(args.writes_per_sec), "write", None))
+            continue
+
+        headers = {"Authorization": f"Bearer {tokens[index]}"}
+        if conditional and index in etags:
+            headers["If-None-Match"] = etags[index]
+        before = counter[0]
+        response = await client.get("/food-bags/", headers=headers)
+        poll_queries += counter[0] - before
+        polls += 1
+        body_bytes += len(response.content)
+        if response.status_code == 304:
+            not_modified += 1
+        else:
+            etags[index] = response.headers.get("etag")
+        heapq.heappush(timeline, (at + args.poll_interval, "poll", index))
+    return polls, not_modified, poll_queries, body_bytes
+
+
+async def run(args):
+    engine = make_engine()
+    reset_schema(engine)
+    SessionLocal = make_session_factory(engine)
+    with SessionLocal() as db:
+        owner_id = seed_users(db, 1, role="establishment", prefix="owner")[0]
+        client_ids = seed_users(db, args.clients, role="client")
+        bag_ids = [seed_food_bag(db, owner_id, quantity=5) for _ in range(args.bags)]
+    tokens = [access_token(user_id, "client") for user_id in client_ids]
+    owner_token = access_token(owner_id, "establishment")
+
+    from app.database import async_engine
+    from app.main import app
+
+    counter = [0]
+
+    def count_query(*_):
+        counter[0] += 1
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_query)
+    polls_per_sec = args.clients / args.poll_interval
+    print(f"clients={args.clients} poll every {args.poll_interval}s ({polls_per_sec:.0f} polls/s), "
+          f"writes={args.writes_per_sec}/s, simulated {args.duration}s")
+
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, conditional in (("without ETag", False), ("with ETag", True)):
+            polls, not_modified, queries, body_bytes = await simulate(
+                client, tokens, bag_ids, owner_token, args, conditional, counter
+            )
+            results[label] = queries / args.duration
+            print(f"{label:<13} polls={polls:>7} 304={not_modified:>7} "
+                  f"db queries/poll={queries / polls:.2f} db queries/s={queries / args.duration:8.1f} "
+                  f"body KB/s={body_bytes / args.duration / 1024:8.1f}")
+    saved = results["without ETag"] - results["with ETag"]
+    print(f"saved: {saved:.1f} db queries/s at {polls_per_sec:.0f} polls/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--poll-interval", type=float, default=5.0)
+    parser.add_argument("--writes-per-sec", type=float, default=0.05)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--bags", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args))
@@ -0,0 +1,143 @@
+"""Список корзин из живого индекса в памяти против запроса в БД.
+
+Вторая часть - несколько писателей: между записями этого воркера пишет другой, каждая своя
+запись видит пропуск версий. Код возврата 1, если запрос ждёт перестройку индекса или
+перестроек больше, чем одна за INVENTORY_SYNC_INTERVAL.
+
+    python -m benchmarks.inventory --bags 20000 --owners 200 --queries 500
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+# benchmarks.common - первым: фоновая перестройка индекса работает с той же базой, что и бенчмарк
+from benchmarks.common import make_engine, make_session_factory, percentile, reset_schema, seed_users
+from app import crud, models
+from app.inventory import LiveInventory
+from app.principal_cache import Principal
+
+
+def seed_bags(db, owner_ids, count: int, rng: random.Random):
+    now = datetime.utcnow()
+    batch = []
+    for i in range(count):
+        batch.append(dict(
+            name=f"Bag {i}", description="Synthetic", price=10.0, discounted_price=5.0, quantity=5,
+            address=f"Street {i % 500}, {i}", pickup_time=now + timedelta(minutes=rng.randrange(10, 60 * 24)),
+            owner_id=rng.choice(owner_ids),
+        ))
+        if len(batch) == 5000:
+            db.execute(insert(models.FoodBag), batch)
+            batch = []
+    if batch:
+        db.execute(insert(models.FoodBag), batch)
+    db.commit()
+
+
+def timed(fn, users):
+    latencies = []
+    found = 0
+    for user in users:
+        started = time.perf_counter()
+        found += len(fn(user))
+        latencies.append(time.perf_counter() - started)
+    return latencies, found
+
+
+def report(label, latencies, found):
+    print(f"{label:<16} p50={percentile(latencies, 50) * 1000:8.3f} ms  p99={percentile(latencies, 99) * 1000:8.3f} ms  "
+          f"rows/query={found / len(latencies):.1f}")
+
+
+async def concurrent_writers(SessionLocal, inventory: LiveInventory, writes: int, interval: float) -> int:
+    from app.config import settings
+
+    settings.INVENTORY_SYNC_INTERVAL = interval
+    rebuild_started = time.perf_counter()
+    inventory.rebuild(SessionLocal())
+    rebuild_time = time.perf_counter() - rebuild_started
+    rebuilds = inventory.rebuilds
+    latencies = []
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        for _ in range(writes):
+            crud.bump_food_bags_version(db)  # запись другого воркера
+            db.commit()
+            version = crud.bump_food_bags_version(db)
+            db.commit()
+            inventory.adjust_quantity(0, 0, version)  # хук своей записи
+            request_started = time.perf_counter()
+            await inventory.ensure_fresh()
+            latencies.append(time.perf_counter() - request_started)
+            await asyncio.sleep(0.005)  # фоновой перестройке нужен event loop
+    elapsed = time.perf_counter() - started
+    if inventory._refresh_task is not None:
+        await inventory._refresh_task
+    rebuilds = inventory.rebuilds - rebuilds
+    allowed = int(elapsed / interval) + 1
+    print(f"writers: {writes} gaps in {elapsed:.2f}s, rebuilds={rebuilds} (allowed {allowed}), "
+          f"rebuild={rebuild_time * 1000:.1f} ms, request p99={percentile(latencies, 99) * 1000:.3f} ms")
+    failed = False
+    if not rebuilds:
+        print("FAIL: changes of the other writer never reached the inventory")
+        failed = True
+    if rebuilds > allowed:
+        print(f"FAIL: {rebuilds} rebuilds, more than one per {interval}s")
+        failed = True
+    if percentile(latencies, 99) >= rebuild_time:
+        print("FAIL: requests wait for the inventory rebuild")
+        failed = True
+    return 1 if failed else 0
+
+
+def run(bags: int, owners: int, queries: int, limit: int, seed: int, writes: int, interval: float) -> int:
+    rng = random.Random(seed)
+    engine = make_engine()
+    reset_schema(engine)
+    SessionLocal = make_session_factory(engine)
+
+    with SessionLocal() as db:
+        owner_ids = seed_users(db, owners, role="establishment", prefix="owner")
+        seed_bags(db, owner_ids, bags, rng)
+
+        inventory = LiveInventory()
+        started = time.perf_counter()
+        inventory.rebuild(db)
+        print(f"rebuilt {inventory.stats()['size']} bags in {time.perf_counter() - started:.3f}s")
+
+        client = Principal(id=0, email="client@bench", role="client")
+        owners_sample = [Principal(id=rng.choice(owner_ids), email="", role="establishment") for _ in range(queries)]
+
+        def db_listing(user):
+            return crud.get_food_bags(db, user, filter_expired=True, limit=limit)
+
+        def inventory_listing(user):
+            return inventory.list_food_bags(user, limit=limit)
+
+        report("db client", *timed(db_listing, [client] * queries))
+        report("memory client", *timed(inventory_listing, [client] * queries))
+        report("db owner", *timed(db_listing, owners_sample))
+        report("memory owner", *timed(inventory_listing, owners_sample))
+
+        check = inventory.check(db)
+        print(f"consistent={check['consistent']}")
+
+    return asyncio.run(concurrent_writers(SessionLocal, inventory, writes, interval))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bags", type=int, default=20_000)
+    parser.add_argument("--owners", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=100, help="как размер страницы /food-bags/")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--writes", type=int, default=200, help="записей с пропуском версии")
+    parser.add_argument("--interval", type=float, default=0.25, help="INVENTORY_SYNC_INTERVAL, секунды")
+    args = parser.parse_args()
+    sys.exit(run(args.bags, args.owners, args.queries, args.limit, args.seed, args.writes, args.interval))
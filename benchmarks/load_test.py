@@ -0,0 +1,321 @@
+"""Нагрузочный тест API: сценарии против app.main:app, отчёт p50/p95/p99 по эндпоинтам в JSON.
+
+Приложение запускается в процессе (httpx.ASGITransport, со startup-обработчиками) на локальной
+базе из BENCH_DATABASE_URL, данные генерируются с фиксированным --seed. Сценарии:
+
+    login        - всплеск входов (bcrypt)
+    polling      - клиенты опрашивают GET /food-bags/ с If-None-Match и листают страницы
+    stampede     - все клиенты бронируют одну корзину
+    bulk_edit    - заведения правят корзины пачками и по одной
+    mixed        - всё одновременно, в пропорциях реального трафика
+
+На SQLite все записи идут через одну блокировку файла: под смешанной нагрузкой часть
+записей получает "database is locked" и попадает в отчёт как 500. Для замеров записи
+задайте BENCH_DATABASE_URL на MySQL.
+
+Сравнение с прошлым прогоном: --baseline old.json, код возврата 1, если p95 эндпоинта вырос
+или пропускная способность упала больше чем на --threshold.
+
+    python -m benchmarks.load_test --users 2000 --bags 5000 --bookings 10000 --output report.json
+    python -m benchmarks.load_test --output new.json --baseline report.json --threshold 0.2
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import insert
+
+from benchmarks.common import make_engine, make_session_factory, percentile, reset_schema
+from app import geo, models, passwords  # noqa: E402
+
+PASSWORD = "bench-password"
+SCENARIOS = ("login", "polling", "stampede", "bulk_edit", "mixed")
+CENTER_LAT, CENTER_LON = 55.75, 37.62
+
+
+# Данные
+def seed(SessionLocal, args, rng: random.Random):
+    # Один хэш на всех: bcrypt для тысяч пользователей занял бы минуты
+    hashed_password = passwords.hash_password(PASSWORD)
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        establishments = max(1, args.users // 20)
+        db.execute(insert(models.User), [
+            dict(email=f"est{i}@bench", hashed_password=hashed_password, role="establishment")
+            for i in range(establishments)
+        ] + [
+            dict(email=f"client{i}@bench", hashed_password=hashed_password, role="client")
+            for i in range(args.users)
+        ])
+        users = db.query(models.User.id, models.User.email, models.User.role).all()
+        owner_ids = [user.id for user in users if user.role == "establishment"]
+        client_ids = [user.id for user in users if user.role == "client"]
+
+        bags = []
+        for i in range(args.bags):
+            lat = CENTER_LAT + rng.uniform(-0.15, 0.15)
+            lon = CENTER_LON + rng.uniform(-0.15, 0.15)
+            bags.append(dict(
+                name=f"Bag {i}", description="Load test bag", price=10.0, discounted_price=5.0,
+                quantity=rng.randint(1, 20), address=f"Street {i % 300}, {i}",
+                pickup_time=now + timedelta(minutes=rng.randint(30, 60 * 24)), owner_id=rng.choice(owner_ids),
+                latitude=lat, longitude=lon, geohash=geo.geohash_encode(lat, lon),
+            ))
+        db.execute(insert(models.FoodBag), bags)
+        bag_rows = db.query(models.FoodBag.id, models.FoodBag.owner_id).all()
+        if args.bookings:
+            db.execute(insert(models.Booking), [
+                dict(user_id=rng.choice(client_ids), food_bag_id=rng.choice(bag_rows).id, quantity=1)
+                for _ in range(args.bookings)
+            ])
+        db.commit()
+    bags_by_owner = {}
+    for bag in bag_rows:
+        bags_by_owner.setdefault(bag.owner_id, []).append(bag.id)
+    return users, bags_by_owner
+
+
+# Запросы
+class Recorder:
+    def __init__(self):
+        self.samples = {}  # эндпоинт -> [(секунды, статус)]
+
+    @asynccontextmanager
+    async def measure(self, endpoint: str):
+        started = time.perf_counter()
+        result = {"status": 0}
+        try:
+            yield result
+        finally:
+            self.samples.setdefault(endpoint, []).append((time.perf_counter() - started, result["status"]))
+
+    def report(self, duration: float) -> dict:
+        endpoints = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            latencies = [seconds for seconds, _ in samples]
+            statuses = {}
+            for _, status in samples:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+            endpoints[endpoint] = {
+                "requests": len(samples),
+                "throughput": round(len(samples) / duration, 2),
+                "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+                "errors": sum(1 for _, status in samples if status >= 500),
+                "statuses": statuses,
+            }
+        return {"duration_s": round(duration, 3), "endpoints": endpoints}
+
+
+async def request(client, recorder: Recorder, endpoint: str, method: str, url: str, **kwargs):
+    async with recorder.measure(endpoint) as result:
+        response = await client.request(method, url, **kwargs)
+        result["status"] = response.status_code
+    return response
+
+
+def bag_payload(rng: random.Random, i: int) -> dict:
+    return {
+        "name": f"Edited bag {i}", "description": "Edited by load test", "price": 12.0,
+        "discounted_price": round(rng.uniform(3, 9), 2), "quantity": rng.randint(1, 20),
+        "address": f"Street {i % 300}, {i}", "pickup_time": "2100-01-01T00:00:00",
+    }
+
+
+class LoadTest:
+    def __init__(self, client, args, users, bags_by_owner):
+        self.client = client
+        self.args = args
+        self.clients = [user for user in users if user.role == "client"]
+        self.establishments = [user for user in users if user.role == "establishment"]
+        self.bags_by_owner = bags_by_owner
+        self.tokens = {}
+        self.etags = {}  # ETag последнего ответа списка по клиенту
+
+    def headers(self, user) -> dict:
+        from app.routers.auth import create_access_token
+
+        if user.id not in self.tokens:
+            self.tokens[user.id] = create_access_token(data={"sub": str(user.id), "role": user.role})
+        return {"Authorization": f"Bearer {self.tokens[user.id]}"}
+
+    async def run_workers(self, recorder: Recorder, count: int, job):
+        # count заданий, не больше --concurrency одновременно; у каждого воркера свой генератор случайных чисел
+        jobs = iter(range(count))
+
+        async def worker(index: int):
+            rng = random.Random(self.args.seed * 1000 + index)
+            for i in jobs:
+                await job(recorder, rng, i)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker(index) for index in range(self.args.concurrency)])
+        return time.perf_counter() - started
+
+    # Сценарии: job(recorder, rng, номер задания)
+    async def login(self, recorder, rng, i):
+        user = self.clients[i % len(self.clients)]
+        await request(self.client, recorder, "POST /auth/login", "POST", "/auth/login",
+                      data={"email": user.email, "password": PASSWORD})
+
+    async def poll(self, recorder, rng, i):
+        user = rng.choice(self.clients)
+        headers = self.headers(user)
+        if user.id in self.etags:
+            headers["If-None-Match"] = self.etags[user.id]
+        response = await request(self.client, recorder, "GET /food-bags/", "GET", "/food-bags/", headers=headers)
+        if response.status_code == 200:
+            self.etags[user.id] = response.headers.get("etag")
+            cursor = response.headers.get("x-next-cursor")
+            if cursor and rng.random() < 0.3:
+                await request(self.client, recorder, "GET /food-bags/?cursor", "GET", "/food-bags/",
+                              params={"cursor": cursor}, headers=self.headers(user))
+
+    async def book(self, recorder, rng, i, food_bag_id=None):
+        user = rng.choice(self.clients)
+        if food_bag_id is None:
+            owner_id = rng.choice(list(self.bags_by_owner))
+            food_bag_id = rng.choice(self.bags_by_owner[owner_id])
+        await request(self.client, recorder, "POST /bookings/", "POST", "/bookings/",
+                      json={"food_bag_id": food_bag_id, "quantity": 1}, headers=self.headers(user))
+
+    async def bulk_edit(self, recorder, rng, i):
+        owner = rng.choice(self.establishments)
+        bag_ids = self.bags_by_owner.get(owner.id) or []
+        if not bag_ids:
+            return
+        if rng.random() < 0.5:
+            items = [dict(bag_payload(rng, bag_id), id=bag_id) for bag_id in rng.sample(bag_ids, min(50, len(bag_ids)))]
+            await request(self.client, recorder, "PUT /food-bags/batch", "PUT", "/food-bags/batch",
+                          json={"items": items}, headers=self.headers(owner))
+        else:
+            bag_id = rng.choice(bag_ids)
+            await request(self.client, recorder, "PUT /food-bags/{id}", "PUT", f"/food-bags/{bag_id}",
+                          json=bag_payload(rng, bag_id), headers=self.headers(owner))
+
+    async def nearby(self, recorder, rng, i):
+        params = {"lat": CENTER_LAT + rng.uniform(-0.1, 0.1), "lon": CENTER_LON + rng.uniform(-0.1, 0.1), "radius": 2}
+        await request(self.client, recorder, "GET /food-bags/nearby", "GET", "/food-bags/nearby",
+                      params=params, headers=self.headers(rng.choice(self.clients)))
+
+    async def mixed(self, recorder, rng, i):
+        # Пропорции: в основном опрос списка, затем поиск рядом, бронирования, входы и правки
+        roll = rng.random()
+        if roll < 0.70:
+            await self.poll(recorder, rng, i)
+        elif roll < 0.82:
+            await self.nearby(recorder, rng, i)
+        elif roll < 0.92:
+            await self.book(recorder, rng, i)
+        elif roll < 0.97:
+            await self.login(recorder, rng, i)
+        else:
+            await self.bulk_edit(recorder, rng, i)
+
+    async def scenario(self, name: str) -> dict:
+        recorder = Recorder()
+        requests = self.args.requests
+        if name == "login":
+            duration = await self.run_workers(recorder, min(requests, self.args.logins), self.login)
+        elif name == "polling":
+            duration = await self.run_workers(recorder, requests, self.poll)
+        elif name == "stampede":
+            owner_id = next(iter(self.bags_by_owner))
+            hot_bag = self.bags_by_owner[owner_id][0]
+
+            async def stampede(recorder, rng, i):
+                await self.book(recorder, rng, i, food_bag_id=hot_bag)
+            duration = await self.run_workers(recorder, requests, stampede)
+        elif name == "bulk_edit":
+            duration = await self.run_workers(recorder, max(1, requests // 10), self.bulk_edit)
+        else:
+            duration = await self.run_workers(recorder, requests, self.mixed)
+        return recorder.report(duration)
+
+
+# Сравнение прогонов
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    for scenario, result in report["scenarios"].items():
+        old_endpoints = baseline.get("scenarios", {}).get(scenario, {}).get("endpoints", {})
+        for endpoint, stats in result["endpoints"].items():
+            old = old_endpoints.get(endpoint)
+            if not old:
+                continue
+            if old["p95_ms"] and stats["p95_ms"] > old["p95_ms"] * (1 + threshold):
+                regressions.append(f"{scenario} {endpoint}: p95 {old['p95_ms']} -> {stats['p95_ms']} ms")
+            if old["throughput"] and stats["throughput"] < old["throughput"] * (1 - threshold):
+                regressions.append(f"{scenario} {endpoint}: throughput {old['throughput']} -> {stats['throughput']} req/s")
+    return regressions
+
+
+async def run(args) -> int:
+    rng = random.Random(args.seed)
+    engine = make_engine()
+    reset_schema(engine)
+    users, bags_by_owner = seed(make_session_factory(engine), args, rng)
+
+    from app.main import app
+
+    report = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "database": engine.url.render_as_string(hide_password=True),
+            "python": platform.python_version(),
+            "users": args.users, "bags": args.bags, "bookings": args.bookings,
+            "requests": args.requests, "concurrency": args.concurrency, "seed": args.seed,
+        },
+        "scenarios": {},
+    }
+    # Исключения приложения записываются как ответы 500, а не прерывают прогон
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    # lifespan_context выполняет startup-обработчики приложения, как uvicorn
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            load_test = LoadTest(client, args, users, bags_by_owner)
+            for name in args.scenarios:
+                result = await load_test.scenario(name)
+                report["scenarios"][name] = result
+                print(f"{name} ({result['duration_s']}s)")
+                for endpoint, stats in result["endpoints"].items():
+                    print(f"  {endpoint:<26} {stats['throughput']:9.1f} req/s  p50={stats['p50_ms']:8.2f}  "
+                          f"p95={stats['p95_ms']:8.2f}  p99={stats['p99_ms']:8.2f} ms  statuses={stats['statuses']}")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"no regressions over {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--bags", type=int, default=2000)
+    parser.add_argument("--bookings", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=2000, help="запросов на сценарий")
+    parser.add_argument("--logins", type=int, default=200, help="входов в сценарии login (bcrypt дорогой)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="load_test_report.json")
+    parser.add_argument("--baseline", help="отчёт прошлого прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимое ухудшение, доля (0.2 = 20%%)")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
@@ -0,0 +1,164 @@
+"""Стоимость логирования в потоке запроса: записи create_booking на один запрос.
+
+Сравниваются:
+- sync f-string - прежняя настройка (basicConfig: StreamHandler пишет в файл прямо из запроса);
+- queue - BackgroundQueueHandler из app.logs, запись и JSON в фоновом потоке;
+- queue sampled - то же с LOG_SAMPLE_RATE=--rate (info отбрасываются до очереди);
+- level=WARNING - info выключен: f-string собирает строку зря, %-стиль - нет.
+--sink-delay-us добавляет задержку на каждую запись в вывод (медленный диск, заполненный pipe).
+Код возврата 1, если в выводе не все записи или сэмплирование потеряло предупреждения.
+
+    python -m benchmarks.logging_overhead --requests 20000 --sink-delay-us 50
+"""
+import argparse
+import logging
+import os
+import queue
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from logging.handlers import QueueListener
+from types import SimpleNamespace
+
+from app.logs import BackgroundQueueHandler, JsonFormatter, RequestContextFilter, _request_sampled, is_sampled
+
+LOG_PATH = os.path.join(tempfile.gettempdir(), "quickbag_bench_logging.log")
+
+
+class SlowFile:
+    # Файл вывода с задержкой на каждую запись
+    def __init__(self, path: str, delay: float):
+        self.file = open(path, "w", encoding="utf-8")
+        self.delay = delay
+
+    def write(self, text):
+        if self.delay:
+            time.sleep(self.delay)
+        return self.file.write(text)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def request_fstring(log, user, booking, warn: bool):
+    log.info(
+        f"Booking attempt by user_id={user.id} "
+        f"email={user.email} role={user.role} "
+        f"food_bag_id={booking.food_bag_id} quantity={booking.quantity}"
+    )
+    if warn:
+        log.warning(f"Booking rejected for food_bag_id={booking.food_bag_id}: Not enough food bags available")
+    else:
+        log.info(f"Booking created successfully with id={booking.id} for user_id={user.id}")
+
+
+def request_lazy(log, user, booking, warn: bool):
+    fields = {"user_id": user.id, "food_bag_id": booking.food_bag_id}
+    log.info(
+        "Booking attempt by user_id=%s email=%s role=%s food_bag_id=%s quantity=%s",
+        user.id, user.email, user.role, booking.food_bag_id, booking.quantity,
+        extra=fields,
+    )
+    if warn:
+        log.warning("Booking rejected for food_bag_id=%s: %s", booking.food_bag_id,
+                    "Not enough food bags available", extra=fields)
+    else:
+        log.info("Booking created successfully with id=%s for user_id=%s", booking.id, user.id, extra=fields)
+
+
+def measure(label: str, make_handler, emit, args, level=logging.INFO, rate: float = 1.0) -> dict:
+    sink = SlowFile(LOG_PATH, args.sink_delay_us / 1e6)
+    handler, listener = make_handler(sink)
+    log = logging.getLogger(f"bench.{label}")
+    log.handlers = [handler]
+    log.propagate = False
+    log.setLevel(level)
+    if listener is not None:
+        listener.start()
+
+    durations = []
+    warnings = 0
+    for i in range(args.requests):
+        user = SimpleNamespace(id=i % 500 + 1, email=f"client{i % 500}@bench", role="client")
+        booking = SimpleNamespace(id=i + 1, food_bag_id=i % 100 + 1, quantity=1)
+        warn = i % args.warn_every == 0
+        warnings += warn
+        # Как RequestIdMiddleware: решение сэмплирования на весь запрос
+        token = _request_sampled.set(is_sampled(uuid.uuid4().hex, rate))
+        started = time.perf_counter()
+        emit(log, user, booking, warn)
+        durations.append(time.perf_counter() - started)
+        _request_sampled.reset(token)
+
+    drained_started = time.perf_counter()
+    if listener is not None:
+        listener.stop()
+    drain = time.perf_counter() - drained_started
+    handler.close()
+    sink.close()
+    with open(LOG_PATH, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    durations.sort()
+    return {
+        "label": label,
+        "mean": statistics.fmean(durations),
+        "p99": durations[int(len(durations) * 0.99)],
+        "drain": drain,
+        "lines": len(lines),
+        "warning_lines": sum('"WARNING"' in line or " - WARNING - " in line for line in lines),
+        "warnings": warnings,
+    }
+
+
+def sync_handler(sink):
+    # Прежняя настройка: logging.basicConfig(level=INFO) из main.py
+    handler = logging.StreamHandler(sink)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    return handler, None
+
+
+def queue_handler(sink):
+    output = logging.StreamHandler(sink)
+    output.setFormatter(JsonFormatter())
+    records = queue.Queue(maxsize=0)  # без ограничения: в замере важны все записи
+    handler = BackgroundQueueHandler(records)
+    handler.addFilter(RequestContextFilter())
+    return handler, QueueListener(records, output, respect_handler_level=True)
+
+
+def run(args) -> int:
+    n = args.requests
+    results = [
+        (measure("sync f-string", sync_handler, request_fstring, args), 2 * n),
+        (measure("queue", queue_handler, request_lazy, args), 2 * n),
+        (measure("queue sampled", queue_handler, request_lazy, args, rate=args.rate), None),
+        (measure("WARNING f-string", sync_handler, request_fstring, args, level=logging.WARNING), None),
+        (measure("WARNING %-style", queue_handler, request_lazy, args, level=logging.WARNING), None),
+    ]
+    print(f"requests={n}, sink delay={args.sink_delay_us} us/record, sample rate={args.rate}")
+    print(f"{'setup':<18} {'mean us':>9} {'p99 us':>9} {'drain ms':>9} {'lines':>7}")
+    failed = False
+    for result, expected_lines in results:
+        print(f"{result['label']:<18} {result['mean'] * 1e6:9.2f} {result['p99'] * 1e6:9.2f} "
+              f"{result['drain'] * 1000:9.1f} {result['lines']:7d}")
+        if expected_lines is not None and result["lines"] != expected_lines:
+            print(f"FAIL: {result['label']} wrote {result['lines']} lines, expected {expected_lines}")
+            failed = True
+        if result["warning_lines"] != result["warnings"]:
+            print(f"FAIL: {result['label']} kept {result['warning_lines']} of {result['warnings']} warnings")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--sink-delay-us", type=float, default=0.0)
+    parser.add_argument("--rate", type=float, default=0.1)
+    parser.add_argument("--warn-every", type=int, default=10, help="каждый N-й запрос получает отказ (warning)")
+    sys.exit(run(parser.parse_args()))
@@ -0,0 +1,86 @@
+"""Поиск "рядом со мной" по geohash-индексу против текущего ilike по адресу.
+
+    python -m benchmarks.nearby --bags 100000 --queries 200 --radius 2
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app import crud, geo, models
+from benchmarks.common import make_engine, make_session_factory, percentile, reset_schema, seed_users
+
+# Синтетический город: квадрат ~40x40 км вокруг центра Москвы
+CENTER_LAT, CENTER_LON = 55.75, 37.62
+SPREAD_DEG = 0.18
+
+
+def seed_bags(db, owner_id: int, count: int, rng: random.Random):
+    pickup_time = datetime.utcnow() + timedelta(days=1)
+    batch = []
+    for i in range(count):
+        lat = CENTER_LAT + rng.uniform(-SPREAD_DEG, SPREAD_DEG)
+        lon = CENTER_LON + rng.uniform(-SPREAD_DEG, SPREAD_DEG)
+        batch.append(dict(
+            name=f"Bag {i}", description="Synthetic", price=10.0, discounted_price=5.0, quantity=5,
+            address=f"Street {i % 5000}, {i}", pickup_time=pickup_time, owner_id=owner_id,
+            latitude=lat, longitude=lon, geohash=geo.geohash_encode(lat, lon),
+        ))
+        if len(batch) == 5000:
+            db.execute(insert(models.FoodBag), batch)
+            batch = []
+    if batch:
+        db.execute(insert(models.FoodBag), batch)
+    db.commit()
+
+
+def timed(fn, arguments):
+    latencies = []
+    found = 0
+    for args in arguments:
+        started = time.perf_counter()
+        found += len(fn(*args))
+        latencies.append(time.perf_counter() - started)
+    return latencies, found
+
+
+def report(label, latencies, found):
+    total = sum(latencies)
+    print(f"{label:<10} {len(latencies) / total:8.1f} q/s  p50={percentile(latencies, 50) * 1000:7.2f} ms  "
+          f"p99={percentile(latencies, 99) * 1000:7.2f} ms  rows/query={found / len(latencies):.1f}")
+
+
+def run(bags: int, queries: int, radius: float, limit: int, seed: int):
+    rng = random.Random(seed)
+    engine = make_engine()
+    reset_schema(engine)
+    SessionLocal = make_session_factory(engine)
+
+    with SessionLocal() as db:
+        owner_id = seed_users(db, 1, role="establishment", prefix="owner")[0]
+        started = time.perf_counter()
+        seed_bags(db, owner_id, bags, rng)
+        print(f"seeded {bags} bags in {time.perf_counter() - started:.1f}s")
+
+        points = [
+            (db, CENTER_LAT + rng.uniform(-SPREAD_DEG, SPREAD_DEG), CENTER_LON + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+             radius, None, limit)
+            for _ in range(queries)
+        ]
+        streets = [(db, None, f"Street {rng.randrange(5000)},") for _ in range(queries)]
+
+        report("nearby", *timed(crud.get_food_bags_nearby, points))
+        report("ilike", *timed(lambda db, user, address: crud.get_food_bags(db, user, address, True), streets))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bags", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--radius", type=float, default=2.0)
+    parser.add_argument("--limit", type=int, default=100, help="как в эндпоинте /food-bags/nearby")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.bags, args.queries, args.radius, args.limit, args.seed)
@@ -0,0 +1,140 @@
+"""Загрузка фото корзин: время ответа, память и превью вне запроса.
+
+Каждая загрузка - новое фото (другие пиксели, другой sha256) размером около --megapixels Мп.
+Замеряется время ответа PUT /food-bags/{id}/photo, пик памяти Python во время загрузки
+(tracemalloc; тело пишется на диск блоками) и время, через которое photo_url корзины
+переходит на превью. Повторная загрузка того же файла - дедупликация без новой обработки.
+Код возврата 1, если загрузка держит в памяти больше --max-buffer-mb, отвечает дольше, чем
+строятся превью (значит, ждёт их), или дубликат не получает готовое превью.
+
+    python -m benchmarks.photos --uploads 10 --megapixels 12
+"""
+import argparse
+import asyncio
+import io
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+MEDIA_DIR = os.path.join(tempfile.gettempdir(), "quickbag_bench_media")
+os.environ.setdefault("MEDIA_DIR", MEDIA_DIR)
+os.environ.setdefault("INVENTORY_ENABLED", "false")
+
+import httpx  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from benchmarks.common import (  # noqa: E402
+    access_token, make_engine, make_session_factory, reset_schema, seed_food_bag, seed_users,
+)
+
+
+def make_photo(megapixels: float, seed: int) -> bytes:
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    rng = random.Random(seed)
+    # Шум поверх градиента: JPEG не сжимается до пары килобайт, как однотонная картинка
+    noise = Image.frombytes("L", (width // 8, height // 8), rng.randbytes(width // 8 * (height // 8)))
+    image = Image.merge("RGB", (
+        Image.linear_gradient("L").resize((width, height)),
+        noise.resize((width, height)),
+        Image.new("L", (width, height), seed % 256),
+    ))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+async def chunks(data: bytes, size: int = 64 * 1024):
+    for offset in range(0, len(data), size):
+        yield data[offset:offset + size]
+
+
+async def run(args) -> int:
+    shutil.rmtree(MEDIA_DIR, ignore_errors=True)
+    engine = make_engine()
+    reset_schema(engine)
+    with make_session_factory(engine)() as db:
+        owner_id = seed_users(db, 1, role="establishment", prefix="owner")[0]
+        bag_ids = [seed_food_bag(db, owner_id, quantity=5) for _ in range(args.uploads + 1)]
+
+    from app.main import app
+    from app.metrics import photo_thumbnail_duration
+    from app.photos import DEFAULT_SIZE, photo_pipeline
+
+    photos = [make_photo(args.megapixels, seed) for seed in range(args.uploads)]
+    headers = {"Authorization": f"Bearer {access_token(owner_id, 'establishment')}", "Content-Type": "image/jpeg"}
+    upload_times, ready_times, peaks = [], [], []
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as http:
+            # Первая загрузка запускает пул процессов - она не входит в замер
+            warmup = make_photo(0.1, 10_000)
+            (await http.put(f"/food-bags/{bag_ids[-1]}/photo", content=warmup, headers=headers)).raise_for_status()
+
+            for bag_id, photo in zip(bag_ids, photos):
+                tracemalloc.start()
+                started = time.perf_counter()
+                # Тело отдаётся блоками, как его прислал бы клиент по сети
+                response = await http.put(f"/food-bags/{bag_id}/photo", content=chunks(photo), headers=headers)
+                uploaded = time.perf_counter()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                response.raise_for_status()
+                upload_times.append(uploaded - started)
+                peaks.append(peak)
+                original = response.json()["photo_url"]
+                while True:
+                    listed = (await http.get("/food-bags/?limit=100", headers=headers)).json()
+                    current = next(item["photo_url"] for item in listed if item["id"] == bag_id)
+                    if current != original:
+                        break
+                    if time.perf_counter() - started > 60:
+                        print(f"FAIL: thumbnails of food bag {bag_id} not ready in 60 s")
+                        return 1
+                    await asyncio.sleep(0.01)
+                ready_times.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            duplicate = await http.put(f"/food-bags/{bag_ids[-1]}/photo", content=photos[0], headers=headers)
+            duplicate_time = time.perf_counter() - started
+            duplicate.raise_for_status()
+        await photo_pipeline.drain()
+
+    size_mb = statistics.mean(len(photo) for photo in photos) / 2 ** 20
+    upload_ms = statistics.median(upload_times) * 1000
+    ready_ms = statistics.median(ready_times) * 1000
+    peak_mb = max(peaks) / 2 ** 20
+    counts, total = photo_thumbnail_duration._series[()]
+    thumbnail_ms = total / sum(counts) * 1000
+    print(f"uploads={args.uploads}, photo {args.megapixels} Mpx, {size_mb:.1f} MB")
+    print(f"upload response  p50 {upload_ms:8.1f} ms")
+    print(f"thumbnails (pool)    {thumbnail_ms:8.1f} ms mean")
+    print(f"thumbnails ready p50 {ready_ms:8.1f} ms (after upload started)")
+    print(f"duplicate upload     {duplicate_time * 1000:8.1f} ms, photo_url={duplicate.json()['photo_url']}")
+    print(f"upload memory peak   {peak_mb:8.2f} MB")
+
+    failed = False
+    if peak_mb > args.max_buffer_mb:
+        print(f"FAIL: upload kept {peak_mb:.1f} MB in memory (limit {args.max_buffer_mb} MB)")
+        failed = True
+    if upload_ms >= thumbnail_ms:
+        print("FAIL: upload response waited for thumbnails")
+        failed = True
+    if not duplicate.json()["photo_url"].endswith(f"-{DEFAULT_SIZE}.jpg"):
+        print("FAIL: duplicate upload did not reuse existing thumbnails")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=10)
+    parser.add_argument("--megapixels", type=float, default=12.0)
+    parser.add_argument("--max-buffer-mb", type=float, default=2.0)
+    sys.exit(asyncio.run(run(parser.parse_args())))
@@ -0,0 +1,123 @@
+"""Проверка бюджета SQL-запросов эндпоинтов: число запросов не должно расти с числом строк.
+
+Каждый эндпоинт вызывается на маленькой и на большой базе; запросы считаются по событиям
+движка, бюджет проверяет QueryCounterMiddleware (QUERY_BUDGET_MODE=raise). Код возврата 1,
+если бюджет превышен или число запросов зависит от размера ответа (N+1). Входит в тесты
+(tests/test_query_checks.py).
+
+    python -m benchmarks.query_budget --rows 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+os.environ.setdefault("QUERY_BUDGET_MODE", "raise")
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from benchmarks.common import (  # noqa: E402
+    access_token, make_engine, make_session_factory, reset_schema, seed_food_bag, seed_users,
+)
+
+
+def seed(SessionLocal, count: int, batch: int):
+    with SessionLocal() as db:
+        owner_id = seed_users(db, 1, role="establishment", prefix=f"owner{batch}-")[0]
+        client_ids = seed_users(db, count, role="client", prefix=f"client{batch}-")
+        admin_id = seed_users(db, 1, role="admin", prefix=f"admin{batch}-")[0]
+        bag_ids = [
+            seed_food_bag(db, owner_id, quantity=100, latitude=55.75, longitude=37.62, geohash="ucfv0j")
+            for _ in range(count)
+        ]
+    return {
+        "client": access_token(client_ids[0], "client"),
+        "establishment": access_token(owner_id, "establishment"),
+        "admin": access_token(admin_id, "admin"),
+        "bag_id": bag_ids[0],
+    }
+
+
+def scenarios(tokens):
+    return [
+        ("GET /food-bags/ (client)", "GET", "/food-bags/?limit=1000", tokens["client"], None),
+        ("GET /food-bags/ (owner)", "GET", "/food-bags/?limit=1000", tokens["establishment"], None),
+        ("GET /food-bags/nearby", "GET", "/food-bags/nearby?lat=55.75&lon=37.62&radius=5&limit=1000",
+         tokens["client"], None),
+        ("GET /food-bags/search", "GET", "/food-bags/search?q=bench&limit=1000", tokens["client"], None),
+        ("GET /users/", "GET", "/users/", tokens["admin"], None),
+        ("POST /bookings/", "POST", "/bookings/", tokens["client"], {"food_bag_id": tokens["bag_id"], "quantity": 1}),
+    ]
+
+
+async def measure(client, tokens, counter, inventory: bool):
+    from app.config import settings
+    from app.inventory import live_inventory
+    from app.principal_cache import principal_cache
+    from app.query_counter import QueryBudgetExceeded
+
+    settings.INVENTORY_ENABLED = inventory
+    results = {}
+    for label, method, url, token, body in scenarios(tokens):
+        # Худший случай: пользователь не в кэше, индекс корзин требует перестройки
+        principal_cache.clear()
+        live_inventory.version = None
+        # Фоновая сверка версии пользователей - не запрос эндпоинта: выполняется заранее
+        await principal_cache.check()
+        before = counter[0]
+        try:
+            response = await client.request(method, url, json=body, headers={"Authorization": f"Bearer {token}"})
+            status = response.status_code
+            rows = len(response.json()) if method == "GET" else 1
+        except QueryBudgetExceeded as e:
+            status, rows = "over budget", 0
+            print(e, file=sys.stderr)
+        results[label] = (counter[0] - before, status, rows)
+    return results
+
+
+async def run(args):
+    engine = make_engine()
+    reset_schema(engine)
+    SessionLocal = make_session_factory(engine)
+
+    from app.config import settings
+    from app.main import app
+
+    inventory_enabled = settings.INVENTORY_ENABLED
+    counter = [0]
+
+    def count_query(*_):
+        counter[0] += 1
+
+    event.listen(Engine, "before_cursor_execute", count_query)
+    try:
+        failed = False
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for inventory in (True, False):
+                small = await measure(client, seed(SessionLocal, 1, 0), counter, inventory)
+                seed(SessionLocal, args.rows, 1)
+                large = await measure(client, seed(SessionLocal, 1, 2), counter, inventory)
+                reset_schema(engine)
+                print(f"INVENTORY_ENABLED={inventory}")
+                for label, (small_queries, small_status, small_rows) in small.items():
+                    large_queries, large_status, large_rows = large[label]
+                    ok = small_status in (200, 201) and large_status in (200, 201) and large_queries <= small_queries
+                    failed = failed or not ok
+                    print(f"  {'ok ' if ok else 'FAIL'} {label:<26} queries={small_queries}/{large_queries} "
+                          f"rows={small_rows}/{large_rows} status={small_status}/{large_status}")
+    finally:
+        # Из pytest (tests/test_query_checks.py) движки живут дальше - счётчик снимается
+        event.remove(Engine, "before_cursor_execute", count_query)
+        settings.INVENTORY_ENABLED = inventory_enabled
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200, help="сколько корзин и пользователей добавить для большой базы")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
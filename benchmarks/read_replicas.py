@@ -0,0 +1,123 @@
+"""Маршрутизация чтений на реплику и read-your-writes на двух базах: основной и "реплике".
+
+Обе базы - временные SQLite-файлы, репликация - копирование файла основной базы
+по команде, поэтому отставание реплики управляемое. Проверяется, что:
+- списки, поиск и /auth/me читаются с реплики, записи идут в основную БД;
+- автор изменения в течение DB_READ_YOUR_WRITES видит его сразу (основная БД),
+  в том числе в другом воркере - по cookie;
+- остальные клиенты видят реплику, а после окна автор снова читает с неё.
+Код возврата 1 при расхождении.
+
+    python -m benchmarks.read_replicas
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+
+REPLICA_PATH = os.path.join(tempfile.gettempdir(), "quickbag_bench_replica.db")
+os.environ.setdefault("DB_REPLICA_URLS", f"sqlite+aiosqlite:///{REPLICA_PATH}")
+os.environ.setdefault("DB_READ_YOUR_WRITES", "1")
+# Списки читаются из БД, а не из живого индекса в памяти
+os.environ.setdefault("INVENTORY_ENABLED", "false")
+
+import httpx  # noqa: E402
+
+from benchmarks.common import (  # noqa: E402
+    BENCH_DATABASE_URL, access_token, make_engine, make_session_factory, reset_schema, seed_users,
+)
+
+
+def replicate():
+    # "Репликация": копия файла основной базы поверх реплики
+    source = sqlite3.connect(BENCH_DATABASE_URL[len("sqlite:///"):])
+    target = sqlite3.connect(REPLICA_PATH)
+    with target:
+        source.backup(target)
+    source.close()
+    target.close()
+
+
+def checkouts(name: str) -> int:
+    from app.pool_stats import POOL_STATS
+    return POOL_STATS[name].checkouts
+
+
+async def run(args) -> int:
+    if not BENCH_DATABASE_URL.startswith("sqlite:///"):
+        print("Нужна SQLite: реплика здесь - копия файла основной базы")
+        return 1
+    engine = make_engine()
+    reset_schema(engine)
+    with make_session_factory(engine)() as db:
+        owner_id = seed_users(db, 1, role="establishment", prefix="owner")[0]
+        client_id = seed_users(db, 1, role="client", prefix="client")[0]
+    replicate()
+
+    from app.database import read_your_writes
+    from app.main import app
+
+    owner = {"Authorization": f"Bearer {access_token(owner_id, 'establishment')}"}
+    client = {"Authorization": f"Bearer {access_token(client_id, 'client')}"}
+    bag = {"name": "Fresh bag", "description": "replica check", "price": 10, "discounted_price": 5,
+           "quantity": 3, "address": "Replica street, 1", "pickup_time": "2099-01-01T12:00:00"}
+    results = []
+
+    def check(label: str, ok: bool, detail: str = ""):
+        results.append(ok)
+        print(f"  {'ok ' if ok else 'FAIL'} {label} {detail}")
+
+    async def names(client_headers, cookies=None):
+        response = await http.get("/food-bags/", headers=client_headers, cookies=cookies)
+        response.raise_for_status()
+        return [item["name"] for item in response.json()]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        replica_before, primary_before = checkouts("replica0"), checkouts("async")
+        for _ in range(args.reads):
+            await names(client)
+        await http.get("/auth/me", headers=client)
+        check("reads go to the replica",
+              checkouts("replica0") - replica_before >= args.reads and checkouts("async") == primary_before,
+              f"replica checkouts={checkouts('replica0') - replica_before}, "
+              f"primary checkouts={checkouts('async') - primary_before}")
+
+        created = await http.post("/food-bags/", json=bag, headers=owner)
+        created.raise_for_status()
+        pin_cookie = created.cookies.get(read_your_writes.COOKIE)
+        check("write sets the read-your-writes cookie", pin_cookie is not None)
+        # Один httpx-клиент на всех: cookie автора другим клиентам не отправляется
+        http.cookies.clear()
+        check("author sees the write at once", "Fresh bag" in await names(owner))
+        check("other clients read the lagging replica", "Fresh bag" not in await names(client))
+
+        # Другой воркер не знает о записи, но получает cookie
+        read_your_writes._pins.clear()
+        check("cookie pins the author in another worker",
+              "Fresh bag" in await names(owner, cookies={read_your_writes.COOKIE: pin_cookie}))
+        await asyncio.sleep(read_your_writes.window + 0.1)
+        check("expired pin reads the replica again", "Fresh bag" not in await names(owner))
+
+        replicate()
+        check("replica catches up", "Fresh bag" in await names(client))
+
+        # Пользователь, созданный только что, авторизуется, хотя на реплике его ещё нет
+        registered = await http.post("/users/register", json={"email": "new@bench", "password": "pw", "role": "client"})
+        registered.raise_for_status()
+        read_your_writes._pins.clear()
+        http.cookies.clear()
+        token = access_token(registered.json()["id"], "client")
+        me = await http.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+        check("new user falls back to the primary", me.status_code == 200, f"status={me.status_code}")
+
+    print(f"{sum(results)}/{len(results)} checks passed")
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reads", type=int, default=20)
+    sys.exit(asyncio.run(run(parser.parse_args())))
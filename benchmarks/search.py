@@ -0,0 +1,72 @@
+"""Задержка полнотекстового поиска при росте таблицы food_bags.
+
+На MySQL (BENCH_DATABASE_URL=mysql+pymysql://...) используется FULLTEXT-индекс,
+и время запроса должно расти заметно медленнее размера таблицы;
+на SQLite работает запасной ILIKE-поиск с полным просмотром.
+
+    python -m benchmarks.search --sizes 10000 20000 40000 80000 --queries 100
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app import crud, models
+from benchmarks.common import make_engine, make_session_factory, percentile, reset_schema, seed_users
+
+WORDS = [
+    "bakery", "bread", "croissant", "sushi", "pizza", "salad", "vegan", "coffee", "bagel", "dumplings",
+    "soup", "pastry", "market", "grocery", "cheese", "fruit", "noodles", "burger", "falafel", "donut",
+]
+STREETS = ["Tverskaya", "Arbat", "Lenina", "Pushkina", "Gagarina", "Mira", "Sadovaya", "Nevsky"]
+
+
+def seed_bags(db, owner_id: int, start: int, count: int, rng: random.Random):
+    pickup_time = datetime.utcnow() + timedelta(days=1)
+    rows = [
+        dict(
+            name=f"{rng.choice(WORDS).title()} box {i}",
+            description=" ".join(rng.sample(WORDS, 5)),
+            address=f"{rng.choice(STREETS)} street, {i % 300}",
+            price=10.0, discounted_price=5.0, quantity=3, pickup_time=pickup_time, owner_id=owner_id,
+        )
+        for i in range(start, start + count)
+    ]
+    for offset in range(0, len(rows), 5000):
+        db.execute(insert(models.FoodBag), rows[offset:offset + 5000])
+    db.commit()
+
+
+def run(sizes, queries: int, limit: int, seed: int):
+    rng = random.Random(seed)
+    engine = make_engine()
+    reset_schema(engine)
+    SessionLocal = make_session_factory(engine)
+    print(f"database: {engine.url.render_as_string(hide_password=True)}")
+
+    with SessionLocal() as db:
+        owner_id = seed_users(db, 1, role="establishment", prefix="owner")[0]
+        seeded = 0
+        for size in sorted(sizes):
+            seed_bags(db, owner_id, seeded, size - seeded, rng)
+            seeded = size
+            terms = [f"{rng.choice(WORDS)} {rng.choice(STREETS)}" for _ in range(queries)]
+            latencies = []
+            for term in terms:
+                started = time.perf_counter()
+                crud.search_food_bags(db, term, limit=limit)
+                latencies.append(time.perf_counter() - started)
+            print(f"rows={size:>8}  p50={percentile(latencies, 50) * 1000:8.2f} ms  "
+                  f"p99={percentile(latencies, 99) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 20_000, 40_000, 80_000])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run(args.sizes, args.queries, args.limit, args.seed)
@@ -0,0 +1,85 @@
+"""Сериализация больших списков: ORM + pydantic (текущий путь) против колонок + orjson.
+
+Замеряется путь от запроса в БД до готовых байт ответа, как в эндпоинтах
+GET /food-bags/ и GET /users/ с FAST_JSON_RESPONSES выключенным и включённым.
+
+    python -m benchmarks.serialization --rows 5000 --repeat 20
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+
+from app import crud, models, schemas
+from app.serialization import food_bag_item, user_item
+from benchmarks.common import make_engine, make_session_factory, reset_schema, seed_users
+
+
+def seed_bags(db, owner_id: int, count: int):
+    pickup_time = datetime.utcnow() + timedelta(days=1)
+    db.execute(insert(models.FoodBag), [
+        dict(name=f"Bag {i}", description="Synthetic food bag", price=10.0, discounted_price=4.5, quantity=5,
+             address=f"Street {i}", pickup_time=pickup_time + timedelta(seconds=i), owner_id=owner_id,
+             latitude=55.75, longitude=37.62, photo_url="/placeholder.jpg")
+        for i in range(count)
+    ])
+    db.commit()
+
+
+def best_of(fn, repeat: int):
+    best = float("inf")
+    body = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, body
+
+
+def run(rows: int, repeat: int):
+    engine = make_engine()
+    reset_schema(engine)
+    SessionLocal = make_session_factory(engine)
+
+    # Так FastAPI обрабатывает возвращённые ORM-объекты при заданном response_model
+    food_bags_adapter = TypeAdapter(list[schemas.FoodBagResponse])
+    users_adapter = TypeAdapter(list[schemas.UserResponse])
+
+    with SessionLocal() as db:
+        owner_id = seed_users(db, 1, role="establishment", prefix="owner")[0]
+        seed_users(db, rows, role="client")
+        seed_bags(db, owner_id, rows)
+
+        cases = {
+            "food bags": (
+                lambda: food_bags_adapter.dump_json(food_bags_adapter.validate_python(
+                    crud.get_food_bags(db, filter_expired=True), from_attributes=True)),
+                lambda: orjson.dumps([food_bag_item(row) for row in crud.get_food_bag_rows(db, filter_expired=True)]),
+            ),
+            "users": (
+                lambda: users_adapter.dump_json(users_adapter.validate_python(
+                    crud.get_all_users(db), from_attributes=True)),
+                lambda: orjson.dumps([user_item(row) for row in crud.get_all_user_rows(db)]),
+            ),
+        }
+        for label, (current, fast) in cases.items():
+            db.expunge_all()
+            current_time, current_body = best_of(current, repeat)
+            db.expunge_all()
+            fast_time, fast_body = best_of(fast, repeat)
+            same = json.loads(current_body) == json.loads(fast_body)
+            count = len(json.loads(fast_body))
+            print(f"{label:<10} pydantic {count / current_time:10.0f} rows/s   orjson {count / fast_time:10.0f} rows/s   "
+                  f"x{current_time / fast_time:.1f}   same output: {same}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
@@ -0,0 +1,125 @@
+"""Время старта воркера: от запуска процесса до ответа на первый запрос.
+
+Каждый запуск - отдельный процесс, как новый воркер uvicorn: импорт app.main,
+lifespan (проверка схемы, администратор, живой индекс) и GET /food-bags/.
+cold - пустая БД (миграции и создание администратора), warm - схема на последней ревизии
+и администратор есть (перезапуск, масштабирование). Код возврата 1, если тёплый старт
+импортирует Alembic или хэширует пароль: значит, сломалась проверка версии схемы.
+
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PHASES = ("total", "import", "lifespan", "first_request")
+
+
+def child():
+    # Выполняется в новом процессе: app.* импортируется только здесь
+    import_started = time.perf_counter()
+    from app.main import app
+    imported = time.perf_counter()
+
+    import asyncio
+    import httpx
+    from app import models, passwords
+    from app.database import SessionLocal
+    from app.routers.auth import create_access_token
+
+    hashed = []
+    hash_password = passwords.hash_password
+
+    def counting_hash_password(password):
+        hashed.append(password)
+        return hash_password(password)
+
+    passwords.hash_password = counting_hash_password
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            started = time.perf_counter()
+            with SessionLocal() as db:
+                admin_id = db.query(models.User.id).filter(models.User.email == "admin@admin").scalar()
+            token = create_access_token(data={"sub": str(admin_id), "role": "admin"})
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                requested = time.perf_counter()
+                response = await client.get("/food-bags/", headers={"Authorization": f"Bearer {token}"})
+                answered = time.perf_counter()
+                answered_at = time.time()
+            response.raise_for_status()
+            return started, requested, answered, answered_at
+
+    lifespan_started = time.perf_counter()
+    started, requested, answered, answered_at = asyncio.run(run())
+    print(json.dumps({
+        # Время на поиск администратора и токен не входит в замер: это работа клиента
+        "total": answered_at - float(os.environ["STARTUP_SPAWNED_AT"]) - (requested - started),
+        "import": imported - import_started,
+        "lifespan": started - lifespan_started,
+        "first_request": answered - requested,
+        "alembic_imported": "alembic" in sys.modules,
+        "password_hashed": bool(hashed),
+    }))
+
+
+def drop_schema():
+    from benchmarks.common import make_engine
+    from app.database import Base
+
+    engine = make_engine()
+    Base.metadata.drop_all(bind=engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE IF EXISTS alembic_version")
+        connection.exec_driver_sql("DROP TABLE IF EXISTS change_versions")
+    engine.dispose()
+
+
+def spawn() -> dict:
+    env = dict(os.environ, STARTUP_SPAWNED_AT=repr(time.time()), QUERY_BUDGET_MODE="off")
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def report(label: str, runs: list):
+    medians = {phase: statistics.median(run[phase] for run in runs) * 1000 for phase in PHASES}
+    print(f"{label:<5} " + "  ".join(f"{phase}={medians[phase]:7.1f} ms" for phase in PHASES)
+          + f"  alembic={any(run['alembic_imported'] for run in runs)}"
+          + f"  bcrypt={any(run['password_hashed'] for run in runs)}")
+
+
+def main(args) -> int:
+    # Переменные окружения для дочерних процессов выставляет benchmarks.common
+    import benchmarks.common  # noqa: F401
+
+    cold, warm = [], []
+    for _ in range(args.runs):
+        drop_schema()
+        cold.append(spawn())
+        warm.append(spawn())
+    print(f"runs={args.runs}, median per phase")
+    report("cold", cold)
+    report("warm", warm)
+    regressed = any(run["alembic_imported"] or run["password_hashed"] for run in warm)
+    if regressed:
+        print("FAIL: warm start ran migrations or hashed the admin password")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+    else:
+        sys.exit(main(args))
@@ -0,0 +1,131 @@
+"""Статика фронтенда: прежняя раздача (StaticFiles, FileResponse с os.path.exists) против app/assets.py.
+
+Замеряются байты, которые браузер получает при первом и повторном заходе (index.html,
+CSS и JS; Accept-Encoding: gzip, deflate, br), и время ответа на GET / и на скрипт
+через ASGI без сети. Код возврата 1, если повторный заход скачивает тела заново
+или первый заход не получает сжатые файлы.
+
+    python -m benchmarks.static_assets --requests 2000
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import FileResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+
+from app.assets import INDEX, SOURCE_DIR, StaticAssets
+
+BROWSER = {"Accept-Encoding": "gzip, deflate, br"}
+
+
+def baseline_app() -> Starlette:
+    # Как было в app/main.py: проверка файла на каждый запрос и файлы без сжатия
+    async def read_index(request):
+        index_path = os.path.join(SOURCE_DIR, INDEX)
+        if os.path.exists(index_path):
+            return FileResponse(index_path)
+        return None
+
+    return Starlette(routes=[Route("/", read_index), Mount("/static", StaticFiles(directory=SOURCE_DIR))])
+
+
+def assets_app(assets: StaticAssets) -> Starlette:
+    async def read_index(request):
+        return assets.response(INDEX, request.headers)
+
+    return Starlette(routes=[Route("/", read_index), Mount("/static", assets)])
+
+
+async def fetch(http, url: str, cache: dict) -> int:
+    # Один запрос браузера: тело считается в байтах по сети (до распаковки)
+    headers = dict(BROWSER)
+    etag, modified, immutable = cache.get(url, (None, None, False))
+    if immutable:
+        return 0  # immutable: браузер берёт файл из кэша без запроса
+    if etag:
+        headers["If-None-Match"] = etag
+    if modified:
+        headers["If-Modified-Since"] = modified
+    async with http.stream("GET", url, headers=headers) as response:
+        raw = b"".join([chunk async for chunk in response.aiter_raw()])
+        if response.status_code == 200:
+            cache[url] = (response.headers.get("etag"), response.headers.get("last-modified"),
+                          "immutable" in response.headers.get("cache-control", ""))
+    return len(raw)
+
+
+async def visit(http, cache: dict, index: str) -> int:
+    # Заход браузера: index.html и всё, на что он ссылается
+    return await fetch(http, "/", cache) + sum([
+        await fetch(http, url, cache) for url in re.findall(r"/static/[\w./-]+", index)
+    ])
+
+
+async def timing(http, url: str, requests: int, headers=None) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = await http.get(url, headers=headers or BROWSER)
+        assert response.status_code in (200, 304), response.status_code
+    return (time.perf_counter() - started) / requests
+
+
+async def measure(label: str, app, requests: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        index = await http.get("/", headers=BROWSER)
+        cache = {}
+        first = await visit(http, cache, index.text)
+        # Повторный заход: immutable-файлы из кэша, остальное - условным запросом
+        second = await visit(http, cache, index.text)
+        script = re.findall(r"/static/[\w./-]+\.js", index.text)[0]
+        index_etag = index.headers.get("etag")
+        result = {
+            "label": label,
+            "first": first,
+            "repeat": second,
+            "immutable": "immutable" in (await http.get(script, headers=BROWSER)).headers.get("cache-control", ""),
+            "index": await timing(http, "/", requests),
+            "index_304": await timing(http, "/", requests, {**BROWSER, "If-None-Match": index_etag or ""}),
+            "script": await timing(http, script, requests),
+        }
+    return result
+
+
+async def run(args) -> int:
+    assets = StaticAssets()
+    assets.load()
+    results = [
+        await measure("StaticFiles", baseline_app(), args.requests),
+        await measure("app.assets", assets_app(assets), args.requests),
+    ]
+    print(f"requests={args.requests} per timing, Accept-Encoding: {BROWSER['Accept-Encoding']}")
+    print(f"{'serving':<12} {'first KB':>9} {'repeat KB':>10} {'GET / us':>9} {'304 us':>8} {'JS us':>8}  immutable")
+    for result in results:
+        print(f"{result['label']:<12} {result['first'] / 1024:9.1f} {result['repeat'] / 1024:10.1f} "
+              f"{result['index'] * 1e6:9.1f} {result['index_304'] * 1e6:8.1f} {result['script'] * 1e6:8.1f}  "
+              f"{result['immutable']}")
+    baseline, new = results
+    failed = False
+    if new["first"] >= baseline["first"]:
+        print("FAIL: first visit is not smaller than with uncompressed files")
+        failed = True
+    if new["repeat"] > 0:
+        print(f"FAIL: repeat visit downloaded {new['repeat']} bytes")
+        failed = True
+    if not new["immutable"]:
+        print("FAIL: fingerprinted script is not served as immutable")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    sys.exit(asyncio.run(run(parser.parse_args())))
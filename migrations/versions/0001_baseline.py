@@ -0,0 +1,63 @@
+"""Исходная схема: users, food_bags, bookings
+
+Совпадает с тем, что раньше создавал Base.metadata.create_all; в базах,
+созданных до появления миграций, таблицы уже есть и не пересоздаются.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("email", sa.String(100)),
+            sa.Column("hashed_password", sa.String(100)),
+            sa.Column("role", sa.String(20)),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if not inspector.has_table("food_bags"):
+        op.create_table(
+            "food_bags",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(100)),
+            sa.Column("description", sa.String(500)),
+            sa.Column("photo_url", sa.String(200)),
+            sa.Column("price", sa.Float()),
+            sa.Column("discounted_price", sa.Float()),
+            sa.Column("quantity", sa.Integer()),
+            sa.Column("address", sa.String(200)),
+            sa.Column("pickup_time", sa.DateTime()),
+            sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id")),
+        )
+        op.create_index("ix_food_bags_id", "food_bags", ["id"])
+
+    if not inspector.has_table("bookings"):
+        op.create_table(
+            "bookings",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+            sa.Column("food_bag_id", sa.Integer(), sa.ForeignKey("food_bags.id")),
+            sa.Column("quantity", sa.Integer()),
+        )
+        op.create_index("ix_bookings_id", "bookings", ["id"])
+
+
+def downgrade():
+    op.drop_table("bookings")
+    op.drop_table("food_bags")
+    op.drop_table("users")
@@ -0,0 +1,81 @@
+"""Координаты корзин и индексы под запросы app/crud.py
+
+- latitude/longitude/geohash для /food-bags/nearby;
+- (pickup_time, id) - список клиента, keyset-пагинация, чистка просроченных;
+- (owner_id, pickup_time) - список заведения;
+- bookings.user_id, bookings.food_bag_id;
+- FULLTEXT(name, description, address) в MySQL для /food-bags/search;
+- удаляются дублирующие первичный ключ индексы ix_*_id.
+
+Шаги пропускаются, если схема уже в нужном состоянии (базы, созданные create_all).
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+NEW_INDEXES = (
+    ("ix_food_bags_pickup_time_id", "food_bags", ["pickup_time", "id"]),
+    ("ix_food_bags_owner_id_pickup_time", "food_bags", ["owner_id", "pickup_time"]),
+    ("ix_food_bags_geohash", "food_bags", ["geohash"]),
+    ("ix_bookings_user_id", "bookings", ["user_id"]),
+    ("ix_bookings_food_bag_id", "bookings", ["food_bag_id"]),
+)
+OBSOLETE_INDEXES = (
+    ("ix_users_id", "users"),
+    ("ix_food_bags_id", "food_bags"),
+    ("ix_bookings_id", "bookings"),
+    ("ix_food_bags_pickup_time", "food_bags"),
+)
+
+
+def _index_names(inspector, table):
+    return {index["name"] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    columns = {column["name"] for column in inspector.get_columns("food_bags")}
+    for name, type_ in (("latitude", sa.Float()), ("longitude", sa.Float()), ("geohash", sa.String(12))):
+        if name not in columns:
+            op.add_column("food_bags", sa.Column(name, type_, nullable=True))
+
+    for name, table, columns in NEW_INDEXES:
+        if name not in _index_names(inspector, table):
+            op.create_index(name, table, columns)
+
+    if bind.dialect.name == "mysql" and "ix_food_bags_fulltext" not in _index_names(inspector, "food_bags"):
+        op.create_index(
+            "ix_food_bags_fulltext", "food_bags", ["name", "description", "address"], mysql_prefix="FULLTEXT"
+        )
+
+    for name, table in OBSOLETE_INDEXES:
+        if name in _index_names(inspector, table):
+            op.drop_index(name, table_name=table)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "mysql":
+        op.drop_index("ix_food_bags_fulltext", table_name="food_bags")
+        # MySQL удалил свои неявные индексы под FK, когда появились новые; без них FK не даст удалить индексы
+        op.create_index("owner_id", "food_bags", ["owner_id"])
+        op.create_index("user_id", "bookings", ["user_id"])
+        op.create_index("food_bag_id", "bookings", ["food_bag_id"])
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_food_bags_id", "food_bags", ["id"])
+    op.create_index("ix_bookings_id", "bookings", ["id"])
+    for name, table, _ in reversed(NEW_INDEXES):
+        op.drop_index(name, table_name=table)
+    op.drop_column("food_bags", "geohash")
+    op.drop_column("food_bags", "longitude")
+    op.drop_column("food_bags", "latitude")
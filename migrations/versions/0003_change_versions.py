@@ -0,0 +1,26 @@
+"""Счётчики изменений для ETag списка корзин
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    change_versions = op.create_table(
+        "change_versions",
+        sa.Column("name", sa.String(50), primary_key=True),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+    )
+    op.bulk_insert(change_versions, [{"name": "food_bags", "version": 0}])
+
+
+def downgrade():
+    op.drop_table("change_versions")
@@ -0,0 +1,46 @@
+"""Планировщик периодических задач: аренда задач и история запусков
+
+- scheduler_jobs - одна строка на задачу: срок следующего запуска и аренда воркера;
+- job_runs - история запусков (статус, длительность, результат).
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "scheduler_jobs",
+        sa.Column("name", sa.String(100), primary_key=True),
+        sa.Column("next_run_at", sa.DateTime(), nullable=False),
+        sa.Column("locked_by", sa.String(100), nullable=True),
+        sa.Column("locked_until", sa.DateTime(), nullable=True),
+    )
+    op.create_table(
+        "job_runs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("job", sa.String(100), nullable=False),
+        sa.Column("runner", sa.String(100), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.Column("duration", sa.Float(), nullable=True),
+        sa.Column("detail", sa.String(1000), nullable=True),
+    )
+    op.create_index("ix_job_runs_job_started_at", "job_runs", ["job", "started_at"])
+    op.create_index("ix_job_runs_started_at", "job_runs", ["started_at"])
+
+
+def downgrade():
+    op.drop_index("ix_job_runs_started_at", table_name="job_runs")
+    op.drop_index("ix_job_runs_job_started_at", table_name="job_runs")
+    op.drop_table("job_runs")
+    op.drop_table("scheduler_jobs")
@@ -0,0 +1,20 @@
+"""Индекс по photo_url: после обработки фото корзины переводятся с исходного файла на превью
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_food_bags_photo_url", "food_bags", ["photo_url"])
+
+
+def downgrade():
+    op.drop_index("ix_food_bags_photo_url", table_name="food_bags")
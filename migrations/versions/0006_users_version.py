@@ -0,0 +1,22 @@
+"""Счётчик изменений пользователей: кэш авторизации других воркеров сверяется с ним
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    change_versions = sa.table("change_versions", sa.column("name", sa.String), sa.column("version", sa.BigInteger))
+    op.bulk_insert(change_versions, [{"name": "users", "version": 0}])
+
+
+def downgrade():
+    op.execute("DELETE FROM change_versions WHERE name = 'users'")
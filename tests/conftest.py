@@ -0,0 +1,46 @@
+import os
+import tempfile
+
+import pytest
+
+# Тесты работают с временной SQLite-базой через aiosqlite. Переменные задаются
+# до первого импорта app.*: настройки и движки создаются при импорте
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="quickbag_tests_"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+os.environ["DB_REPLICA_URLS"] = ""
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["SCHEDULER_ENABLED"] = "false"
+# Проверки из benchmarks (tests/test_query_checks.py) - с той же базой и со строгим бюджетом запросов
+os.environ["BENCH_DATABASE_URL"] = os.environ["DATABASE_URL"]
+os.environ["QUERY_BUDGET_MODE"] = "raise"
+
+from sqlalchemy import delete, update  # noqa: E402
+
+from app import models  # noqa: E402
+from app.database import SessionLocal, async_engine, run_migrations  # noqa: E402
+from app.principal_cache import principal_cache  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    run_migrations()
+
+
+@pytest.fixture(autouse=True)
+def clean_db(schema):
+    # Соединения aiosqlite привязаны к event loop прошлого теста: пул сбрасывается без закрытия
+    async_engine.sync_engine.dispose(close=False)
+    with SessionLocal() as db:
+        for model in (models.Booking, models.FoodBag, models.User):
+            db.execute(delete(model))
+        db.execute(update(models.ChangeVersion).values(version=0))
+        db.commit()
+    principal_cache.clear()
+    # Сверка версии пользователей прошлого теста привязана к его event loop
+    principal_cache.version, principal_cache.checked_at, principal_cache._check_task = None, 0.0, None
@@ -0,0 +1,194 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import OperationalError
+
+from app import crud, passwords, schemas
+from app.database import AsyncSessionLocal
+from app.principal_cache import Principal
+
+pytestmark = pytest.mark.anyio
+
+
+def food_bag_data(**overrides) -> schemas.FoodBagCreate:
+    data = dict(
+        name="Bag", description="Bread and pastry", price=10.0, discounted_price=5.0, quantity=5,
+        address="Arbat 1", pickup_time=datetime.utcnow() + timedelta(days=1),
+    )
+    data.update(overrides)
+    return schemas.FoodBagCreate(**data)
+
+
+async def make_owner(db, email: str = "owner@test"):
+    user = await crud.create_user_async(db, email, passwords.hash_password("secret"), "establishment")
+    return Principal(id=user.id, email=user.email, role=user.role)
+
+
+async def test_users():
+    async with AsyncSessionLocal() as db:
+        user = await crud.create_user_async(db, "client@test", passwords.hash_password("secret"), "client")
+        assert (await crud.get_user_async(db, user.id)).email == "client@test"
+        assert (await crud.get_user_by_email_async(db, "client@test")).id == user.id
+        assert [row.email for row in await crud.get_all_user_rows_async(db)] == ["client@test"]
+
+        assert (await crud.authenticate_user_async(db, "client@test", "secret")).id == user.id
+        assert await crud.authenticate_user_async(db, "client@test", "wrong") is False
+        assert await crud.authenticate_user_async(db, "nobody@test", "secret") is False
+
+        assert (await crud.update_user_role_async(db, user.id, "admin")).role == "admin"
+        assert await crud.delete_user_async(db, user.id) is True
+        assert await crud.get_user_async(db, user.id) is None
+        assert await crud.delete_user_async(db, user.id) is False
+
+
+async def test_food_bag_lifecycle_bumps_version():
+    async with AsyncSessionLocal() as db:
+        owner = await make_owner(db)
+        food_bag = await crud.create_food_bag_async(db, food_bag_data(), owner.id)
+        assert food_bag.geohash is None
+        assert await crud.get_food_bags_version_async(db) == 1
+
+        updated = await crud.update_food_bag_async(
+            db, food_bag.id, food_bag_data(name="Renamed", latitude=55.75, longitude=37.62), owner
+        )
+        assert updated.name == "Renamed" and updated.geohash
+        assert await crud.get_food_bags_version_async(db) == 2
+
+        listed = await crud.get_food_bags_async(db, current_user=owner, filter_expired=True)
+        assert [item.id for item in listed] == [food_bag.id]
+
+        assert await crud.delete_food_bag_async(db, food_bag.id, owner) is True
+        assert await crud.get_food_bag_async(db, food_bag.id) is None
+        assert await crud.get_food_bags_version_async(db) == 3
+
+
+async def test_nearby_crosses_antimeridian():
+    async with AsyncSessionLocal() as db:
+        owner = await make_owner(db)
+        east, west, far = [
+            await crud.create_food_bag_async(db, food_bag_data(latitude=0.237, longitude=lon), owner.id)
+            for lon in (179.99, -179.99, -179.5)
+        ]
+        found = await crud.get_food_bags_nearby_async(
+            db=db, latitude=0.237, longitude=179.9, radius_km=15.0, current_user=owner
+        )
+        assert [food_bag.id for _, food_bag in found] == [east.id, west.id]
+        found = await crud.get_food_bags_nearby_async(
+            db=db, latitude=0.237, longitude=-179.9, radius_km=15.0, current_user=owner
+        )
+        assert [food_bag.id for _, food_bag in found] == [west.id, east.id]
+        assert far.id not in [food_bag.id for _, food_bag in found]
+
+
+async def test_version_is_committed_with_the_write():
+    # Версия меняется в той же транзакции: отдельная сессия видит её сразу после записи
+    async with AsyncSessionLocal() as db:
+        owner = await make_owner(db)
+        await crud.create_food_bag_async(db, food_bag_data(), owner.id)
+    async with AsyncSessionLocal() as other:
+        assert await crud.get_food_bags_version_async(other) == 1
+
+
+async def test_other_owner_cannot_change_food_bag():
+    async with AsyncSessionLocal() as db:
+        owner = await make_owner(db)
+        stranger = await make_owner(db, "stranger@test")
+        food_bag = await crud.create_food_bag_async(db, food_bag_data(), owner.id)
+        assert await crud.update_food_bag_async(db, food_bag.id, food_bag_data(), stranger) is None
+        assert await crud.delete_food_bag_async(db, food_bag.id, stranger) is False
+
+
+async def test_batch_operations():
+    async with AsyncSessionLocal() as db:
+        owner = await make_owner(db)
+        created = await crud.create_food_bags_async(db, [food_bag_data(name=f"Bag {i}") for i in range(3)], owner.id)
+        assert [result.status for result in created] == [201, 201, 201]
+        ids = [result.id for result in created]
+        # Один пакет - одно увеличение версии
+        assert await crud.get_food_bags_version_async(db) == 1
+
+        updates = [schemas.FoodBagBatchUpdateItem(id=ids[0], **food_bag_data(quantity=1).model_dump()),
+                   schemas.FoodBagBatchUpdateItem(id=10_000, **food_bag_data().model_dump())]
+        assert [result.status for result in await crud.update_food_bags_async(db, updates, owner)] == [200, 404]
+
+        deleted = await crud.delete_food_bags_async(db, [ids[1], ids[1], 10_000], owner)
+        assert [result.status for result in deleted] == [200, 400, 404]
+        assert await crud.get_food_bags_version_async(db) == 3
+
+
+async def test_booking():
+    async with AsyncSessionLocal() as db:
+        owner = await make_owner(db)
+        food_bag = await crud.create_food_bag_async(db, food_bag_data(quantity=2), owner.id)
+
+        booking = await crud.book_food_bag_async(db, schemas.BookingCreate(food_bag_id=food_bag.id, quantity=2), owner.id)
+        assert booking.id and booking.quantity == 2
+    async with AsyncSessionLocal() as db:
+        # Новая сессия: остаток списан UPDATE без синхронизации объектов текущей
+        assert (await crud.get_food_bag_async(db, food_bag.id)).quantity == 0
+
+        with pytest.raises(HTTPException) as sold_out:
+            await crud.book_food_bag_async(db, schemas.BookingCreate(food_bag_id=food_bag.id, quantity=1), owner.id)
+        assert sold_out.value.status_code == 400
+        with pytest.raises(HTTPException) as missing:
+            await crud.book_food_bag_async(db, schemas.BookingCreate(food_bag_id=10_000, quantity=1), owner.id)
+        assert missing.value.status_code == 404
+
+
+async def test_group_booking_allocates_in_order():
+    async with AsyncSessionLocal() as db:
+        owner = await make_owner(db)
+        food_bag = await crud.create_food_bag_async(db, food_bag_data(quantity=3), owner.id)
+        requests = [(schemas.BookingCreate(food_bag_id=food_bag.id, quantity=quantity), owner.id) for quantity in (2, 2, 1)]
+
+        results = await crud.book_food_bag_group_async(db, food_bag.id, requests)
+        assert [getattr(result, "status_code", 201) for result in results] == [201, 400, 201]
+    async with AsyncSessionLocal() as db:
+        assert (await crud.get_food_bag_async(db, food_bag.id)).quantity == 0
+        missing = await crud.book_food_bag_group_async(db, 10_000, requests[:1])
+        assert missing[0].status_code == 404
+
+
+class LockError(Exception):
+    args = (1213, "Deadlock found when trying to get lock")
+
+
+async def test_booking_retry_runs_hooks_once(monkeypatch):
+    # Повтор после deadlock: одно бронирование, одно списание и одно событие после commit
+    async with AsyncSessionLocal() as db:
+        owner = await make_owner(db)
+        food_bag = await crud.create_food_bag_async(db, food_bag_data(quantity=5), owner.id)
+
+    book_once = crud._book_food_bag_once
+    attempts = []
+
+    def flaky(db, booking, user_id):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OperationalError("UPDATE food_bags", {}, LockError())
+        return book_once(db, booking, user_id)
+
+    published = []
+    monkeypatch.setattr(crud, "_book_food_bag_once", flaky)
+    monkeypatch.setattr(crud, "booking_retry_delay", lambda attempt: 0)
+    monkeypatch.setattr(crud.event_broker, "publish_quantity", lambda *args: published.append(args))
+
+    async with AsyncSessionLocal() as db:
+        await crud.book_food_bag_async(db, schemas.BookingCreate(food_bag_id=food_bag.id, quantity=1), owner.id)
+        assert len(attempts) == 2
+        assert published == [(food_bag.id, -1, 2)]
+    async with AsyncSessionLocal() as db:
+        assert (await crud.get_food_bag_async(db, food_bag.id)).quantity == 4
+
+
+async def test_failing_hook_does_not_fail_committed_write(monkeypatch):
+    def broken(*args):
+        raise RuntimeError("subscriber queue is gone")
+
+    monkeypatch.setattr(crud.event_broker, "publish_upserted", broken)
+    async with AsyncSessionLocal() as db:
+        owner = await make_owner(db)
+        food_bag = await crud.create_food_bag_async(db, food_bag_data(), owner.id)
+    async with AsyncSessionLocal() as db:
+        assert (await crud.get_food_bag_async(db, food_bag.id)).name == "Bag"
@@ -0,0 +1,82 @@
+import httpx
+import pytest
+from fastapi import Depends, FastAPI, Request, Response
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, passwords
+from app.database import AsyncSessionLocal, async_engine, get_read_db, get_write_db, read_session, read_your_writes
+from app.principal_cache import principal_cache
+from app.routers.auth import create_access_token
+from app.utils import get_current_user
+
+pytestmark = pytest.mark.anyio
+
+
+def checked_out() -> int:
+    return async_engine.pool.checkedout()
+
+
+def make_request(method: str = "GET", headers: dict = None) -> Request:
+    raw_headers = [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()]
+    return Request({"type": "http", "method": method, "path": "/", "headers": raw_headers, "query_string": b""})
+
+
+async def test_write_session_is_closed_after_request():
+    request, response = make_request("POST"), Response()
+    dependency = get_write_db(request, response)
+    db = await anext(dependency)
+    assert isinstance(db, AsyncSession)
+    await db.execute(text("SELECT 1"))
+    assert checked_out() == 1
+    await dependency.aclose()
+    assert checked_out() == 0
+    # Изменяющий запрос закрепляет чтения клиента за основной БД
+    assert read_your_writes.COOKIE in response.headers.get("set-cookie", "")
+
+
+async def test_read_session_without_replicas_uses_primary():
+    db = read_session(make_request())
+    assert db.bind is async_engine
+    assert not db.info.get("replica")
+    await db.close()
+
+    dependency = get_read_db(make_request())
+    db = await anext(dependency)
+    await db.execute(text("SELECT 1"))
+    await dependency.aclose()
+    assert checked_out() == 0
+
+
+async def test_session_rolls_back_uncommitted_changes():
+    async with AsyncSessionLocal() as db:
+        await crud.create_user_async(db, "kept@test", passwords.hash_password("secret"), "client")
+        await db.run_sync(lambda session: session.execute(text("DELETE FROM users")))
+    async with AsyncSessionLocal() as db:
+        assert await crud.get_user_by_email_async(db, "kept@test") is not None
+
+
+async def test_authenticated_write_request_holds_one_connection():
+    # Проверка пользователя не держит второе соединение рядом с сессией записи
+    app = FastAPI()
+    seen = {}
+
+    @app.post("/write")
+    async def write(db: AsyncSession = Depends(get_write_db), current_user=Depends(get_current_user)):
+        seen["before"] = checked_out()
+        await db.execute(text("SELECT 1"))
+        seen["during"] = checked_out()
+        return {"id": current_user.id}
+
+    async with AsyncSessionLocal() as db:
+        user = await crud.create_user_async(db, "client@test", passwords.hash_password("secret"), "client")
+    token = create_access_token(data={"sub": str(user.id), "role": user.role})
+    # Сверка версии пользователей идёт фоном со своим соединением - здесь она уже сделана
+    await principal_cache.check()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/write", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200 and response.json() == {"id": user.id}
+    assert seen == {"before": 0, "during": 1}
+    assert checked_out() == 0
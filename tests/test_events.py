@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app import crud, models, passwords, schemas
+from app.database import AsyncSessionLocal, SessionLocal
+from app.events import EventBroker, Subscriber, event_broker
+from app.principal_cache import Principal
+
+pytestmark = pytest.mark.anyio
+
+
+def subscribe(broker: EventBroker, owner_id=None, address=None) -> Subscriber:
+    # Без фоновой сверки версии: события публикуются тестом напрямую
+    broker._loop = asyncio.get_running_loop()
+    subscriber = Subscriber(owner_id, address, max_queue=100)
+    broker._subscribers.add(subscriber)
+    return subscriber
+
+
+def received(subscriber: Subscriber) -> list:
+    frames = [frame.split(b"\n")[0].decode() for frame in subscriber.buffer]
+    subscriber.buffer.clear()
+    return frames
+
+
+async def test_owner_filter_drops_other_and_unknown_owners():
+    broker = EventBroker()
+    establishment, client = subscribe(broker, owner_id=1), subscribe(broker)
+    broker.publish_deleted([(10, 1, "Arbat 1"), (11, 2, "Arbat 2"), (12, None, None)], None)
+    assert received(establishment) == ["event: deleted"]
+    assert received(client) == ["event: deleted"] * 3
+
+    broker.version = 1
+    broker._resync(2)
+    assert received(establishment) == ["event: resync"]
+    assert received(client) == ["event: resync"]
+
+
+async def test_crud_deletions_carry_the_owner():
+    async with AsyncSessionLocal() as db:
+        owners = [
+            await crud.create_user_async(db, f"owner{i}@test", passwords.hash_password("secret"), "establishment")
+            for i in range(2)
+        ]
+        bags = [
+            await crud.create_food_bag_async(db, schemas.FoodBagCreate(
+                name="Bag", price=10.0, discounted_price=5.0, quantity=5, address="Arbat 1",
+                pickup_time=datetime.utcnow() + timedelta(days=1),
+            ), owner.id)
+            for owner in owners for _ in range(3)
+        ]
+    establishment = subscribe(event_broker, owner_id=owners[0].id)
+    try:
+        first, second = (Principal(id=owner.id, email=owner.email, role=owner.role) for owner in owners)
+        async with AsyncSessionLocal() as db:
+            await crud.delete_food_bag_async(db, bags[3].id, second)
+            await crud.delete_food_bags_async(db, [bags[0].id, bags[4].id], first)
+            await crud.delete_food_bags_async(db, [bags[4].id], second)
+        # Просроченные: живой индекс их уже не знает, владелец берётся из удаляемых строк
+        with SessionLocal() as db:
+            db.execute(update(models.FoodBag).values(pickup_time=datetime.utcnow() - timedelta(minutes=1)))
+            db.commit()
+            crud.delete_expired_food_bags(db)
+        await asyncio.sleep(0)
+        assert received(establishment) == ["event: deleted"] * 3  # bags[0], затем bags[1] и bags[2]
+    finally:
+        event_broker.unsubscribe(establishment)
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from app import crud, models
+from app.database import SessionLocal
+from app.inventory import LiveInventory
+from app.principal_cache import Principal
+
+ADDRESSES = ["100% Bakery lane", "1000 Bakery lane", "A_B road", "AxB road", "Back\\slash yard", "Arbat 1"]
+
+
+@pytest.mark.parametrize("address", ["%", "_", "100%", "A_B", "a_b", "\\", "arbat", "BAKERY", "nothing"])
+def test_address_filter_matches_database(address):
+    # Один и тот же запрос списка не должен зависеть от INVENTORY_ENABLED
+    with SessionLocal() as db:
+        owner_id = db.execute(
+            insert(models.User).values(email="owner@test", hashed_password="x", role="establishment")
+        ).inserted_primary_key[0]
+        db.execute(insert(models.FoodBag), [
+            dict(name="Bag", address=value, price=10.0, discounted_price=5.0, quantity=5, owner_id=owner_id,
+                 pickup_time=datetime.utcnow() + timedelta(days=1))
+            for value in ADDRESSES
+        ])
+        db.commit()
+
+        client = Principal(id=owner_id + 1, email="client@test", role="client")
+        from_db = crud.get_food_bags(db, current_user=client, address=address, filter_expired=True)
+        inventory = LiveInventory()
+        inventory.rebuild(db)
+        from_inventory = inventory.list_food_bags(client, address)
+
+    assert [food_bag.address for food_bag in from_inventory] == [food_bag.address for food_bag in from_db]
+    expected = [value for value in ADDRESSES if address.lower() in value.lower()]
+    assert [food_bag.address for food_bag in from_db] == expected
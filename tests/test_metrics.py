@@ -0,0 +1,27 @@
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+from app import metrics
+from app.database import engine
+
+
+def queries_total() -> float:
+    return sum(metrics.db_queries._values.values())
+
+
+def test_listeners_are_installed_at_import():
+    import app.main  # noqa: F401
+
+    assert event.contains(Engine, "before_cursor_execute", metrics._before_cursor_execute)
+    assert event.contains(Engine, "after_cursor_execute", metrics._after_cursor_execute)
+
+
+def test_statement_started_before_install_is_skipped():
+    # Запрос начался до установки слушателей: конец без начала не должен ронять запрос к БД
+    with engine.connect() as connection:
+        connection.info.pop("query_started", None)
+        before = queries_total()
+        metrics._after_cursor_execute(connection, None, "SELECT 1", (), None, False)
+        assert queries_total() == before
+        assert connection.execute(text("SELECT 1")).scalar() == 1
+        assert queries_total() == before + 1
@@ -0,0 +1,34 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.passwords import PasswordHasher
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_cancelled_request_keeps_its_slot_until_the_job_finishes():
+    hasher = PasswordHasher(workers=1, max_queue=0)
+    release = threading.Event()
+    waiter = asyncio.create_task(hasher.run(release.wait))
+    try:
+        while hasher.snapshot()["running"] == 0:
+            await asyncio.sleep(0.01)
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # bcrypt ещё работает: место занято, новый запрос получает 503
+        assert hasher.pending == 1
+        with pytest.raises(HTTPException) as error:
+            await hasher.run(lambda: "second")
+        assert error.value.status_code == 503
+    finally:
+        release.set()
+
+    while hasher.pending:
+        await asyncio.sleep(0.01)
+    assert hasher.snapshot()["queued"] == 0
+    assert await hasher.run(lambda: "done") == "done"
@@ -0,0 +1,65 @@
+import pytest
+from fastapi import Request
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import update
+
+from app import crud, models, passwords
+from app.database import AsyncSessionLocal, SessionLocal
+from app.principal_cache import Principal, principal_cache
+from app.routers.auth import create_access_token
+from app.utils import get_current_user
+
+pytestmark = pytest.mark.anyio
+
+
+async def authenticate(token: str) -> Principal:
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""})
+    return await get_current_user(request, HTTPAuthorizationCredentials(scheme="Bearer", credentials=token))
+
+
+async def make_client():
+    async with AsyncSessionLocal() as db:
+        user = await crud.create_user_async(db, "client@test", passwords.hash_password("secret"), "client")
+    return user, create_access_token(data={"sub": str(user.id), "role": user.role})
+
+
+async def test_user_changes_bump_users_version():
+    user, _ = await make_client()
+    async with AsyncSessionLocal() as db:
+        assert await crud.get_users_version_async(db) == 0
+        await crud.update_user_role_async(db, user.id, "establishment")
+        assert await crud.get_users_version_async(db) == 1
+        await crud.delete_user_async(db, user.id)
+        assert await crud.get_users_version_async(db) == 2
+
+
+async def test_role_change_in_other_worker_resets_cache():
+    user, token = await make_client()
+    await principal_cache.check()
+    principal = await authenticate(token)
+    assert principal_cache.get(user.id, token) == principal
+
+    # Другой воркер: роль и версия меняются в БД, invalidate_user этого процесса не вызывается
+    with SessionLocal() as db:
+        db.execute(update(models.User).where(models.User.id == user.id).values(role="admin"))
+        crud.bump_users_version(db)
+        db.commit()
+    assert principal_cache.get(user.id, token) is not None
+
+    await principal_cache.check()
+    assert principal_cache.get(user.id, token) is None
+    principal = await authenticate(token)
+    assert principal == Principal(id=user.id, email="client@test", role="admin")
+
+
+async def test_check_is_scheduled_once_per_interval():
+    principal_cache.checked_at = 0.0
+    principal_cache.schedule_check()
+    task = principal_cache._check_task
+    principal_cache.schedule_check()
+    assert principal_cache._check_task is task
+    await task
+    assert principal_cache.version == 0
+
+    principal_cache.schedule_check()
+    assert principal_cache._check_task is task  # интервал ещё не прошёл
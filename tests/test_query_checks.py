@@ -0,0 +1,17 @@
+import argparse
+
+import pytest
+
+from benchmarks import query_budget, query_plans
+
+# Проверки из benchmarks на небольших данных: планы запросов crud без полного просмотра
+# таблиц и бюджеты SQL-запросов эндпоинтов без N+1. На MySQL - те же скрипты с BENCH_DATABASE_URL
+pytestmark = pytest.mark.anyio
+
+
+def test_crud_queries_use_indexes():
+    assert query_plans.run(users=300, bags=3000, bookings=1000, verbose=False) == 0
+
+
+async def test_endpoint_query_budgets():
+    assert await query_budget.run(argparse.Namespace(rows=30)) == 0
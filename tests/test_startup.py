@@ -0,0 +1,13 @@
+import os
+import subprocess
+import sys
+
+
+def test_app_import_does_not_load_heavy_modules():
+    # Pillow нужен только пулу превью: импорт приложения (старт воркера) его не тянет
+    code = "import sys, app.main; print(sorted(name for name in ('PIL', 'app.thumbnails') if name in sys.modules))"
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True, env=os.environ.copy(),
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ).stdout
+    assert output.strip().splitlines()[-1] == "[]"